@@ -17,10 +17,11 @@ print(f"SQLite version: {sqlite3.sqlite_version}")
 print(f"SQLite module path: {sqlite3.__file__}")
 
 
-import json
+import time
 import streamlit as st
-from src.quiz_pipeline import run_pipeline
-from src.utils import format_quiz_output, format_quiz_text
+from config.config import JOB_POLL_INTERVAL_SECONDS, MAX_NUM_QUESTIONS, NUM_QUESTIONS
+from src.pipeline_jobs import PipelineJobs
+from src.utils import format_questions_html, format_quiz_output, format_quiz_text
 
 # Custom CSS for better styling
 st.markdown(
@@ -74,13 +75,46 @@ st.markdown(
 )
 
 
+@st.cache_resource
+def get_pipeline_jobs():
+    """Return the pipeline job registry shared by every session."""
+    return PipelineJobs()
+
+
+def show_partial_results(job):
+    """Show the quizzes of a running job that are already generated.
+
+    The MCQ and T/F quizzes are usually ready well before the analysis, so
+    they are shown as soon as each arrives.
+    """
+    mcq_parsed_json = job.partial.get(0)
+    tf_parsed_json = job.partial.get(1)
+    topic = mcq_parsed_json.get("topic", "") if mcq_parsed_json else ""
+    if mcq_parsed_json:
+        st.markdown("### Generated MCQ Quiz Content")
+        st.markdown(
+            format_questions_html(mcq_parsed_json.get("quiz", []), topic),
+            unsafe_allow_html=True,
+        )
+    if tf_parsed_json:
+        st.markdown("### Generated T/F Quiz Content")
+        st.markdown(
+            format_questions_html(tf_parsed_json.get("quiz", []), topic),
+            unsafe_allow_html=True,
+        )
+    if mcq_parsed_json and tf_parsed_json:
+        st.info("Generating the quiz analysis...")
+
+
 def main():
     """Main Streamlit application function.
 
     This function handles:
     1. Initializing session state variables for file uploads and outputs
     2. Setting up the main UI components including title and sidebar
-    3. Processing uploaded PDFs through the quiz generation pipeline
+    3. Processing uploaded PDFs through the quiz generation pipeline in a
+       background job, memoised per file content, and polling until it is
+       done, showing each quiz as soon as it is generated
     4. Displaying formatted quiz results and analysis
 
     The app allows users to:
@@ -99,6 +133,12 @@ def main():
         st.session_state.json_output = None
     if "upload_time" not in st.session_state:
         st.session_state.upload_time = None
+    if "formatted_outputs" not in st.session_state:
+        # Formatted quiz HTML per uploaded file content hash
+        st.session_state.formatted_outputs = {}
+    if "formatted_versions" not in st.session_state:
+        # Version of the job result each formatted quiz was made from
+        st.session_state.formatted_versions = {}
 
     # App header
     st.title("📄 Quiz Generator")
@@ -114,79 +154,126 @@ def main():
         uploaded_file = st.file_uploader(
             "Choose a PDF file", type=["pdf"], accept_multiple_files=False
         )
+        num_questions = st.number_input(
+            "Questions per quiz",
+            min_value=1,
+            max_value=MAX_NUM_QUESTIONS,
+            value=NUM_QUESTIONS,
+        )
 
     # Main content
-    if uploaded_file is not None:
-
-        # Update session state
-        st.session_state.upload_time = st.session_state.get("upload_time", "")
-
-        # Process the uploaded file
-        with st.spinner("Processing PDF..."):
-            # Reset file pointer to start for run_pipeline
-            uploaded_file.seek(0)
-            st.session_state.json_output = run_pipeline(uploaded_file)
-            print(f"st.session_state.json_output: {st.session_state.json_output}")
-
-    # Display results if JSON output exists
-    if st.session_state.json_output is not None:
-        st.subheader("Processing Results")
-        st.success("PDF processed successfully!")
-
-        try:
-            mcq_json_out = st.session_state.json_output[0]
-            print(f"mcq_json_out: {mcq_json_out}")
-            tf_json_out = st.session_state.json_output[1]
-            print(f"tf_json_out: {tf_json_out}")
-            analysis_json_out = st.session_state.json_output[2]
-            print(f"analysis_json_out: {analysis_json_out}")
-            mcq_parsed_json = json.loads(mcq_json_out)
-            print(f"mcq_parsed_json: {mcq_parsed_json}")
-            tf_parsed_json = json.loads(tf_json_out)
-            print(f"tf_parsed_json: {tf_parsed_json}")
-            analysis_parsed_json = json.loads(analysis_json_out)
-            print(f"analysis_parsed_json: {analysis_parsed_json}")
-
-            # Format JSON output for display
-            mcq_formatted_output, tf_formatted_output, analysis_formatted_output = (
-                format_quiz_output(
-                    mcq_parsed_json, tf_parsed_json, analysis_parsed_json
-                )
-            )
+    if uploaded_file is None:
+        st.session_state.json_output = None
+        st.session_state.uploaded_file_content = None
+        st.info("Please upload a PDF file to begin processing.")
+        return
+
+    # Update session state
+    st.session_state.upload_time = st.session_state.get("upload_time", "")
+
+    jobs = get_pipeline_jobs()
+    pdf_bytes = uploaded_file.getvalue()
+    file_key = jobs.make_key(pdf_bytes, num_questions)
+    st.session_state.uploaded_file_content = file_key
+
+    job = jobs.get(file_key)
+    if (
+        job is not None
+        and st.session_state.formatted_versions.get(file_key) != job.version
+    ):
+        # A question was replaced, possibly from another session
+        st.session_state.formatted_outputs.pop(file_key, None)
+
+    if file_key not in st.session_state.formatted_outputs:
+        # Runs the pipeline only if no session has processed this file yet
+        job = jobs.submit(pdf_bytes, num_questions)
+        if not job.finished:
+            show_partial_results(job)
+            with st.spinner("Processing PDF..."):
+                time.sleep(JOB_POLL_INTERVAL_SECONDS)
+            st.rerun()
+        if job.status == "failed":
+            st.error(job.error)
+            return
+
+        # Read before the result, so a concurrent edit is formatted next run
+        st.session_state.formatted_versions[file_key] = job.version
+        st.session_state.json_output = job.result
+        mcq_parsed_json, tf_parsed_json, analysis_parsed_json = job.result
+        # Format JSON output for display once per file
+        st.session_state.formatted_outputs[file_key] = format_quiz_output(
+            mcq_parsed_json, tf_parsed_json, analysis_parsed_json
+        )
 
-            # Display mcq formatted quiz
-            if mcq_formatted_output:
-                st.markdown("### Generated MCQ Quiz Content")
-                st.markdown(mcq_formatted_output, unsafe_allow_html=True)
-            # Display tf formatted quiz
-            if tf_formatted_output:
-                st.markdown("### Generated T/F Quiz Content")
-                st.markdown(tf_formatted_output, unsafe_allow_html=True)
-            # Display tf formatted quiz
-            if analysis_formatted_output:
-                st.markdown("### Generated Quiz Analysis Content")
-                st.markdown(analysis_formatted_output, unsafe_allow_html=True)
-
-            # # Generate plain text for download
-            # quiz_text = format_quiz_text(mcq_parsed_json, tf_parsed_json)
-            # if quiz_text:
-            #     st.download_button(
-            #         label="Download Quiz",
-            #         data=quiz_text,
-            #         file_name="quiz.txt",
-            #         mime="text/plain",
-            #         key="download_quiz",
-            #     )
-            # else:
-            #     st.warning("No quiz data found in the processed PDF.")
-        except json.JSONDecodeError:
-            st.error(
-                "Error: Unable to parse quiz data. The extracted content is not valid JSON."
+    formatted_outputs = st.session_state.formatted_outputs[file_key]
+    st.subheader("Processing Results")
+    st.success("PDF processed successfully!")
+    if formatted_outputs is None:
+        st.warning("No quiz data found in the processed PDF.")
+        return
+
+    job = jobs.get(file_key)
+    if job is not None and job.status == "done":
+        mcq_parsed_json, tf_parsed_json, _ = job.result
+        with st.sidebar:
+            st.header("Replace a Question")
+            questions = [
+                ("mcq", index, f"MCQ Q{index + 1}")
+                for index in range(len(mcq_parsed_json["quiz"]))
+            ] + [
+                ("tf", index, f"T/F Q{index + 1}")
+                for index in range(len(tf_parsed_json["quiz"]))
+            ]
+            kind, index, _ = st.selectbox(
+                "Question", questions, format_func=lambda question: question[2]
             )
+            if st.button("Regenerate question"):
+                # Only this question and its analysis are generated again
+                with st.spinner("Regenerating question..."):
+                    try:
+                        job = jobs.regenerate(file_key, pdf_bytes, kind, index)
+                    except Exception as e:
+                        st.error(f"Error: Failed to regenerate question: {e}")
+                        return
+                st.session_state.formatted_versions[file_key] = job.version
+                st.session_state.json_output = job.result
+                st.session_state.formatted_outputs[file_key] = format_quiz_output(
+                    *job.result
+                )
+                st.rerun()
 
-    else:
-        st.info("Please upload a PDF file to begin processing.")
+    mcq_formatted_output, tf_formatted_output, analysis_formatted_output = (
+        formatted_outputs
+    )
+
+    # Display mcq formatted quiz
+    if mcq_formatted_output:
+        st.markdown("### Generated MCQ Quiz Content")
+        st.markdown(mcq_formatted_output, unsafe_allow_html=True)
+    # Display tf formatted quiz
+    if tf_formatted_output:
+        st.markdown("### Generated T/F Quiz Content")
+        st.markdown(tf_formatted_output, unsafe_allow_html=True)
+    # Display tf formatted quiz
+    if analysis_formatted_output:
+        st.markdown("### Generated Quiz Analysis Content")
+        st.markdown(analysis_formatted_output, unsafe_allow_html=True)
+
+    # # Generate plain text for download
+    # quiz_text = format_quiz_text(mcq_parsed_json, tf_parsed_json)
+    # if quiz_text:
+    #     st.download_button(
+    #         label="Download Quiz",
+    #         data=quiz_text,
+    #         file_name="quiz.txt",
+    #         mime="text/plain",
+    #         key="download_quiz",
+    #     )
+    # else:
+    #     st.warning("No quiz data found in the processed PDF.")
 
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    main()
+    # Import crewai and build a crew once the page is on screen
+    get_pipeline_jobs().warm_up()
\ No newline at end of file
@@ -4,3 +4,123 @@
 DATA_PATH=r"E:\Data Science\Projects\crewai\Quiz-Generator\data\Explanation of NLP Embedding Methods.pdf"
 OUTPUT_PATH=r"E:\Data Science\Projects\crewai\Quiz-Generator\output"
 RUNNING="SERVER"
+
+# Crew Execution
+EXECUTION_MODE="CONCURRENT"  # "CONCURRENT" or "SEQUENTIAL"
+MAX_CONCURRENCY=2  # Max generation branches (MCQ, T/F) running at once
+
+# PDF Text Cache
+PDF_CACHE_ENABLED=True
+PDF_CACHE_DIR=".cache/pdf_text"
+PDF_CACHE_MAX_BYTES=256 * 1024 * 1024  # LRU eviction beyond this total size
+
+# PDF Extraction
+PDF_EXTRACT_WORKERS=None  # Worker processes for large PDFs (None = CPU count, 1 = in-process)
+
+# Map-Reduce Generation (documents larger than the model context window)
+MAP_REDUCE_THRESHOLD_TOKENS=6000  # Estimated document tokens above which text is chunked
+CHUNK_TOKENS=3000  # Estimated tokens per chunk
+CHUNK_OVERLAP_TOKENS=200  # Estimated tokens shared by neighbouring chunks
+MAP_MAX_CHUNKS=8  # Chunks sent to the model, evenly spaced across the document
+MAP_MAX_WORKERS=4  # Generation calls running at once during the map stage
+
+# Prompt Compression
+COMPRESSION_ENABLED=True
+COMPRESSION_TOKEN_BUDGET=24000  # Max estimated tokens of document text kept for the prompts
+
+# LLM Completion Cache
+LLM_CACHE_ENABLED=True
+LLM_CACHE_PATH=".cache/llm_cache.sqlite3"
+LLM_CACHE_TTL_SECONDS=7 * 24 * 3600  # None to never expire
+LLM_CACHE_MAX_ENTRIES=10000  # LRU eviction beyond this many completions
+LLM_CACHE_SAMPLED=False  # Also cache calls at nonzero temperature, replaying one sampled answer until it expires
+
+# Crew Pool
+CREW_POOL_SIZE=4  # Max initialized crews per process, i.e. concurrent pipeline runs
+
+# Streamlit App
+RESULT_CACHE_MAX_ENTRIES=64  # Finished pipeline results kept in memory across sessions
+JOB_POLL_INTERVAL_SECONDS=1.0  # How often the page checks a running pipeline job
+
+# Batch Mode
+BATCH_OUTPUT_PATH="output/batch_results.jsonl"
+BATCH_EXTRACT_WORKERS=None  # Extraction processes, None for one per CPU
+BATCH_LLM_WORKERS=CREW_POOL_SIZE  # Documents in the LLM stages at once
+
+# LLM Backend
+LLM_BACKEND="GROQ"  # "GROQ" or "FAKE" (local deterministic stand-in, no API calls)
+FAKE_LLM_LATENCY_SECONDS=0.5  # Simulated latency of each fake LLM call
+FAKE_LLM_JITTER_SECONDS=0.0  # Max random extra latency of each fake LLM call
+FAKE_LLM_REQUESTS_PER_MINUTE=None  # Requests per minute the fake LLM accepts before answering 429, None for no limit
+FAKE_LLM_RATE_LIMIT_ERROR_RATE=0.0  # Fraction of fake LLM calls rejected with 429 at random
+FAKE_LLM_MALFORMED_RATE=0.0  # Fraction of fake LLM answers with repairable JSON errors
+
+# Tracing and Metrics
+TRACING_ENABLED=True
+TRACE_PATH="output/traces.jsonl"  # JSON-lines file of finished spans, None to keep metrics in memory only
+TRACE_MAX_BYTES=10 * 1024 * 1024  # Size at which the trace file is rotated, None to never rotate
+TRACE_BACKUP_COUNT=3  # Rotated trace files kept, as traces.jsonl.1 (newest) to traces.jsonl.3
+METRICS_SAMPLE_SIZE=1024  # Recent observations kept per timing summary for percentiles
+
+# Generation Mode
+GENERATION_MODE="SEPARATE"  # "SEPARATE" or "COMBINED" (MCQ and T/F in one call, sending the document once)
+
+# LLM Rate Limiting
+LLM_RATE_LIMIT_ENABLED=True
+LLM_REQUESTS_PER_MINUTE=30  # Provider limits of the model in use (Groq free tier by default)
+LLM_TOKENS_PER_MINUTE=6000
+LLM_EXPECTED_COMPLETION_TOKENS=1024  # Completion tokens reserved per request before the real size is known
+LLM_MAX_RETRIES=5  # Retries of a call rejected with HTTP 429
+LLM_BACKOFF_BASE_SECONDS=1.0  # First backoff ceiling, doubled on every retry
+LLM_BACKOFF_MAX_SECONDS=30.0
+
+# JSON Repair
+JSON_REPAIR_ENABLED=True  # Repair and validate task JSON locally before asking the model to convert it again
+JSON_REPAIR_ITEM_REPROMPTS=1  # Re-prompts for only the quiz items that still fail validation, before a full retry
+
+# Question Count
+NUM_QUESTIONS=5  # Default MCQ and T/F questions per quiz, larger counts are generated in parallel shards of 5
+MAX_NUM_QUESTIONS=50
+SHARD_MIN_TOKENS=800  # Minimum document slice sent to one shard
+SHARD_SPARE=1  # Extra shards generated to make up for duplicates dropped on merging
+SHARD_MAX_WORKERS=12  # Shard generation and analysis calls at once
+SHARD_ANALYSIS_MAX_ATTEMPTS=2  # Analysis calls per shard before a run whose analysis does not match its questions fails
+
+# Near-Duplicate Detection
+DEDUP_SIMILARITY_THRESHOLD=0.7  # Cosine similarity of question embeddings from which questions are duplicates
+DEDUP_DIMENSIONS=256  # Length of the hashed question embeddings
+
+# Question Bank
+QUESTION_BANK_ENABLED=True  # Serve and top up quizzes from previously generated questions of the same document
+QUESTION_BANK_PATH=".cache/question_bank.sqlite3"
+
+# Source Retrieval (grounded analysis)
+RETRIEVAL_ENABLED=True  # Give the analysis the most relevant page-tagged passages of the source for each question
+RETRIEVAL_CHUNK_TOKENS=150  # Estimated tokens per indexed passage; passages never span pages
+RETRIEVAL_TOP_K=2  # Passages retrieved per question
+RETRIEVAL_DIMENSIONS=1024  # Length of the hashed passage embeddings
+RETRIEVAL_MAX_DOCUMENTS=8  # Source indexes kept in memory
+
+# Single Question Regeneration
+REGENERATE_CONTEXT_PASSAGES=4  # Source passages near the rejected question given to the regeneration call
+REGENERATE_MAX_ATTEMPTS=2  # Regeneration calls before giving up on a replacement that is valid and duplicates no other question
+
+# Grading
+GRADING_CHUNK_ROWS=262144  # Answer sheets scored per vectorised step; bounds memory on memory-mapped batches
+GRADING_GROUP_FRACTION=0.27  # Share of top and bottom scorers compared by the discrimination index
+
+# Job Service
+JOB_SERVICE_PATH=".cache/jobs.sqlite3"
+JOB_SERVICE_PDF_DIR=".cache/job_pdfs"  # Uploaded PDFs of queued and running jobs
+JOB_SERVICE_WORKERS=CREW_POOL_SIZE  # Pipeline runs at once per worker process
+JOB_SERVICE_POLL_SECONDS=1.0  # How often idle workers and waiting clients check the queue
+JOB_SERVICE_HEARTBEAT_SECONDS=10.0  # How often workers mark their running jobs as alive
+JOB_SERVICE_STALE_SECONDS=60.0  # Running jobs without a heartbeat for this long are requeued, e.g. after a crash
+JOB_SERVICE_MAX_ATTEMPTS=3  # Runs of a job interrupted by crashes before it is marked failed
+
+# Text Normalization
+NORMALIZE_ENABLED=True  # Remove repeated headers, footers and layout noise from extracted pages before any prompt
+NORMALIZE_EDGE_LINES=3  # Lines at the top and bottom of each page checked for headers and footers
+NORMALIZE_EDGE_PAGE_FRACTION=0.3  # Share of pages a line must start or end to be removed as a header or footer
+NORMALIZE_BODY_PAGE_FRACTION=0.6  # Share of pages a line must appear anywhere on to be removed as layout noise
+NORMALIZE_MIN_PAGES=4  # Documents with fewer pages are not checked for repeated lines
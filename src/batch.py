@@ -0,0 +1,267 @@
+"""
+Batch Quiz Generation
+
+Generates quizzes for every PDF in a directory or manifest. Text extraction
+runs in a process pool and the LLM stages in a bounded thread pool. Results
+are appended to a JSON-lines file, one record per document, so an
+interrupted batch can be resumed and skips documents already done.
+
+Usage:
+    python -m src.batch path/to/pdfs --output output/batch_results.jsonl
+"""
+
+import argparse
+import json
+import os
+import threading
+import time
+from concurrent.futures import (
+    FIRST_COMPLETED,
+    ProcessPoolExecutor,
+    ThreadPoolExecutor,
+    wait,
+)
+from config.config import (
+    BATCH_EXTRACT_WORKERS,
+    BATCH_LLM_WORKERS,
+    BATCH_OUTPUT_PATH,
+    NUM_QUESTIONS,
+    RETRIEVAL_ENABLED,
+)
+from src.quiz_pipeline import generate_quiz, prepare_document
+from src.rate_limiter import PRIORITY_BATCH, llm_priority
+from src.retrieval import get_source_index
+from src.utils import is_pdf_error
+
+
+def discover_pdfs(source: str) -> list:
+    """List the PDFs to process.
+
+    Args:
+        source (str): A directory, searched recursively for *.pdf files, or a
+            manifest file with one PDF path per line (relative paths are
+            resolved against the manifest's directory)
+
+    Returns:
+        list[str]: PDF paths in a stable order
+
+    Raises:
+        FileNotFoundError: If the source does not exist
+    """
+    if os.path.isdir(source):
+        paths = [
+            os.path.join(root, name)
+            for root, _, names in os.walk(source)
+            for name in names
+            if name.lower().endswith(".pdf")
+        ]
+        return sorted(paths)
+
+    base_dir = os.path.dirname(os.path.abspath(source))
+    with open(file=source, mode="r", encoding="utf-8") as file:
+        lines = [line.strip() for line in file]
+    return [
+        line if os.path.isabs(line) else os.path.join(base_dir, line)
+        for line in lines
+        if line and not line.startswith("#")
+    ]
+
+
+def load_completed(output_path: str) -> set:
+    """Return the paths of documents already processed successfully.
+
+    Args:
+        output_path (str): JSON-lines results file of a previous run
+
+    Returns:
+        set[str]: Paths with an "ok" record
+    """
+    completed = set()
+    if not os.path.exists(output_path):
+        return completed
+    with open(file=output_path, mode="r", encoding="utf-8") as file:
+        for line in file:
+            try:
+                record = json.loads(line)
+            except json.JSONDecodeError:
+                # A partial line from an interrupted run
+                continue
+            if record.get("status") == "ok":
+                completed.add(record["path"])
+    return completed
+
+
+def _extract(path: str):
+    """Extract the prompt text and pages of one PDF inside a worker process."""
+    started = time.perf_counter()
+    txt, pages = prepare_document(path, extract_workers=1)
+    if is_pdf_error(txt):
+        raise RuntimeError(txt)
+    return txt, pages, time.perf_counter() - started
+
+
+def _generate(
+    path: str, txt: str, pages, extract_seconds: float, num_questions: int
+) -> dict:
+    """Run the LLM stages for one document and build its result record."""
+    started = time.perf_counter()
+    sources = get_source_index(pages) if RETRIEVAL_ENABLED and pages else None
+    # Interactive runs from the web app take precedence for LLM budget
+    with llm_priority(PRIORITY_BATCH):
+        mcq_json, tf_json, analysis_json = generate_quiz(
+            txt, num_questions, sources=sources
+        )
+    return {
+        "path": path,
+        "status": "ok",
+        "mcq_quiz": json.loads(mcq_json),
+        "tf_quiz": json.loads(tf_json),
+        "quiz_analysis": json.loads(analysis_json),
+        "extract_seconds": round(extract_seconds, 3),
+        "generate_seconds": round(time.perf_counter() - started, 3),
+    }
+
+
+def run_batch(
+    source: str,
+    output_path: str = BATCH_OUTPUT_PATH,
+    extract_workers: int = BATCH_EXTRACT_WORKERS,
+    llm_workers: int = BATCH_LLM_WORKERS,
+    num_questions: int = NUM_QUESTIONS,
+) -> dict:
+    """Generate quizzes for every PDF in a directory or manifest.
+
+    Documents with an "ok" record in `output_path` are skipped. At most
+    `llm_workers` documents are in the LLM stages at once, and at most twice
+    that many extracted texts wait in memory, so memory stays bounded for
+    catalogues of thousands of PDFs.
+
+    Args:
+        source (str): Directory of PDFs or manifest file
+        output_path (str): JSON-lines file results are appended to
+        extract_workers (int | None): Processes used for text extraction
+        llm_workers (int): Documents generated concurrently
+        num_questions (int): Questions in each of the MCQ and T/F quizzes
+
+    Returns:
+        dict: Throughput summary of the run
+    """
+    paths = discover_pdfs(source)
+    completed = load_completed(output_path)
+    pending = [path for path in paths if path not in completed]
+    print(
+        f"Found {len(paths)} PDFs, {len(paths) - len(pending)} already done, "
+        f"{len(pending)} to process"
+    )
+
+    output_dir = os.path.dirname(output_path)
+    if output_dir:
+        os.makedirs(output_dir, exist_ok=True)
+
+    summary = {"processed": 0, "failed": 0, "skipped": len(paths) - len(pending)}
+    write_lock = threading.Lock()
+    started = time.perf_counter()
+
+    extract_pool = ProcessPoolExecutor(max_workers=extract_workers)
+    llm_pool = ThreadPoolExecutor(
+        max_workers=llm_workers, thread_name_prefix="quiz-batch"
+    )
+    output = open(file=output_path, mode="a", encoding="utf-8")
+
+    def write_record(record):
+        with write_lock:
+            output.write(json.dumps(record) + "\n")
+            output.flush()
+            summary["processed" if record["status"] == "ok" else "failed"] += 1
+
+    queue = iter(pending)
+    in_flight = {}
+    max_in_flight = 2 * llm_workers
+
+    def fill():
+        for path in queue:
+            in_flight[extract_pool.submit(_extract, path)] = ("extract", path)
+            if len(in_flight) >= max_in_flight:
+                return
+
+    with output, extract_pool, llm_pool:
+        fill()
+        while in_flight:
+            done, _ = wait(in_flight, return_when=FIRST_COMPLETED)
+            for future in done:
+                stage, path = in_flight.pop(future)
+                try:
+                    result = future.result()
+                except Exception as e:
+                    write_record(
+                        {
+                            "path": path,
+                            "status": "failed",
+                            "stage": stage,
+                            "error": str(e),
+                        }
+                    )
+                    continue
+                if stage == "extract":
+                    txt, pages, extract_seconds = result
+                    future = llm_pool.submit(
+                        _generate, path, txt, pages, extract_seconds, num_questions
+                    )
+                    in_flight[future] = ("generate", path)
+                else:
+                    write_record(result)
+            fill()
+
+    elapsed = time.perf_counter() - started
+    summary["elapsed_seconds"] = round(elapsed, 3)
+    summary["docs_per_minute"] = (
+        round(summary["processed"] * 60 / elapsed, 2) if elapsed > 0 else 0.0
+    )
+    return summary
+
+
+def main():
+    """Command-line entry point of the batch generator."""
+    parser = argparse.ArgumentParser(
+        description="Generate quizzes for a directory or manifest of PDFs"
+    )
+    parser.add_argument("source", help="Directory of PDFs or manifest file")
+    parser.add_argument(
+        "--output", default=BATCH_OUTPUT_PATH, help="JSON-lines results file"
+    )
+    parser.add_argument(
+        "--extract-workers",
+        type=int,
+        default=BATCH_EXTRACT_WORKERS,
+        help="Processes used for text extraction",
+    )
+    parser.add_argument(
+        "--llm-workers",
+        type=int,
+        default=BATCH_LLM_WORKERS,
+        help="Documents generated concurrently",
+    )
+    parser.add_argument(
+        "--num-questions",
+        type=int,
+        default=NUM_QUESTIONS,
+        help="Questions in each of the MCQ and T/F quizzes",
+    )
+    args = parser.parse_args()
+
+    summary = run_batch(
+        args.source,
+        args.output,
+        args.extract_workers,
+        args.llm_workers,
+        args.num_questions,
+    )
+    print(
+        f"Processed {summary['processed']} PDFs ({summary['failed']} failed, "
+        f"{summary['skipped']} skipped) in {summary['elapsed_seconds']:.1f}s "
+        f"- {summary['docs_per_minute']} docs/min"
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,451 @@
+"""
+Pipeline Benchmark
+
+Measures the time and memory of each pipeline stage (extraction,
+normalization, compression, crew setup, generation, analysis and
+formatting) on the PDFs in a directory and on synthetic PDFs of a given
+page count. The LLM is the local `FakeLLM`, so runs are deterministic, free
+and need no network access; its simulated latency stands in for the model.
+The cold import time of the modules the app and workers load at start-up
+is measured too, in fresh interpreters with `python -X importtime`.
+Results are written as JSON, and can be compared against a previous
+results file to catch regressions.
+
+Usage:
+    python -m src.benchmark --pdfs data --synthetic-pages 50 500 \\
+        --output output/benchmark.json --baseline output/benchmark_baseline.json
+"""
+
+import argparse
+import json
+import os
+import platform
+import random
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+from datetime import datetime, timezone
+from config.config import (
+    COMPRESSION_TOKEN_BUDGET,
+    FAKE_LLM_LATENCY_SECONDS,
+    MAP_REDUCE_THRESHOLD_TOKENS,
+    PDF_EXTRACT_WORKERS,
+)
+from src.chunking import estimate_tokens
+from src.compression import compress_text
+from src.crew import QuizGeneratorCrew
+from src.fake_llm import FakeLLM
+from src.map_reduce import map_reduce_quizzes
+from src.normalize import normalize_pages
+from src.pdf_extractor import count_pages, join_pages
+from src.utils import format_quiz_output, process_pdf_pages
+
+# Modules imported at start-up by the app (pipeline_jobs, utils) and by job
+# service clients, when a run starts (quiz_pipeline) and when its first crew
+# is built (crew)
+IMPORT_MODULES = (
+    "src.pipeline_jobs",
+    "src.utils",
+    "src.job_service",
+    "src.quiz_pipeline",
+    "src.crew",
+)
+
+STAGES = (
+    "extraction",
+    "normalization",
+    "compression",
+    "crew_setup",
+    "generation",
+    "analysis",
+    "format",
+)
+
+_WORDS = (
+    "network layer gradient model token sequence attention vector matrix "
+    "training loss function weight bias input output hidden state memory "
+    "gate cell embedding encoder decoder batch epoch optimizer learning rate "
+    "recurrent convolution kernel feature dataset label accuracy error"
+).split()
+
+
+def make_synthetic_pdf(path: str, pages: int, lines_per_page=40, seed=0) -> str:
+    """Write a text-only PDF of `pages` pages of pseudo-technical sentences.
+
+    Args:
+        path (str): Output file path
+        pages (int): Number of pages
+        lines_per_page (int): Text lines on each page
+        seed (int): Seed of the sentence generator, so files are reproducible
+
+    Returns:
+        str: `path`
+    """
+    rng = random.Random(seed)
+    objects = [b"<< /Type /Catalog /Pages 2 0 R >>", None]
+    objects.append(b"<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica >>")
+    page_ids = []
+    for page in range(pages):
+        lines = [f"Section {page + 1}"]
+        for _ in range(lines_per_page - 1):
+            words = rng.choices(_WORDS, k=rng.randint(6, 12))
+            lines.append(" ".join(words).capitalize() + ".")
+        stream = "BT /F1 10 Tf 12 TL 50 780 Td " + " ".join(
+            f"({line}) Tj T*" for line in lines
+        )
+        stream = stream.encode("latin-1") + b" ET"
+        objects.append(
+            b"<< /Length %d >>\nstream\n%s\nendstream" % (len(stream), stream)
+        )
+        page_ids.append(len(objects) + 1)
+        objects.append(
+            b"<< /Type /Page /Parent 2 0 R /MediaBox [0 0 612 842] "
+            b"/Resources << /Font << /F1 3 0 R >> >> /Contents %d 0 R >>"
+            % (len(objects),)
+        )
+    kids = b" ".join(b"%d 0 R" % page_id for page_id in page_ids)
+    objects[1] = b"<< /Type /Pages /Kids [%s] /Count %d >>" % (kids, pages)
+
+    with open(file=path, mode="wb") as file:
+        file.write(b"%PDF-1.4\n")
+        offsets = []
+        for number, body in enumerate(objects, 1):
+            offsets.append(file.tell())
+            file.write(b"%d 0 obj\n%s\nendobj\n" % (number, body))
+        xref = file.tell()
+        file.write(b"xref\n0 %d\n0000000000 65535 f \n" % (len(objects) + 1))
+        for offset in offsets:
+            file.write(b"%010d 00000 n \n" % offset)
+        file.write(
+            b"trailer\n<< /Size %d /Root 1 0 R >>\nstartxref\n%d\n%%%%EOF\n"
+            % (len(objects) + 1, xref)
+        )
+    return path
+
+
+def _measure(stages: dict, name: str, func, *args, **kwargs):
+    """Run `func`, recording its wall time and peak memory growth under `name`."""
+    tracing = tracemalloc.is_tracing()
+    if tracing:
+        tracemalloc.reset_peak()
+        baseline, _ = tracemalloc.get_traced_memory()
+    started = time.perf_counter()
+    result = func(*args, **kwargs)
+    stages[name] = {"seconds": round(time.perf_counter() - started, 4)}
+    if tracing:
+        stages[name]["peak_bytes"] = tracemalloc.get_traced_memory()[1] - baseline
+    return result
+
+
+def _generate(generator, txt: str):
+    """Generate the MCQ and T/F quizzes the way the pipeline would.
+
+    Returns:
+        tuple: (mcq_output, tf_output), split from the single combined
+            output when GENERATION_MODE is "COMBINED"
+    """
+    if estimate_tokens(txt) > MAP_REDUCE_THRESHOLD_TOKENS:
+        return map_reduce_quizzes(generator, txt)
+    outputs = generator.run_branches(generator.new_generation_tasks(), {"text": txt})
+    if len(outputs) == 1:
+        return generator.split_combined(outputs[0])
+    return tuple(outputs)
+
+
+def benchmark_pdf(path: str, latency_seconds: float, extract_workers=None) -> dict:
+    """Run every pipeline stage once on a PDF.
+
+    The PDF text cache is bypassed so extraction is always measured.
+
+    Args:
+        path (str): PDF to benchmark
+        latency_seconds (float): Simulated latency of each LLM call
+        extract_workers (int | None): Worker processes used for extraction
+
+    Returns:
+        dict: Document size, per-stage measurements and LLM usage
+    """
+    stages = {}
+    pages = _measure(
+        stages,
+        "extraction",
+        process_pdf_pages,
+        path,
+        use_cache=False,
+        workers=extract_workers,
+    )
+    raw_txt = join_pages(pages)
+    pages, _ = _measure(stages, "normalization", normalize_pages, pages)
+    txt, _ = _measure(
+        stages,
+        "compression",
+        compress_text,
+        join_pages(pages),
+        COMPRESSION_TOKEN_BUDGET,
+    )
+    llm = FakeLLM(model="fake", temperature=0.0, latency_seconds=latency_seconds)
+    generator = _measure(stages, "crew_setup", QuizGeneratorCrew, llm=llm)
+    mcq_output, tf_output = _measure(stages, "generation", _generate, generator, txt)
+    analysis_output = _measure(
+        stages, "analysis", generator.analyze, mcq_output.raw, tf_output.raw
+    )
+    _measure(
+        stages,
+        "format",
+        format_quiz_output,
+        mcq_output.json_dict,
+        tf_output.json_dict,
+        analysis_output.json_dict,
+    )
+
+    usage = llm.get_token_usage_summary()
+    return {
+        "path": path,
+        "pages": count_pages(path),
+        "text_tokens": estimate_tokens(raw_txt),
+        "prompt_tokens": estimate_tokens(txt),
+        "llm_calls": usage.successful_requests,
+        "llm_tokens": usage.total_tokens,
+        "stages": stages,
+        "total_seconds": round(sum(stage["seconds"] for stage in stages.values()), 4),
+    }
+
+
+def profile_imports(module: str, top=5) -> dict:
+    """Measure the cold import time of a module in a fresh interpreter.
+
+    Args:
+        module (str): Dotted module name, e.g. "src.pipeline_jobs"
+        top (int): Number of slowest top-level packages to report
+
+    Returns:
+        dict: "module", "seconds" and "slowest", the cumulative import
+            seconds of the `top` slowest top-level packages it loads
+    """
+    completed = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        capture_output=True,
+        text=True,
+        check=False,
+    )
+    if completed.returncode != 0:
+        raise RuntimeError(f"Failed to import {module}: {completed.stderr[-500:]}")
+
+    # Lines read "import time: <self us> | <cumulative us> | <indented name>",
+    # each module after the modules it imported
+    packages = {}
+    seconds = 0.0
+    for line in completed.stderr.splitlines():
+        if not line.startswith("import time:") or "|" not in line:
+            continue
+        _, cumulative, name = line.split("|")
+        if not cumulative.strip().isdigit():
+            continue
+        top_level = len(name) - len(name.lstrip()) == 1
+        name = name.strip()
+        cumulative = int(cumulative) / 1e6
+        if top_level and name == module:
+            seconds = cumulative
+            break
+        if top_level:
+            # Imported by the interpreter start-up, not by the module
+            packages.clear()
+        elif "." not in name:
+            packages[name] = max(cumulative, packages.get(name, 0.0))
+    slowest = sorted(packages.items(), key=lambda item: item[1], reverse=True)[:top]
+    return {
+        "module": module,
+        "seconds": round(seconds, 4),
+        "slowest": {name: round(value, 4) for name, value in slowest},
+    }
+
+
+def run_benchmarks(
+    pdf_dir="data",
+    synthetic_pages=(),
+    latency_seconds=FAKE_LLM_LATENCY_SECONDS,
+    trace_memory=True,
+    extract_workers=PDF_EXTRACT_WORKERS,
+    import_modules=IMPORT_MODULES,
+) -> dict:
+    """Benchmark the pipeline on the PDFs in a directory and on synthetic PDFs.
+
+    Args:
+        pdf_dir (str | None): Directory of PDFs to benchmark
+        synthetic_pages (iterable[int]): Page counts of synthetic PDFs to generate
+        latency_seconds (float): Simulated latency of each LLM call
+        trace_memory (bool): Record per-stage peak memory with tracemalloc,
+            which slows CPU-bound stages down
+        extract_workers (int | None): Worker processes used for extraction
+        import_modules (iterable[str]): Modules whose cold import is timed
+
+    Returns:
+        dict: Run metadata, the import time of each module and one result
+            per document
+    """
+    imports = []
+    for module in import_modules:
+        print(f"Profiling the import of {module}")
+        imports.append(profile_imports(module))
+
+    paths = []
+    if pdf_dir:
+        paths = sorted(
+            os.path.join(pdf_dir, name)
+            for name in os.listdir(pdf_dir)
+            if name.lower().endswith(".pdf")
+        )
+
+    results = []
+    if trace_memory:
+        tracemalloc.start()
+    try:
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            for pages in synthetic_pages:
+                paths.append(
+                    make_synthetic_pdf(
+                        os.path.join(tmp_dir, f"synthetic_{pages}p.pdf"), pages
+                    )
+                )
+            for path in paths:
+                print(f"Benchmarking {path}")
+                result = benchmark_pdf(path, latency_seconds, extract_workers)
+                if path.startswith(tmp_dir):
+                    result["path"] = f"synthetic:{result['pages']}p"
+                results.append(result)
+    finally:
+        if trace_memory:
+            tracemalloc.stop()
+
+    return {
+        "created_at": datetime.now(timezone.utc).isoformat(),
+        "python": sys.version.split()[0],
+        "platform": platform.platform(),
+        "cpu_count": os.cpu_count(),
+        "llm_latency_seconds": latency_seconds,
+        "trace_memory": trace_memory,
+        "imports": imports,
+        "results": results,
+    }
+
+
+def compare_results(current: dict, baseline: dict, tolerance=0.2) -> list:
+    """List stages that got slower than the baseline by more than `tolerance`.
+
+    Stages are matched by document path, and module imports by module name.
+    Timings under 10 ms in the baseline are ignored, since they are mostly
+    noise.
+
+    Args:
+        current (dict): Results of `run_benchmarks`
+        baseline (dict): Earlier results of `run_benchmarks`
+        tolerance (float): Allowed relative slowdown, e.g. 0.2 for 20%
+
+    Returns:
+        list[str]: One message per regressed stage
+    """
+    baseline_docs = {result["path"]: result for result in baseline["results"]}
+    regressions = []
+    for result in current["results"]:
+        previous = baseline_docs.get(result["path"])
+        if previous is None:
+            continue
+        for stage, measure in result["stages"].items():
+            before = previous["stages"].get(stage, {}).get("seconds")
+            if before is None or before < 0.01:
+                continue
+            if measure["seconds"] > before * (1 + tolerance):
+                regressions.append(
+                    f"{result['path']} {stage}: {before:.3f}s -> {measure['seconds']:.3f}s"
+                )
+
+    baseline_imports = {
+        entry["module"]: entry["seconds"] for entry in baseline.get("imports", [])
+    }
+    for entry in current.get("imports", []):
+        before = baseline_imports.get(entry["module"])
+        if before is None or before < 0.01:
+            continue
+        if entry["seconds"] > before * (1 + tolerance):
+            regressions.append(
+                f"import {entry['module']}: {before:.3f}s -> {entry['seconds']:.3f}s"
+            )
+    return regressions
+
+
+def main():
+    """Command-line entry point of the benchmark."""
+    parser = argparse.ArgumentParser(description="Benchmark the quiz pipeline")
+    parser.add_argument("--pdfs", default="data", help="Directory of PDFs to benchmark")
+    parser.add_argument(
+        "--synthetic-pages",
+        type=int,
+        nargs="*",
+        default=[50, 500],
+        help="Page counts of synthetic PDFs to benchmark",
+    )
+    parser.add_argument(
+        "--latency",
+        type=float,
+        default=FAKE_LLM_LATENCY_SECONDS,
+        help="Simulated latency of each LLM call in seconds",
+    )
+    parser.add_argument(
+        "--no-memory", action="store_true", help="Skip per-stage memory tracing"
+    )
+    parser.add_argument(
+        "--output", default="output/benchmark.json", help="JSON results file"
+    )
+    parser.add_argument(
+        "--imports",
+        nargs="*",
+        default=list(IMPORT_MODULES),
+        help="Modules whose cold import time is measured",
+    )
+    parser.add_argument("--baseline", help="Earlier results file to compare against")
+    parser.add_argument(
+        "--tolerance",
+        type=float,
+        default=0.2,
+        help="Allowed relative slowdown per stage before failing",
+    )
+    args = parser.parse_args()
+
+    report = run_benchmarks(
+        args.pdfs,
+        args.synthetic_pages,
+        args.latency,
+        not args.no_memory,
+        import_modules=args.imports,
+    )
+    output_dir = os.path.dirname(args.output)
+    if output_dir:
+        os.makedirs(output_dir, exist_ok=True)
+    with open(file=args.output, mode="w", encoding="utf-8") as file:
+        json.dump(report, file, indent=2)
+
+    for entry in report["imports"]:
+        slowest = ", ".join(
+            f"{name} {seconds:.3f}s" for name, seconds in entry["slowest"].items()
+        )
+        print(f"import {entry['module']}: {entry['seconds']:.3f}s ({slowest})")
+    for result in report["results"]:
+        timings = ", ".join(
+            f"{stage} {result['stages'][stage]['seconds']:.3f}s" for stage in STAGES
+        )
+        print(f"{result['path']} ({result['pages']} pages): {timings}")
+    print(f"Results written to {args.output}")
+
+    if args.baseline:
+        with open(file=args.baseline, mode="r", encoding="utf-8") as file:
+            regressions = compare_results(report, json.load(file), args.tolerance)
+        for regression in regressions:
+            print(f"Regression: {regression}")
+        if regressions:
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
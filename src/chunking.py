@@ -0,0 +1,113 @@
+"""Token-budgeted text chunking for documents larger than the model context"""
+
+import math
+
+# Rough average for English text with BPE tokenizers
+CHARS_PER_TOKEN = 4
+
+
+def estimate_tokens(text: str) -> int:
+    """Estimate the number of LLM tokens in a text.
+
+    Args:
+        text (str): Text to measure
+
+    Returns:
+        int: Approximate token count
+    """
+    return math.ceil(len(text) / CHARS_PER_TOKEN)
+
+
+def _split_long_line(line: str, max_tokens: int) -> list:
+    """Split a single line that exceeds the budget on word boundaries."""
+    pieces = []
+    current = []
+    current_tokens = 0
+    for word in line.split():
+        word_tokens = estimate_tokens(word) + 1
+        if current and current_tokens + word_tokens > max_tokens:
+            pieces.append(" ".join(current))
+            current, current_tokens = [], 0
+        current.append(word)
+        current_tokens += word_tokens
+    if current:
+        pieces.append(" ".join(current))
+    return pieces
+
+
+def chunk_text(text: str, max_tokens: int, overlap_tokens: int = 0) -> list:
+    """Split text into overlapping chunks that each fit a token budget.
+
+    Chunks are built from whole lines so sentences on a line are not cut.
+    Each chunk after the first starts with the trailing lines of the previous
+    chunk, up to `overlap_tokens`, so concepts spanning a boundary appear
+    in full in at least one chunk.
+
+    Args:
+        text (str): Text to split
+        max_tokens (int): Maximum estimated tokens per chunk
+        overlap_tokens (int): Estimated tokens repeated between neighbouring chunks
+
+    Returns:
+        list[str]: Chunks in document order
+
+    Raises:
+        ValueError: If the overlap is not smaller than the chunk budget
+    """
+    if overlap_tokens >= max_tokens:
+        raise ValueError("overlap_tokens must be smaller than max_tokens")
+
+    lines = []
+    for line in text.splitlines():
+        if not line.strip():
+            continue
+        if estimate_tokens(line) > max_tokens:
+            lines.extend(_split_long_line(line, max_tokens))
+        else:
+            lines.append(line)
+
+    chunks = []
+    current = []
+    current_tokens = 0
+    for line in lines:
+        line_tokens = estimate_tokens(line) + 1
+        if current and current_tokens + line_tokens > max_tokens:
+            chunks.append("\n".join(current))
+            # Carry the tail of the finished chunk into the next one
+            overlap = []
+            overlap_size = 0
+            for previous in reversed(current):
+                previous_tokens = estimate_tokens(previous) + 1
+                if overlap_size + previous_tokens > overlap_tokens:
+                    break
+                overlap.insert(0, previous)
+                overlap_size += previous_tokens
+            # Make sure the carried overlap still leaves room for this line
+            while overlap and overlap_size + line_tokens > max_tokens:
+                overlap_size -= estimate_tokens(overlap.pop(0)) + 1
+            current, current_tokens = overlap, overlap_size
+        current.append(line)
+        current_tokens += line_tokens
+    if current:
+        chunks.append("\n".join(current))
+    return chunks
+
+
+def spread_indices(count: int, k: int) -> list:
+    """Pick up to k indices out of range(count), evenly spaced across the range.
+
+    Args:
+        count (int): Number of available indices
+        k (int): Number of indices to pick
+
+    Returns:
+        list[int]: Sorted, distinct indices including both ends when k > 1
+    """
+    if k >= count:
+        return list(range(count))
+    if k <= 0:
+        return []
+    if k == 1:
+        return [count // 2]
+    step = (count - 1) / (k - 1)
+    return [round(i * step) for i in range(k)]
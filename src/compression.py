@@ -0,0 +1,231 @@
+"""Extractive compression of document text before it reaches the LLM"""
+
+import re
+from collections import Counter
+import numpy as np
+from src.chunking import estimate_tokens
+
+_SENTENCE_END = re.compile(r"(?<=[.!?])\s+(?=[A-Z0-9\"'(\[])")
+_BULLETS = "●○•▪■◦►-–*"
+_WORD = re.compile(r"[a-z][a-z0-9\-]+")
+_TOC_LINE = re.compile(r"(\.{4,}|(\s\.){4,})\s*\d+\s*$")
+_REFERENCES_HEADING = re.compile(
+    r"^\s*(\d+\.?\s*)?(references|bibliography|works cited)\s*$", re.IGNORECASE
+)
+_STOP_WORDS = frozenset(
+    "a an the and or but if of to in on at by for with from as is are was were be "
+    "been being this that these those it its into than then there their they we you "
+    "he she his her our your not no can will would should could may might also such "
+    "which who whom what when where how all any each more most other some so very".split()
+)
+
+
+def split_sentences(text: str, max_words: int = 50) -> list:
+    """Split extracted PDF text into sentences.
+
+    PDF extraction breaks lines mid-sentence, and some files put every word
+    on its own line, so lines are joined until one ends with sentence
+    punctuation or a bullet starts a new item. Segments are then split on
+    sentence boundaries, and run-on segments (e.g. unpunctuated slides) are
+    cut every `max_words` words.
+
+    Args:
+        text (str): Extracted document text
+        max_words (int): Maximum number of words per sentence
+
+    Returns:
+        list[str]: Sentences in document order
+    """
+    segments = []
+    current = []
+    for line in text.splitlines():
+        line = line.strip()
+        if not line:
+            continue
+        if line[0] in _BULLETS:
+            if current:
+                segments.append(" ".join(current))
+            line = line.lstrip(_BULLETS).strip()
+            current = [line] if line else []
+            continue
+        current.append(line)
+        if line.endswith((".", "!", "?", ":")):
+            segments.append(" ".join(current))
+            current = []
+    if current:
+        segments.append(" ".join(current))
+
+    sentences = []
+    for segment in segments:
+        for part in _SENTENCE_END.split(segment):
+            words = part.split()
+            for start in range(0, len(words), max_words):
+                sentences.append(" ".join(words[start : start + max_words]))
+    return sentences
+
+
+def _strip_boilerplate(sentences: list) -> list:
+    """Drop table-of-contents lines, repeated sentences and the reference list."""
+    # Cut a trailing references section, only if it starts in the last third
+    for index in range(len(sentences) - 1, int(len(sentences) * 2 / 3) - 1, -1):
+        if _REFERENCES_HEADING.match(sentences[index]):
+            sentences = sentences[:index]
+            break
+
+    counts = Counter(sentence.lower() for sentence in sentences)
+    kept = []
+    seen = set()
+    for sentence in sentences:
+        key = sentence.lower()
+        if _TOC_LINE.search(sentence) or key in seen:
+            continue
+        # Sentences repeated many times are headers, footers or slide titles
+        if counts[key] > 2 and len(sentence) < 120:
+            continue
+        seen.add(key)
+        kept.append(sentence)
+    return kept
+
+
+class _SparseRows:
+    """
+    Sentence-by-term matrix stored as its non-zero entries (row, column, value)
+
+    A document of tens of thousands of sentences has only a few dozen terms
+    per sentence, so the entries take a few MB where a dense matrix over the
+    whole vocabulary would take hundreds. Products are computed with
+    `np.bincount` over the entries.
+    """
+
+    def __init__(self, rows, columns, values, shape):
+        self.rows = rows
+        self.columns = columns
+        self.values = values
+        self.shape = shape
+
+    def dot(self, vector):
+        """Return matrix @ vector, one value per row."""
+        return np.bincount(
+            self.rows,
+            weights=self.values * vector[self.columns],
+            minlength=self.shape[0],
+        )
+
+    def tdot(self, vector):
+        """Return matrix.T @ vector, one value per column."""
+        return np.bincount(
+            self.columns,
+            weights=self.values * vector[self.rows],
+            minlength=self.shape[1],
+        )
+
+    def row_sums(self, squared=False):
+        """Return the sum, or the sum of squares, of each row."""
+        values = self.values * self.values if squared else self.values
+        return np.bincount(self.rows, weights=values, minlength=self.shape[0])
+
+    def column_sums(self):
+        """Return the sum of each column."""
+        return np.bincount(self.columns, weights=self.values, minlength=self.shape[1])
+
+
+def _tfidf_matrix(sentences: list, max_features: int) -> _SparseRows:
+    """Build an L2-normalized TF-IDF matrix with one row per sentence."""
+    tokenized = [
+        [word for word in _WORD.findall(sentence.lower()) if word not in _STOP_WORDS]
+        for sentence in sentences
+    ]
+    document_frequency = Counter(word for words in tokenized for word in set(words))
+    vocabulary = {
+        word: index
+        for index, (word, _) in enumerate(document_frequency.most_common(max_features))
+    }
+
+    rows, columns, counts = [], [], []
+    for row, words in enumerate(tokenized):
+        term_counts = Counter(word for word in words if word in vocabulary)
+        for word, count in term_counts.items():
+            rows.append(row)
+            columns.append(vocabulary[word])
+            counts.append(count)
+    rows = np.array(rows, dtype=np.int64)
+    columns = np.array(columns, dtype=np.int64)
+
+    df = np.array([document_frequency[word] for word in vocabulary], dtype=np.float64)
+    idf = np.log((1.0 + len(sentences)) / (1.0 + df)) + 1.0
+    values = np.log1p(np.array(counts, dtype=np.float64)) * idf[columns]
+    matrix = _SparseRows(rows, columns, values, (len(sentences), len(vocabulary)))
+    norms = np.sqrt(matrix.row_sums(squared=True))
+    matrix.values = values / norms[rows]
+    return matrix
+
+
+def _centrality(matrix: _SparseRows, iterations: int = 30, damping: float = 0.85):
+    """Continuous LexRank centrality of each sentence.
+
+    The sentence similarity matrix S = X @ X.T is never materialized, so
+    memory stays linear in the number of non-zero entries: every product
+    with S is computed as X @ (X.T @ v).
+    """
+    count = matrix.shape[0]
+    self_similarity = matrix.row_sums(squared=True)
+    degree = matrix.dot(matrix.column_sums()) - self_similarity
+    degree[degree <= 0] = 1.0
+
+    scores = np.full(count, 1.0 / count)
+    for _ in range(iterations):
+        weighted = scores / degree
+        propagated = matrix.dot(matrix.tdot(weighted)) - self_similarity * weighted
+        scores = (1.0 - damping) / count + damping * propagated
+    return scores
+
+
+def compress_text(text: str, token_budget: int, max_features: int = 2048):
+    """Compress document text to the most informative sentences within a budget.
+
+    Boilerplate (table of contents, repeated headers, reference lists and
+    duplicate sentences) is always removed. If the remaining text is still
+    over `token_budget`, sentences are scored by LexRank centrality combined
+    with their TF-IDF weight and the best ones are kept in document order
+    until the budget is filled.
+
+    Args:
+        text (str): Extracted document text
+        token_budget (int): Maximum estimated tokens of the compressed text
+        max_features (int): Vocabulary size of the TF-IDF matrix
+
+    Returns:
+        tuple[str, dict]: Compressed text and statistics with
+            `original_tokens`, `compressed_tokens` and `compression_ratio`
+            (compressed / original)
+    """
+    original_tokens = estimate_tokens(text)
+    sentences = _strip_boilerplate(split_sentences(text))
+    lengths = np.array([estimate_tokens(s) + 1 for s in sentences], dtype=np.int64)
+
+    if sentences and lengths.sum() > token_budget:
+        matrix = _tfidf_matrix(sentences, max_features)
+        centrality = _centrality(matrix)
+        informativeness = matrix.row_sums()
+        scores = centrality / (centrality.max() or 1.0) + 0.5 * (
+            informativeness / (informativeness.max() or 1.0)
+        )
+
+        keep = np.zeros(len(sentences), dtype=bool)
+        used = 0
+        for index in np.argsort(-scores, kind="stable"):
+            if used + lengths[index] <= token_budget:
+                keep[index] = True
+                used += lengths[index]
+        sentences = [s for s, kept in zip(sentences, keep) if kept]
+
+    compressed = "\n".join(sentences)
+    compressed_tokens = estimate_tokens(compressed)
+    stats = {
+        "original_tokens": original_tokens,
+        "compressed_tokens": compressed_tokens,
+        "compression_ratio": (
+            compressed_tokens / original_tokens if original_tokens else 1.0
+        ),
+    }
+    return compressed, stats
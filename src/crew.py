@@ -1,11 +1,44 @@
 """Quiz Generator Crew Module"""
 
+import json
 import os
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from functools import lru_cache
 import yaml
 from crewai import Agent, Task, Crew, Process, LLM
-from config.config import OUTPUT_PATH
-from src.pydantic_models import MCQQuiz, QuizAnalysisOutput, TrueFalseQuiz
-from src.utils import create_output_dir
+from crewai.crews.crew_output import CrewOutput
+from crewai.tasks.output_format import OutputFormat
+from crewai.tasks.task_output import TaskOutput
+from config.config import (
+    EXECUTION_MODE,
+    FAKE_LLM_JITTER_SECONDS,
+    FAKE_LLM_LATENCY_SECONDS,
+    FAKE_LLM_MALFORMED_RATE,
+    FAKE_LLM_RATE_LIMIT_ERROR_RATE,
+    FAKE_LLM_REQUESTS_PER_MINUTE,
+    GENERATION_MODE,
+    JSON_REPAIR_ENABLED,
+    LLM_BACKEND,
+    LLM_CACHE_ENABLED,
+    LLM_RATE_LIMIT_ENABLED,
+    MAX_CONCURRENCY,
+    TRACING_ENABLED,
+)
+from src.fake_llm import FakeLLM
+from src.json_repair import RepairingConverter
+from src.llm_cache import CachedLLM, get_llm_cache
+from src.llm_tracing import TracedLLM
+from src.rate_limiter import ScheduledLLM, get_rate_limiter
+from src.retrieval import NO_SOURCES, quiz_sources
+from src.pydantic_models import (
+    CombinedQuiz,
+    MCQQuiz,
+    QuizAnalysisOutput,
+    RegeneratedMCQ,
+    RegeneratedTrueFalse,
+    TrueFalseQuiz,
+)
+from src.tracing import span, submit_in_context
 
 
 class QuizGeneratorCrew:
@@ -17,18 +50,33 @@ class QuizGeneratorCrew:
     2. Analyzing the quality of generated MCQs.
     """
 
-    def __init__(self):
-        """Initialize the QuizGeneratorCrew class."""
+    def __init__(self, llm=None):
+        """Initialize the QuizGeneratorCrew class.
+
+        Task outputs are kept in memory rather than written to OUTPUT_PATH, so
+        instances can be reused across runs (see `src.crew_pool`). A single
+        instance must not run two kickoffs at the same time.
+
+        Args:
+            llm (BaseLLM | None): LLM used by every agent, used as given.
+                Defaults to the LLM selected by LLM_BACKEND.
+        """
         try:
-            create_output_dir()
-            self.agents_config, self.tasks_config = self._load_config()
-            self.llm = self._initialize_llm()
-            self.agents = self._initialize_agents(self.agents_config)
-            self.tasks = self._initialize_tasks(self.tasks_config)
+            with span("crew_setup"):
+                self.agents_config, self.tasks_config = self._load_config()
+                self.llm = llm if llm is not None else self._initialize_llm()
+                self.agents = self._initialize_agents(self.agents_config)
+                self.tasks = self._initialize_tasks(self.tasks_config)
+                self.combined_task = self._build_task(
+                    "combined_quiz_generate", self.agents[0], CombinedQuiz
+                )
         except Exception as e:
             raise RuntimeError(f"Failed to initialize QuizGeneratorCrew: {e}") from e
 
-    def _load_config(self):
+    @staticmethod
+    @lru_cache(maxsize=None)
+    def _load_config():
+        # YAML files are read once per process and shared by all instances
         # Load agent configuration from YAML
         try:
             with open(file="config/agents.yaml", mode="r", encoding="utf-8") as file:
@@ -49,17 +97,44 @@ class QuizGeneratorCrew:
         """
         Initialize the LLM
 
+        LLM_BACKEND "GROQ" uses the model from the environment, "FAKE" the
+        local `FakeLLM`, which needs no API key. When LLM_RATE_LIMIT_ENABLED,
+        calls are scheduled through the process-wide rate limiter. When
+        LLM_CACHE_ENABLED, identical calls are served from the persistent
+        completion cache without using rate-limit budget, and when
+        TRACING_ENABLED every call is recorded as a span.
+
         Returns:
             LLM: Configured language model instance.
         """
         try:
-            return LLM(
-                # provider=PROVIDER,
-                model=os.getenv("MODEL"),
-                # base_url="http://localhost:11434",
-                temperature=float(os.getenv("TEMPERATURE")),
-                api_key=os.getenv("GROQ_API_KEY"),
-            )
+            if LLM_BACKEND == "FAKE":
+                llm = FakeLLM(
+                    model="fake",
+                    temperature=0.0,
+                    latency_seconds=FAKE_LLM_LATENCY_SECONDS,
+                    jitter_seconds=FAKE_LLM_JITTER_SECONDS,
+                    requests_per_minute=FAKE_LLM_REQUESTS_PER_MINUTE,
+                    rate_limit_error_rate=FAKE_LLM_RATE_LIMIT_ERROR_RATE,
+                    malformed_rate=FAKE_LLM_MALFORMED_RATE,
+                )
+            elif LLM_BACKEND == "GROQ":
+                llm = LLM(
+                    # provider=PROVIDER,
+                    model=os.getenv("MODEL"),
+                    # base_url="http://localhost:11434",
+                    temperature=float(os.getenv("TEMPERATURE")),
+                    api_key=os.getenv("GROQ_API_KEY"),
+                )
+            else:
+                raise ValueError("LLM_BACKEND must be ('GROQ' or 'FAKE')")
+            if LLM_RATE_LIMIT_ENABLED:
+                llm = ScheduledLLM(inner=llm, limiter=get_rate_limiter())
+            if LLM_CACHE_ENABLED:
+                llm = CachedLLM(inner=llm, cache=get_llm_cache())
+            if TRACING_ENABLED:
+                llm = TracedLLM(inner=llm)
+            return llm
         except Exception as e:
             raise RuntimeError(f"Failed to initialize LLM: {e}") from e
 
@@ -100,6 +175,33 @@ class QuizGeneratorCrew:
         except Exception as e:
             raise RuntimeError(f"Failed to initialize agents: {e}") from e
 
+    def _build_task(self, key, agent, output_json, context=None) -> Task:
+        """Create a task from its entry in tasks.yaml.
+
+        Args:
+            key (str): Task key in tasks.yaml
+            agent (Agent): Agent assigned to the task
+            output_json (type[BaseModel]): Pydantic model of the task output
+            context (list[Task] | None): Tasks whose output is passed as context
+
+        Returns:
+            Task: The configured task
+        """
+        config = self.tasks_config[key]
+        task_kwargs = {}
+        if context is not None:
+            task_kwargs["context"] = context
+        if JSON_REPAIR_ENABLED:
+            task_kwargs["converter_cls"] = RepairingConverter
+        return Task(
+            name=config["name"],
+            description=(config["description"]),
+            expected_output=(config["expected_output"]),
+            agent=agent,
+            output_json=output_json,
+            **task_kwargs,
+        )
+
     def _initialize_tasks(self, config) -> list:
         """Create a task for quiz generation.
 
@@ -107,55 +209,361 @@ class QuizGeneratorCrew:
             list: List of Task objects for quiz generation and analysis.
         """
         try:
-            mcq_generate_task = Task(
-                name=config["quiz_generate"]["name"],
-                description=(config["quiz_generate"]["description"]),
-                expected_output=(config["quiz_generate"]["expected_output"]),
-                agent=self.agents[0],
-                output_file=os.path.join(OUTPUT_PATH, "mcq_quiz.json"),
-                output_json=MCQQuiz,
+            mcq_generate_task = self._build_task(
+                "quiz_generate", self.agents[0], MCQQuiz
             )
-            tf_generate_task = Task(
-                name=config["tf_question_task"]["name"],
-                description=(config["tf_question_task"]["description"]),
-                expected_output=(config["tf_question_task"]["expected_output"]),
-                agent=self.agents[2],
-                output_file=os.path.join(OUTPUT_PATH, "tf_quiz.json"),
-                output_json=TrueFalseQuiz,
-                # async_execution=True
+            tf_generate_task = self._build_task(
+                "tf_question_task", self.agents[2], TrueFalseQuiz
             )
-            analysis_generate_task = Task(
-                name=config["quiz_analysis"]["name"],
-                description=(config["quiz_analysis"]["description"]),
-                expected_output=(config["quiz_analysis"]["expected_output"]),
-                agent=self.agents[1],
+            analysis_generate_task = self._build_task(
+                "quiz_analysis",
+                self.agents[1],
+                QuizAnalysisOutput,
                 context=[mcq_generate_task, tf_generate_task],
-                output_file=os.path.join(OUTPUT_PATH, "quiz_analysis.json"),
-                output_json=QuizAnalysisOutput,
             )
             return [mcq_generate_task, tf_generate_task, analysis_generate_task]
         except Exception as e:
             raise RuntimeError(f"Failed to create tasks: {e}") from e
 
-    def kickoff(self, inputs):
+    def new_generation_tasks(self) -> list:
+        """Create fresh MCQ and T/F generation tasks with their own agents.
+
+        Unlike `self.tasks`, the returned tasks share no state with other
+        runs, so several sets can run at the same time, e.g. one per
+        document chunk. In "COMBINED" GENERATION_MODE a single task generates
+        both quizzes.
+
+        Returns:
+            list: [(agent, mcq_task), (agent, tf_task)] pairs, or
+                [(agent, combined_task)] in "COMBINED" mode
+        """
+        try:
+            agents = self._initialize_agents(self.agents_config)
+            if GENERATION_MODE == "COMBINED":
+                return [
+                    (
+                        agents[0],
+                        self._build_task(
+                            "combined_quiz_generate", agents[0], CombinedQuiz
+                        ),
+                    )
+                ]
+            return [
+                (agents[0], self._build_task("quiz_generate", agents[0], MCQQuiz)),
+                (
+                    agents[2],
+                    self._build_task("tf_question_task", agents[2], TrueFalseQuiz),
+                ),
+            ]
+        except Exception as e:
+            raise RuntimeError(f"Failed to create generation tasks: {e}") from e
+
+    def analyze(self, mcq_json, tf_json, isolated=False, sources=None):
+        """Run the analysis task on already generated quizzes.
+
+        Args:
+            mcq_json (str): MCQ quiz as a JSON string
+            tf_json (str): True/False quiz as a JSON string
+            isolated (bool): Use a fresh agent, so several analyses can run
+                at the same time
+            sources (SourceIndex | None): Index of the source document; the
+                passages relevant to each question are added to the prompt
+
+        Returns:
+            CrewOutput: Output of the analysis task
+        """
+        try:
+            agent = self.agents[1]
+            if isolated:
+                agent = self._initialize_agents(self.agents_config)[1]
+            task = self._build_task(
+                "quiz_analysis_standalone", agent, QuizAnalysisOutput
+            )
+            inputs = {
+                "mcq_quiz": mcq_json,
+                "tf_quiz": tf_json,
+                "sources": quiz_sources(
+                    sources, json.loads(mcq_json), json.loads(tf_json)
+                ),
+            }
+            return self.run_task(agent, task, inputs)
+        except Exception as e:
+            raise RuntimeError(f"Failed to analyze quiz: {e}") from e
+
+    def regenerate_question(self, kind, question, other_questions, sources):
+        """Generate one replacement question and its analysis in a single call.
+
+        Args:
+            kind (str): "mcq" or "tf"
+            question (dict): The rejected question
+            other_questions (list[dict]): Questions the replacement must not
+                repeat, e.g. the rest of the quiz
+            sources (str): Source passages to base the replacement on
+
+        Returns:
+            CrewOutput: Output of the regeneration task, shaped like a
+                `RegeneratedMCQ` or `RegeneratedTrueFalse`
+
+        Raises:
+            ValueError: If kind is not "mcq" or "tf"
+        """
+        if kind == "mcq":
+            agent, model = self.agents[0], RegeneratedMCQ
+            question_type = "multiple-choice question with exactly 4 options"
+        elif kind == "tf":
+            agent, model = self.agents[2], RegeneratedTrueFalse
+            question_type = 'True/False question with the options ["True", "False"]'
+        else:
+            raise ValueError(f"kind must be 'mcq' or 'tf', got {kind!r}")
+        try:
+            task = self._build_task("question_regenerate", agent, model)
+            inputs = {
+                "question_type": question_type,
+                "question": question["question"],
+                "other_questions": "\n".join(
+                    f"- {other['question']}" for other in other_questions
+                )
+                or "None",
+                "sources": sources,
+            }
+            return self.run_task(agent, task, inputs)
+        except Exception as e:
+            raise RuntimeError(f"Failed to regenerate question: {e}") from e
+
+    def kickoff(self, inputs, sources=None, on_result=None):
         """Kickoff the quiz generation process.
 
+        In "CONCURRENT" mode the MCQ and T/F generation tasks run in parallel
+        and the analysis task starts once both have finished. In "SEQUENTIAL"
+        mode all tasks run one after another in a single crew. When
+        GENERATION_MODE is "COMBINED", both quizzes are generated by a single
+        call instead, whatever the EXECUTION_MODE, so the document is sent to
+        the model once.
+
         Args:
             inputs (dict): Dictionary containing input parameters.
                 Required key:
                 - text (str): The text content to generate quiz from
+            sources (SourceIndex | None): Index of the source document. The
+                analysis receives the passages relevant to each question,
+                except in "SEQUENTIAL" mode, where the questions are not
+                known before the analysis task starts.
+            on_result (callable | None): Called as on_result(task_name,
+                json_dict) with each task output as soon as it is ready, e.g.
+                to show the MCQ quiz while the analysis is still running
 
         Returns:
-            dict: The generated quiz in JSON format
+            CrewOutput: The generated quiz, with one entry per task in `tasks_output`
+
+        Raises:
+            RuntimeError: If any task fails or EXECUTION_MODE is invalid
         """
         try:
-            crew = Crew(
-                agents=self.agents,
-                tasks=self.tasks,
-                process=Process.sequential,
-                verbose=True,
-            )
-            print("Crew initialized successfully!")
-            return crew.kickoff(inputs=inputs)
+            if GENERATION_MODE == "COMBINED":
+                return self._kickoff_combined(inputs, sources, on_result)
+            if EXECUTION_MODE == "CONCURRENT":
+                return self._kickoff_concurrent(inputs, sources, on_result)
+            if EXECUTION_MODE == "SEQUENTIAL":
+                return self._kickoff_sequential(
+                    {"sources": NO_SOURCES, **inputs}, on_result
+                )
         except Exception as e:
             raise RuntimeError(f"Failed to kickoff crew: {e}") from e
+        raise RuntimeError(
+            "Error: EXECUTION_MODE must be ('CONCURRENT' or 'SEQUENTIAL')"
+            "Please update in config.py file"
+        )
+
+    def _kickoff_sequential(self, inputs, on_result=None):
+        """Run all tasks one after another in a single crew.
+
+        The crew is traced as one "sequential_crew" span; per-task timings
+        are only recorded in CONCURRENT mode. Task outputs are reported
+        through the crew's task callback.
+        """
+        crew = Crew(
+            agents=self.agents,
+            tasks=self.tasks,
+            process=Process.sequential,
+            verbose=True,
+            task_callback=lambda task_output: self.report(on_result, [task_output]),
+        )
+        print("Crew initialized successfully!")
+        with span("sequential_crew"):
+            return crew.kickoff(inputs=inputs)
+
+    def _kickoff_combined(self, inputs, sources=None, on_result=None):
+        """Generate both quizzes in one call, then run the analysis task on them."""
+        combined_output = self.run_task(self.agents[0], self.combined_task, inputs)
+        mcq_output, tf_output = self.split_combined(combined_output)
+        self.report(on_result, mcq_output.tasks_output + tf_output.tasks_output)
+        analysis_output = self.analyze(mcq_output.raw, tf_output.raw, sources=sources)
+        self.report(on_result, analysis_output.tasks_output)
+        return self.merge_outputs([mcq_output, tf_output, analysis_output])
+
+    def split_combined(self, combined_output):
+        """Split the output of the combined task into MCQ and T/F outputs.
+
+        Args:
+            combined_output (CrewOutput): Output of the combined generation task
+
+        Returns:
+            tuple: (mcq_output, tf_output) CrewOutputs shaped like the outputs
+                of the separate generation tasks. The MCQ output carries the
+                token usage of the combined call.
+        """
+        combined = CombinedQuiz.model_validate(combined_output.json_dict)
+        mcq_task, tf_task, _ = self.tasks
+        mcq_output = self.quiz_output(mcq_task, combined.mcq_quiz)
+        mcq_output.token_usage.add_usage_metrics(combined_output.token_usage)
+        return mcq_output, self.quiz_output(tf_task, combined.tf_quiz)
+
+    def _kickoff_concurrent(self, inputs, sources=None, on_result=None):
+        """Run the MCQ and T/F tasks in parallel, then fan in to the analysis task.
+
+        Each generation task runs in its own single-task crew on a thread pool
+        bounded by MAX_CONCURRENCY, and is reported as soon as it finishes.
+        If either branch fails, pending branches are cancelled and the
+        analysis task is never started.
+        """
+        mcq_task, tf_task, analysis_task = self.tasks
+        branch_outputs = self.run_branches(
+            [(self.agents[0], mcq_task), (self.agents[2], tf_task)],
+            inputs,
+            on_output=lambda output: self.report(on_result, output.tasks_output),
+        )
+
+        # The analysis task reads both generation outputs through its context
+        mcq_output, tf_output = branch_outputs
+        analysis_inputs = {
+            **inputs,
+            "sources": quiz_sources(sources, mcq_output.json_dict, tf_output.json_dict),
+        }
+        analysis_output = self.run_task(self.agents[1], analysis_task, analysis_inputs)
+        self.report(on_result, analysis_output.tasks_output)
+        return self.merge_outputs(branch_outputs + [analysis_output])
+
+    def run_branches(self, branches, inputs, on_output=None) -> list:
+        """Run independent tasks in parallel, each in its own single-task crew.
+
+        The thread pool is bounded by MAX_CONCURRENCY. If a task fails,
+        pending tasks are cancelled.
+
+        Args:
+            branches (list[tuple[Agent, Task]]): (agent, task) pairs to run
+            inputs (dict): Inputs interpolated into the task descriptions
+            on_output (callable | None): Called with each output, in the
+                order the tasks finish
+
+        Returns:
+            list[CrewOutput]: Outputs in the order of `branches`
+
+        Raises:
+            RuntimeError: If any task fails
+        """
+        executor = ThreadPoolExecutor(
+            max_workers=max(1, MAX_CONCURRENCY), thread_name_prefix="quiz-branch"
+        )
+        try:
+            futures = {
+                submit_in_context(
+                    executor, self.run_task, agent, task, inputs
+                ): task.name
+                for agent, task in branches
+            }
+            print("Crew initialized successfully!")
+            for future in as_completed(futures):
+                if future.exception() is not None:
+                    raise RuntimeError(
+                        f"Task '{futures[future]}' failed: {future.exception()}"
+                    ) from future.exception()
+                if on_output is not None:
+                    on_output(future.result())
+            return [future.result() for future in futures]
+        finally:
+            executor.shutdown(wait=False, cancel_futures=True)
+
+    @staticmethod
+    def report(on_result, task_outputs) -> None:
+        """Pass finished task outputs to a progress callback.
+
+        Errors raised by the callback are printed and ignored, so reporting
+        progress never fails a run.
+
+        Args:
+            on_result (callable | None): Called as on_result(task_name, json_dict)
+            task_outputs (list[TaskOutput]): Outputs of the finished tasks
+        """
+        if on_result is None:
+            return
+        for task_output in task_outputs:
+            try:
+                on_result(task_output.name, task_output.json_dict)
+            except Exception as e:
+                print(f"Failed to report the output of '{task_output.name}': {e}")
+
+    @staticmethod
+    def run_task(agent, task, inputs):
+        """Run a single task in its own crew.
+
+        Args:
+            agent (Agent): Agent assigned to the task
+            task (Task): Task to execute
+            inputs (dict): Inputs interpolated into the task description
+
+        Returns:
+            CrewOutput: Output of the single-task crew
+        """
+        crew = Crew(
+            agents=[agent],
+            tasks=[task],
+            process=Process.sequential,
+            verbose=True,
+        )
+        with span("task", task=task.name):
+            return crew.kickoff(inputs=inputs)
+
+    @staticmethod
+    def quiz_output(task, quiz) -> CrewOutput:
+        """Wrap a quiz built outside a crew as the output of a generation task.
+
+        Args:
+            task (Task): Generation task the quiz stands in for
+            quiz (BaseModel): The quiz, e.g. an `MCQQuiz`
+
+        Returns:
+            CrewOutput: Output in the shape a single-task crew would produce
+        """
+        json_dict = quiz.model_dump()
+        raw = json.dumps(json_dict)
+
+        task_output = TaskOutput(
+            name=task.name,
+            description=task.description,
+            expected_output=task.expected_output,
+            raw=raw,
+            json_dict=json_dict,
+            agent=task.agent.role,
+            output_format=OutputFormat.JSON,
+        )
+        return CrewOutput(raw=raw, json_dict=json_dict, tasks_output=[task_output])
+
+    @staticmethod
+    def merge_outputs(outputs):
+        """Merge single-task crew outputs into one CrewOutput.
+
+        The last output provides the final result, matching what a sequential
+        crew would return.
+        """
+        final = outputs[-1]
+        merged = CrewOutput(
+            raw=final.raw,
+            pydantic=final.pydantic,
+            json_dict=final.json_dict,
+            tasks_output=[
+                task_output for output in outputs for task_output in output.tasks_output
+            ],
+        )
+        for output in outputs:
+            merged.token_usage.add_usage_metrics(output.token_usage)
+        return merged
@@ -0,0 +1,102 @@
+"""Process-wide pool of reusable QuizGeneratorCrew instances"""
+
+import queue
+import threading
+from contextlib import contextmanager
+from config.config import CREW_POOL_SIZE
+from src.tracing import span
+
+
+class CrewPool:
+    """
+    Thread-safe pool of initialized QuizGeneratorCrew instances
+
+    Building a crew loads the LLM, agents and tasks, so instances are
+    created lazily, up to `max_size`, and reused across runs. Each instance
+    is handed to one run at a time; when every instance is busy, `acquire`
+    blocks until one is released.
+    """
+
+    def __init__(self, max_size=CREW_POOL_SIZE, factory=None):
+        """Initialize an empty pool.
+
+        Args:
+            max_size (int): Maximum number of crew instances
+            factory (callable | None): Builds a new crew instance. Defaults to
+                QuizGeneratorCrew, imported when the first crew is built
+                since importing crewai takes seconds
+        """
+        self.max_size = max(1, max_size)
+        self._factory = factory
+        self._idle = queue.LifoQueue()
+        self._created = 0
+        self._lock = threading.Lock()
+
+    def _try_create(self):
+        """Reserve a slot and build a new crew, or return None if the pool is full."""
+        with self._lock:
+            if self._created >= self.max_size:
+                return None
+            self._created += 1
+        try:
+            if self._factory is None:
+                from src.crew import QuizGeneratorCrew
+
+                self._factory = QuizGeneratorCrew
+            return self._factory()
+        except Exception:
+            with self._lock:
+                self._created -= 1
+            raise
+
+    @contextmanager
+    def acquire(self, timeout=None):
+        """Borrow a crew for the duration of a `with` block.
+
+        Args:
+            timeout (float | None): Seconds to wait for a free crew, or None to wait forever
+
+        Yields:
+            QuizGeneratorCrew: A crew not used by any other run
+
+        Raises:
+            TimeoutError: If no crew became available within `timeout`
+        """
+        with span("crew_acquire") as acquire_span:
+            try:
+                crew = self._idle.get_nowait()
+                acquire_span.set_attribute("source", "idle")
+            except queue.Empty:
+                crew = self._try_create()
+                acquire_span.set_attribute("source", "new")
+                if crew is None:
+                    acquire_span.set_attribute("source", "wait")
+                    try:
+                        crew = self._idle.get(timeout=timeout)
+                    except queue.Empty as e:
+                        raise TimeoutError("No quiz generator crew available") from e
+        try:
+            yield crew
+        finally:
+            self._idle.put(crew)
+
+    def warm_up(self, count=1) -> None:
+        """Create up to `count` crews ahead of the first run."""
+        for _ in range(count):
+            crew = self._try_create()
+            if crew is None:
+                return
+            self._idle.put(crew)
+
+
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def get_crew_pool() -> CrewPool:
+    """Return the process-wide crew pool, creating it on first use."""
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            _pool = CrewPool()
+        return _pool
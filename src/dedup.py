@@ -0,0 +1,256 @@
+"""
+Near-Duplicate Question Detection
+
+Questions are embedded as hashed bag-of-words vectors: word unigrams and
+bigrams of the question text are hashed into a fixed number of dimensions,
+weighted, and L2-normalized, so the cosine similarity of two questions is
+the dot product of their vectors. No vocabulary is kept, so questions can
+be embedded one at a time as they arrive.
+
+Options are not embedded. MCQs on one topic often share an option list,
+e.g. the four gates of an LSTM, and mixing the options into the vector
+made such questions look alike even when they ask different things.
+
+`DedupIndex` stores the vectors of accepted questions and rejects new ones
+whose similarity to any of them reaches a threshold, using an exact numpy
+scan. The index only ever holds the questions of one document, at most a
+few hundred, for which a scan takes microseconds.
+
+Running the module checks the threshold against `CALIBRATION_CASES`:
+
+    python -m src.dedup
+"""
+
+import re
+import sys
+import threading
+import zlib
+import numpy as np
+from config.config import DEDUP_DIMENSIONS, DEDUP_SIMILARITY_THRESHOLD
+
+_WORD = re.compile(r"[a-z0-9]+")
+_STOP_WORDS = frozenset(
+    "a an the and or of to in on at by for with from as is are was were be been "
+    "this that these those it its which what when where how does do did can".split()
+)
+# Word order matters less than the words themselves
+BIGRAM_WEIGHT = 0.5
+
+# (question, question, whether they are duplicates) pairs the threshold was
+# calibrated on: paraphrases must reach it, distinct questions must not
+CALIBRATION_CASES = [
+    (
+        {"question": "What is the main purpose of the forget gate in an LSTM?"},
+        {"question": "What is the purpose of the forget gate in LSTM networks?"},
+        True,
+    ),
+    (
+        {"question": "Which problem do GRUs and LSTMs address in RNNs?"},
+        {"question": "What problem in RNNs do LSTMs and GRUs address?"},
+        True,
+    ),
+    (
+        {"question": "An RNN processes sequences one element at a time."},
+        {"question": "RNNs process a sequence one element at a time."},
+        True,
+    ),
+    (
+        {"question": "What is the main purpose of the forget gate in an LSTM?"},
+        {"question": "What is the main purpose of the update gate in a GRU?"},
+        False,
+    ),
+    (
+        {
+            "question": "An RNN processes sequences one element at a time.",
+            "options": ["True", "False"],
+        },
+        {
+            "question": "A GRU has fewer gates than an LSTM.",
+            "options": ["True", "False"],
+        },
+        False,
+    ),
+    (
+        {
+            "question": "Which gate in an LSTM decides what to forget?",
+            "options": ["Forget gate", "Input gate", "Output gate", "Update gate"],
+        },
+        {
+            "question": "Which gate in an LSTM decides what new information to store?",
+            "options": ["Forget gate", "Input gate", "Output gate", "Update gate"],
+        },
+        False,
+    ),
+]
+
+
+def _stem(word: str) -> str:
+    """Reduce a plural to its singular so both hash to the same feature."""
+    if len(word) > 4 and word.endswith("ies"):
+        return word[:-3] + "y"
+    if len(word) > 3 and word.endswith("es") and word[-3] in "sxz":
+        return word[:-2]
+    if len(word) > 3 and word.endswith("s") and not word.endswith("ss"):
+        return word[:-1]
+    return word
+
+
+def _features(text: str) -> list:
+    """Return the (feature, weight) pairs of a text: unigrams and bigrams."""
+    words = [_stem(word) for word in _WORD.findall(text.lower())]
+    content = [word for word in words if word not in _STOP_WORDS]
+    features = [(word, 1.0) for word in content]
+    features += [(f"{a} {b}", BIGRAM_WEIGHT) for a, b in zip(content, content[1:])]
+    return features
+
+
+def hash_features(weighted_texts, dimensions: int) -> np.ndarray:
+    """Sum the hashed features of weighted texts into one unnormalized vector.
+
+    Args:
+        weighted_texts (list[tuple[str, float]]): (text, weight) pairs
+        dimensions (int): Length of the vector
+
+    Returns:
+        np.ndarray: float32 vector of length `dimensions`
+    """
+    vector = np.zeros(dimensions, dtype=np.float32)
+    for text, weight in weighted_texts:
+        for feature, feature_weight in _features(str(text)):
+            digest = zlib.crc32(feature.encode("utf-8"))
+            # The top bit picks a sign so hash collisions cancel out on average
+            sign = 1.0 if digest & 0x80000000 else -1.0
+            vector[digest % dimensions] += sign * weight * feature_weight
+    return vector
+
+
+def embed_question(question: dict, dimensions=DEDUP_DIMENSIONS) -> np.ndarray:
+    """Embed the text of a quiz question as a unit-length hashed feature vector.
+
+    Args:
+        question (dict): Question with "question" text; its options are ignored
+        dimensions (int): Length of the vector
+
+    Returns:
+        np.ndarray: float32 vector of length `dimensions`; all zeros if the
+            question has no words
+    """
+    vector = hash_features([(question.get("question", ""), 1.0)], dimensions)
+    norm = np.linalg.norm(vector)
+    if norm > 0:
+        vector /= norm
+    return vector
+
+
+class DedupIndex:
+    """
+    Index of accepted questions that rejects near-duplicates
+
+    A question is a duplicate when the cosine similarity of its embedding to
+    an accepted question is at least `threshold`. The index is thread-safe.
+    """
+
+    def __init__(
+        self,
+        threshold=DEDUP_SIMILARITY_THRESHOLD,
+        dimensions=DEDUP_DIMENSIONS,
+        capacity: int = 256,
+    ):
+        """Initialize an empty index.
+
+        Args:
+            threshold (float): Cosine similarity from which questions are duplicates
+            dimensions (int): Length of the question embeddings
+            capacity (int): Initial number of questions storage is allocated for;
+                grows as needed
+        """
+        self.threshold = threshold
+        self.dimensions = dimensions
+        self._count = 0
+        self._lock = threading.Lock()
+        self._vectors = np.zeros((capacity, dimensions), dtype=np.float32)
+
+    def __len__(self) -> int:
+        return self._count
+
+    def _similarity(self, vector: np.ndarray) -> float:
+        """Return the highest similarity of a vector to any accepted question."""
+        if self._count == 0:
+            return 0.0
+        return float(np.max(self._vectors[: self._count] @ vector))
+
+    def _append(self, vector: np.ndarray) -> int:
+        """Store a vector and return its id."""
+        if self._count == len(self._vectors):
+            grown = np.zeros((2 * self._count, self.dimensions), dtype=np.float32)
+            grown[: self._count] = self._vectors
+            self._vectors = grown
+        self._vectors[self._count] = vector
+        self._count += 1
+        return self._count - 1
+
+    def is_duplicate(self, question: dict) -> bool:
+        """Check whether a question is a near-duplicate of an accepted one."""
+        vector = embed_question(question, self.dimensions)
+        with self._lock:
+            return self._similarity(vector) >= self.threshold
+
+    def add(self, question: dict):
+        """Accept a question unless it is a near-duplicate of an accepted one.
+
+        Args:
+            question (dict): Question with "question" text and optional "options"
+
+        Returns:
+            int | None: Id of the accepted question, or None if it was rejected
+        """
+        vector = embed_question(question, self.dimensions)
+        with self._lock:
+            if self._similarity(vector) >= self.threshold:
+                return None
+            return self._append(vector)
+
+
+def deduplicate(questions, index=None) -> list:
+    """Drop near-duplicates from a list of questions, keeping the first of each.
+
+    Args:
+        questions (list[dict]): Questions in order of preference
+        index (DedupIndex | None): Index of already accepted questions to also
+            check against; the kept questions are added to it. Defaults to a
+            new index.
+
+    Returns:
+        list[dict]: The kept questions, in their original order
+    """
+    if index is None:
+        index = DedupIndex()
+    return [question for question in questions if index.add(question) is not None]
+
+
+def check_calibration(threshold=DEDUP_SIMILARITY_THRESHOLD) -> list:
+    """Score the calibration cases against a similarity threshold.
+
+    Args:
+        threshold (float): Cosine similarity from which questions are duplicates
+
+    Returns:
+        list[tuple]: (question_a, question_b, similarity) of every case the
+            threshold classifies wrongly
+    """
+    failures = []
+    for question_a, question_b, duplicate in CALIBRATION_CASES:
+        similarity = float(embed_question(question_a) @ embed_question(question_b))
+        print(
+            f"{similarity:.3f} {'duplicate' if duplicate else 'distinct':9} "
+            f"{question_a['question']!r} / {question_b['question']!r}"
+        )
+        if (similarity >= threshold) != duplicate:
+            failures.append((question_a, question_b, similarity))
+    return failures
+
+
+if __name__ == "__main__":
+    failed = check_calibration()
+    print(f"{len(failed)} of {len(CALIBRATION_CASES)} cases misclassified")
+    sys.exit(1 if failed else 0)
@@ -0,0 +1,532 @@
+"""
+Quiz Export
+
+Renders quizzes into a writable text stream as HTML, plain text, Moodle
+GIFT, QTI 1.2 XML or CSV. The templates of every format are compiled once,
+as bound `str.format` methods, and each quiz is rendered in a single pass:
+its pieces are collected in a list and joined, then written with one call,
+so no string is grown by repeated concatenation. Question text is escaped
+for the target format.
+
+`export_quizzes` writes any iterable of quizzes, e.g. every document of the
+question bank via `QuestionBank.iter_quizzes`, holding one quiz in memory
+at a time.
+
+Usage:
+    python -m src.export --format gift --output output/quizzes.gift
+    python -m src.export --format qti --output quiz.xml output/<run_id>
+"""
+
+import abc
+import argparse
+import csv
+import html
+import io
+import json
+import os
+import string
+from config.config import QUESTION_BANK_PATH
+from src.tracing import span
+
+# Letters labelling the options of a question
+OPTION_LABELS = string.ascii_lowercase
+
+# HTML, as displayed by the Streamlit app
+_HTML_TITLE = '<div class="quiz-title">Quiz on {}</div>'.format
+_HTML_QUESTION = (
+    '<div class="quiz-container"><div class="quiz-question">Q{}: {}</div>{}</div>'
+).format
+_HTML_OPTION = '<div class="quiz-option">{}. {}</div>'.format
+_HTML_ANALYSIS = (
+    '<div class="quiz-container">'
+    '<div class="quiz-question">Question Explanation: {}</div>'
+    '<div class="quiz-question">Answer Feedback: {}</div>'
+    '<div class="quiz-question">Correct Answer: {}</div>'
+    '<div class="quiz-question">Related Topics: {}</div>'
+    "</div>"
+).format
+_HTML_HEADER = (
+    '<!DOCTYPE html>\n<html lang="en">\n<head>\n<meta charset="utf-8">\n'
+    "<title>Quizzes</title>\n</head>\n<body>\n"
+)
+_HTML_QUIZ = (
+    '<section class="quiz">\n<h2>MCQ Questions</h2>\n{}\n<h2>T/F Questions</h2>\n'
+    "{}\n<h2>Quiz Analysis</h2>\n{}\n</section>\n"
+).format
+_HTML_FOOTER = "</body>\n</html>\n"
+
+# Plain text
+_TEXT_QUESTION = "Question {}: {}\n{}\n".format
+_TEXT_OPTION = "{}. {}\n".format
+_TEXT_QUIZ = "Quiz on {}\n\nMCQ Questions\n\n{}T/F Questions\n\n{}".format
+
+# Moodle GIFT
+_GIFT_CATEGORY = "$CATEGORY: {}\n\n".format
+_GIFT_QUESTION = "::{}:: {} {{\n{}}}\n\n".format
+_GIFT_ANSWER = "{}{}\n".format
+_GIFT_TRUE_FALSE = "::{}:: {} {{{}{}}}\n\n".format
+_GIFT_FEEDBACK = "####{}\n".format
+_GIFT_SPECIAL = str.maketrans({char: "\\" + char for char in "\\~=#{}:"})
+
+# QTI 1.2, one assessment per quiz
+_QTI_HEADER = (
+    '<?xml version="1.0" encoding="UTF-8"?>\n'
+    '<questestinterop xmlns="http://www.imsglobal.org/xsd/ims_qtiasiv1p2">\n'
+)
+_QTI_ASSESSMENT = (
+    '<assessment ident="{}" title="{}">\n<section ident="{}_section">\n'
+    "{}</section>\n</assessment>\n"
+).format
+_QTI_ITEM = (
+    '<item ident="{0}" title="{1}">\n<presentation>\n'
+    '<material><mattext texttype="text/plain">{2}</mattext></material>\n'
+    '<response_lid ident="{0}_response" rcardinality="Single">\n'
+    "<render_choice>\n{3}</render_choice>\n</response_lid>\n</presentation>\n"
+    "<resprocessing>\n<outcomes>"
+    '<decvar varname="SCORE" vartype="Decimal" minvalue="0" maxvalue="100"/>'
+    "</outcomes>\n"
+    '<respcondition continue="No"><conditionvar>'
+    '<varequal respident="{0}_response">{4}</varequal></conditionvar>'
+    '<setvar action="Set" varname="SCORE">100</setvar></respcondition>\n'
+    "</resprocessing>\n{5}</item>\n"
+).format
+_QTI_OPTION = (
+    '<response_label ident="{}"><material>'
+    '<mattext texttype="text/plain">{}</mattext></material></response_label>\n'
+).format
+_QTI_FEEDBACK = (
+    '<itemfeedback ident="general"><material>'
+    '<mattext texttype="text/plain">{}</mattext></material></itemfeedback>\n'
+).format
+_QTI_FOOTER = "</questestinterop>\n"
+
+# CSV, one row per question
+CSV_OPTION_COLUMNS = 4
+CSV_HEADER = (
+    ["quiz", "topic", "kind", "number", "question"]
+    + [f"option_{label}" for label in OPTION_LABELS[:CSV_OPTION_COLUMNS]]
+    + [
+        "correct_index",
+        "correct_answer",
+        "explanation",
+        "answer_feedback",
+        "related_topics",
+    ]
+)
+
+
+def _escape_html(value) -> str:
+    return html.escape(str(value), quote=True)
+
+
+def _escape_gift(value) -> str:
+    # A blank line ends a GIFT question, so whitespace is collapsed
+    return " ".join(str(value).split()).translate(_GIFT_SPECIAL)
+
+
+def _analyses(analysis, count: int) -> list:
+    """Return the analysis of each question, None where it is missing.
+
+    Analyses are matched to questions by position, MCQ questions first, as
+    the analysis task returns them.
+    """
+    items = list((analysis or {}).get("quiz", []))
+    if len(items) != count:
+        return [None] * count
+    return items
+
+
+def _correct_option(item: dict):
+    options = item.get("options") or []
+    correct_index = item.get("correct_index")
+    if isinstance(correct_index, int) and 0 <= correct_index < len(options):
+        return options[correct_index]
+    return None
+
+
+def render_questions_html(quiz_items, topic: str) -> str:
+    """Render the questions of one MCQ or True/False quiz as HTML.
+
+    Args:
+        quiz_items (list[dict]): Questions with "question" and "options"
+        topic (str): Topic shown in the quiz title
+
+    Returns:
+        str: HTML of the quiz title and its questions
+    """
+    parts = [_HTML_TITLE(_escape_html(topic))]
+    for number, item in enumerate(quiz_items, 1):
+        options = "".join(
+            [
+                _HTML_OPTION(label, _escape_html(option))
+                for label, option in zip(OPTION_LABELS, item["options"])
+            ]
+        )
+        parts.append(_HTML_QUESTION(number, _escape_html(item["question"]), options))
+    return "".join(parts)
+
+
+def render_analysis_html(analysis_items, topic: str) -> str:
+    """Render the analysis of a quiz as HTML.
+
+    Args:
+        analysis_items (list[dict | None]): Analysis of each question;
+            questions without one are skipped
+        topic (str): Topic shown in the quiz title
+
+    Returns:
+        str: HTML of the quiz title and the analysis of each question
+    """
+    parts = [_HTML_TITLE(_escape_html(topic))]
+    for item in analysis_items:
+        if not item:
+            continue
+        parts.append(
+            _HTML_ANALYSIS(
+                _escape_html(item.get("Question_Explanation", "")),
+                _escape_html(item.get("Answer_Feedback", "")),
+                _escape_html(item.get("Correct_Answer", "")),
+                _escape_html(item.get("Related_Topics", "")),
+            )
+        )
+    return "".join(parts)
+
+
+def render_questions_text(quiz_items) -> str:
+    """Render questions as plain text, each followed by its lettered options."""
+    return "".join(
+        [
+            _TEXT_QUESTION(
+                number,
+                item["question"],
+                "".join(
+                    [
+                        _TEXT_OPTION(label, option)
+                        for label, option in zip(OPTION_LABELS, item["options"])
+                    ]
+                ),
+            )
+            for number, item in enumerate(quiz_items, 1)
+        ]
+    )
+
+
+class QuizWriter(abc.ABC):
+    """
+    Writes quizzes of one format into a text stream
+
+    `write_header` and `write_footer` wrap the quizzes of one export, so a
+    format that needs a document root (HTML, QTI) or a header row (CSV)
+    gets exactly one for any number of quizzes. Subclasses implement
+    `render`.
+    """
+
+    header = ""
+    footer = ""
+
+    def write_header(self, stream) -> None:
+        if self.header:
+            stream.write(self.header)
+
+    def write_footer(self, stream) -> None:
+        if self.footer:
+            stream.write(self.footer)
+
+    def write_quiz(self, stream, number: int, mcq_quiz, tf_quiz, analysis) -> None:
+        """Write one quiz.
+
+        Args:
+            stream (TextIO): Writable text stream
+            number (int): One-based position of the quiz in the export
+            mcq_quiz (dict): MCQ quiz with "quiz" and "topic"
+            tf_quiz (dict): True/False quiz with "quiz"
+            analysis (dict | None): Quiz analysis with "quiz"
+        """
+        stream.write(self.render(number, mcq_quiz, tf_quiz, analysis))
+
+    @abc.abstractmethod
+    def render(self, number: int, mcq_quiz, tf_quiz, analysis) -> str:
+        """Render one quiz, see `write_quiz`, as the text written for it."""
+
+
+class HtmlWriter(QuizWriter):
+    """Standalone HTML page, one section per quiz"""
+
+    header = _HTML_HEADER
+    footer = _HTML_FOOTER
+
+    def render(self, number, mcq_quiz, tf_quiz, analysis) -> str:
+        topic = mcq_quiz.get("topic", "")
+        mcq_items = mcq_quiz.get("quiz", [])
+        tf_items = tf_quiz.get("quiz", [])
+        return _HTML_QUIZ(
+            render_questions_html(mcq_items, topic),
+            render_questions_html(tf_items, topic),
+            render_analysis_html(
+                _analyses(analysis, len(mcq_items) + len(tf_items)), topic
+            ),
+        )
+
+
+class TextWriter(QuizWriter):
+    """Plain text questions and options, without answers"""
+
+    def render(self, number, mcq_quiz, tf_quiz, analysis) -> str:
+        return _TEXT_QUIZ(
+            mcq_quiz.get("topic", ""),
+            render_questions_text(mcq_quiz.get("quiz", [])),
+            render_questions_text(tf_quiz.get("quiz", [])),
+        )
+
+
+class GiftWriter(QuizWriter):
+    """Moodle GIFT, one question category per quiz"""
+
+    def render(self, number, mcq_quiz, tf_quiz, analysis) -> str:
+        mcq_items = mcq_quiz.get("quiz", [])
+        tf_items = tf_quiz.get("quiz", [])
+        analyses = _analyses(analysis, len(mcq_items) + len(tf_items))
+        topic = mcq_quiz.get("topic") or f"Quiz {number}"
+        parts = [_GIFT_CATEGORY(_escape_gift(topic))]
+        questions = [(f"Q{number}-MCQ{i}", item) for i, item in enumerate(mcq_items, 1)]
+        questions += [(f"Q{number}-TF{i}", item) for i, item in enumerate(tf_items, 1)]
+        for (name, item), item_analysis in zip(questions, analyses):
+            feedback = ""
+            if item_analysis and item_analysis.get("Question_Explanation"):
+                feedback = _GIFT_FEEDBACK(
+                    _escape_gift(item_analysis["Question_Explanation"])
+                )
+            question = _escape_gift(item["question"])
+            correct = str(_correct_option(item)).strip().lower()
+            options = [str(option).strip().lower() for option in item["options"]]
+            if sorted(options) == ["false", "true"]:
+                parts.append(
+                    _GIFT_TRUE_FALSE(
+                        name,
+                        question,
+                        "TRUE" if correct == "true" else "FALSE",
+                        feedback,
+                    )
+                )
+                continue
+            answers = "".join(
+                [
+                    _GIFT_ANSWER(
+                        "=" if index == item["correct_index"] else "~",
+                        _escape_gift(option),
+                    )
+                    for index, option in enumerate(item["options"])
+                ]
+            )
+            parts.append(_GIFT_QUESTION(name, question, answers + feedback))
+        return "".join(parts)
+
+
+class QtiWriter(QuizWriter):
+    """IMS QTI 1.2 XML, one assessment per quiz"""
+
+    header = _QTI_HEADER
+    footer = _QTI_FOOTER
+
+    def render(self, number, mcq_quiz, tf_quiz, analysis) -> str:
+        mcq_items = mcq_quiz.get("quiz", [])
+        tf_items = tf_quiz.get("quiz", [])
+        analyses = _analyses(analysis, len(mcq_items) + len(tf_items))
+        quiz_id = f"quiz{number}"
+        questions = [(f"mcq{i}", item) for i, item in enumerate(mcq_items, 1)]
+        questions += [(f"tf{i}", item) for i, item in enumerate(tf_items, 1)]
+        items = []
+        for (name, item), item_analysis in zip(questions, analyses):
+            item_id = f"{quiz_id}_{name}"
+            feedback = ""
+            if item_analysis and item_analysis.get("Question_Explanation"):
+                feedback = _QTI_FEEDBACK(
+                    _escape_html(item_analysis["Question_Explanation"])
+                )
+            options = "".join(
+                [
+                    _QTI_OPTION(label.upper(), _escape_html(option))
+                    for label, option in zip(OPTION_LABELS, item["options"])
+                ]
+            )
+            items.append(
+                _QTI_ITEM(
+                    item_id,
+                    name.upper(),
+                    _escape_html(item["question"]),
+                    options,
+                    OPTION_LABELS[item["correct_index"]].upper(),
+                    feedback,
+                )
+            )
+        return _QTI_ASSESSMENT(
+            quiz_id,
+            _escape_html(mcq_quiz.get("topic", "")),
+            quiz_id,
+            "".join(items),
+        )
+
+
+class CsvWriter(QuizWriter):
+    """One CSV row per question, with its answer and analysis"""
+
+    def __init__(self):
+        # Rows of one quiz are formatted into the buffer, then written at once
+        self._buffer = io.StringIO()
+        self._csv = csv.writer(self._buffer)
+
+    def _take(self) -> str:
+        text = self._buffer.getvalue()
+        self._buffer.seek(0)
+        self._buffer.truncate()
+        return text
+
+    def write_header(self, stream) -> None:
+        self._csv.writerow(CSV_HEADER)
+        stream.write(self._take())
+
+    def render(self, number, mcq_quiz, tf_quiz, analysis) -> str:
+        topic = mcq_quiz.get("topic", "")
+        mcq_items = mcq_quiz.get("quiz", [])
+        tf_items = tf_quiz.get("quiz", [])
+        questions = [("mcq", i, item) for i, item in enumerate(mcq_items, 1)]
+        questions += [("tf", i, item) for i, item in enumerate(tf_items, 1)]
+        analyses = _analyses(analysis, len(questions))
+        padding = [""] * CSV_OPTION_COLUMNS
+        self._csv.writerows(
+            [
+                [number, topic, kind, index, item["question"]]
+                + (list(item["options"]) + padding)[:CSV_OPTION_COLUMNS]
+                + [
+                    item["correct_index"],
+                    _correct_option(item),
+                    (item_analysis or {}).get("Question_Explanation", ""),
+                    (item_analysis or {}).get("Answer_Feedback", ""),
+                    (item_analysis or {}).get("Related_Topics", ""),
+                ]
+                for (kind, index, item), item_analysis in zip(questions, analyses)
+            ]
+        )
+        return self._take()
+
+
+WRITERS = {
+    "html": HtmlWriter,
+    "text": TextWriter,
+    "gift": GiftWriter,
+    "qti": QtiWriter,
+    "csv": CsvWriter,
+}
+
+# File extension of each export format
+EXTENSIONS = {
+    "html": ".html",
+    "text": ".txt",
+    "gift": ".gift",
+    "qti": ".xml",
+    "csv": ".csv",
+}
+
+
+def export_quizzes(stream, quizzes, export_format: str = "html") -> int:
+    """Write quizzes into a stream, one at a time.
+
+    Args:
+        stream (TextIO): Writable text stream; CSV files should be opened
+            with newline=""
+        quizzes (Iterable[tuple]): (mcq_quiz, tf_quiz, analysis) tuples,
+            analysis may be None
+        export_format (str): One of WRITERS
+
+    Returns:
+        int: Number of quizzes written
+
+    Raises:
+        ValueError: If the format is not supported
+    """
+    if export_format not in WRITERS:
+        raise ValueError(
+            f"Unsupported export format {export_format!r}, "
+            f"expected one of {', '.join(WRITERS)}"
+        )
+    writer = WRITERS[export_format]()
+    count = 0
+    with span("export", format=export_format) as export_span:
+        writer.write_header(stream)
+        for count, (mcq_quiz, tf_quiz, analysis) in enumerate(quizzes, 1):
+            writer.write_quiz(stream, count, mcq_quiz, tf_quiz, analysis)
+        writer.write_footer(stream)
+        export_span.set_attribute("quizzes", count)
+    return count
+
+
+def export_quiz(stream, mcq_quiz, tf_quiz, analysis=None, export_format="html"):
+    """Write a single quiz into a stream, see `export_quizzes`."""
+    export_quizzes(stream, [(mcq_quiz, tf_quiz, analysis)], export_format)
+
+
+def iter_run_quizzes(run_dirs):
+    """Yield the (mcq_quiz, tf_quiz, analysis) saved in pipeline run directories.
+
+    Args:
+        run_dirs (Iterable[str]): Directories written by `save_run_outputs`
+
+    Yields:
+        tuple: The quizzes of one run; analysis is None if it was not saved
+    """
+    for run_dir in run_dirs:
+        quizzes = []
+        for file_name in ("mcq_quiz.json", "tf_quiz.json", "quiz_analysis.json"):
+            path = os.path.join(run_dir, file_name)
+            try:
+                with open(file=path, mode="r", encoding="utf-8") as file:
+                    quizzes.append(json.load(file))
+            except FileNotFoundError:
+                if file_name != "quiz_analysis.json":
+                    raise
+                quizzes.append(None)
+        yield tuple(quizzes)
+
+
+def main():
+    """Command-line entry point of the exporter."""
+    parser = argparse.ArgumentParser(
+        description="Export quizzes as HTML, text, GIFT, QTI or CSV"
+    )
+    parser.add_argument(
+        "run_dirs",
+        nargs="*",
+        help="Pipeline run directories to export; the question bank if omitted",
+    )
+    parser.add_argument("--format", choices=list(WRITERS), default="html")
+    parser.add_argument(
+        "--output", help="Output file, defaults to output/quizzes.<extension>"
+    )
+    parser.add_argument(
+        "--bank", default=QUESTION_BANK_PATH, help="Question bank database"
+    )
+    args = parser.parse_args()
+
+    output = args.output or os.path.join("output", "quizzes" + EXTENSIONS[args.format])
+    if os.path.dirname(output):
+        os.makedirs(os.path.dirname(output), exist_ok=True)
+    if args.run_dirs:
+        quizzes = iter_run_quizzes(args.run_dirs)
+    else:
+        # Imported here so exporting run directories never creates a bank
+        from src.question_bank import QuestionBank
+
+        quizzes = QuestionBank(args.bank).iter_quizzes()
+
+    with open(
+        file=output,
+        mode="w",
+        encoding="utf-8",
+        newline="" if args.format == "csv" else None,
+    ) as file:
+        count = export_quizzes(file, quizzes, args.format)
+    print(f"Exported {count} quizzes to {output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,211 @@
+"""Deterministic stand-in LLM for benchmarks and offline runs"""
+
+import hashlib
+import json
+import random
+import re
+import threading
+import time
+from collections import deque
+from crewai.llms.base_llm import BaseLLM
+from pydantic import Field, PrivateAttr
+from src.pydantic_models import (
+    CombinedQuiz,
+    MCQQuiz,
+    QuizAnalysisOutput,
+    RegeneratedMCQ,
+    RegeneratedTrueFalse,
+    TrueFalseQuiz,
+)
+
+
+class FakeRateLimitError(Exception):
+    """HTTP 429 raised by `FakeLLM`, shaped like a provider SDK error"""
+
+    status_code = 429
+
+    def __init__(self, message: str, retry_after=None):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+
+class FakeLLM(BaseLLM):
+    """
+    LLM that answers quiz tasks locally with schema-valid payloads
+
+    The output model is taken from the calling task (`output_json`), falling
+    back to the prompt wording when the call has no task. Questions are
+    built from sentences of the prompt, and every choice is seeded by a hash
+    of the messages, so the same prompt always gets the same answer. Each
+    call sleeps for `latency_seconds` (plus up to `jitter_seconds`) to stand
+    in for network and generation time, and reports estimated token usage.
+
+    To exercise rate limiting, calls beyond `requests_per_minute` in any
+    60-second window, and a random `rate_limit_error_rate` fraction of calls,
+    are rejected with a `FakeRateLimitError` (HTTP 429). To exercise JSON
+    repair, a `malformed_rate` fraction of answers comes wrapped in a code
+    fence with trailing commas and, for True/False quizzes, extra options.
+    """
+
+    latency_seconds: float = Field(default=0.5, description="Simulated latency")
+    jitter_seconds: float = Field(default=0.0, description="Max extra latency")
+    requests_per_minute: int | None = Field(
+        default=None, description="Accepted requests per minute, None for no limit"
+    )
+    rate_limit_error_rate: float = Field(
+        default=0.0, description="Fraction of calls rejected at random"
+    )
+    malformed_rate: float = Field(
+        default=0.0, description="Fraction of answers with repairable JSON errors"
+    )
+
+    _accepted: deque = PrivateAttr(default_factory=deque)
+    _errors_rng: random.Random = PrivateAttr(default_factory=lambda: random.Random(0))
+    _lock: threading.Lock = PrivateAttr(default_factory=threading.Lock)
+
+    def call(
+        self, messages, tools=None, callbacks=None, available_functions=None, **kwargs
+    ):
+        """Return a ReAct-style final answer holding a valid quiz payload."""
+        self._check_rate_limit()
+        prompt = messages if isinstance(messages, str) else json.dumps(messages)
+        seed = int(hashlib.sha256(prompt.encode("utf-8")).hexdigest()[:16], 16)
+        rng = random.Random(seed)
+
+        model = self._output_model(prompt, kwargs)
+        if model is QuizAnalysisOutput:
+            payload = self._analysis(prompt, rng)
+        elif model is TrueFalseQuiz:
+            payload = self._tf_quiz(prompt, rng)
+        elif model is RegeneratedMCQ:
+            payload = {
+                "question": self._mcq_quiz(prompt, rng)["quiz"][0],
+                "analysis": self._analysis(prompt, rng)["quiz"][0],
+            }
+        elif model is RegeneratedTrueFalse:
+            payload = {
+                "question": self._tf_quiz(prompt, rng)["quiz"][0],
+                "analysis": self._analysis(prompt, rng)["quiz"][0],
+            }
+        elif model is CombinedQuiz:
+            payload = {
+                "mcq_quiz": self._mcq_quiz(prompt, rng),
+                "tf_quiz": self._tf_quiz(prompt, rng),
+            }
+        else:
+            payload = self._mcq_quiz(prompt, rng)
+        answer = json.dumps(payload)
+        if rng.random() < self.malformed_rate:
+            answer = self._malformed(payload)
+        response = f"Thought: I now know the final answer\nFinal Answer: {answer}"
+
+        time.sleep(self.latency_seconds + rng.random() * self.jitter_seconds)
+        prompt_tokens = len(prompt) // 4
+        completion_tokens = len(response) // 4
+        self._track_token_usage_internal(
+            {
+                "prompt_tokens": prompt_tokens,
+                "completion_tokens": completion_tokens,
+                "total_tokens": prompt_tokens + completion_tokens,
+            }
+        )
+        return response
+
+    def _check_rate_limit(self) -> None:
+        """Reject the call with a 429 when it exceeds the simulated limits."""
+        with self._lock:
+            now = time.monotonic()
+            while self._accepted and now - self._accepted[0] >= 60:
+                self._accepted.popleft()
+            if (
+                self.requests_per_minute is not None
+                and len(self._accepted) >= self.requests_per_minute
+            ):
+                raise FakeRateLimitError(
+                    "Rate limit reached: too many requests per minute",
+                    retry_after=60 - (now - self._accepted[0]),
+                )
+            if self._errors_rng.random() < self.rate_limit_error_rate:
+                raise FakeRateLimitError("Rate limit reached: try again later")
+            self._accepted.append(now)
+
+    @staticmethod
+    def _malformed(payload) -> str:
+        """Serialize a payload with errors a local JSON repair can fix."""
+        for question in payload.get("tf_quiz", payload).get("quiz", []):
+            if question.get("options") == ["True", "False"]:
+                question["options"] = ["True", "False", "Not given"]
+        text = re.sub(
+            r"(?<=[\]}\"\d])(\n\s*[\]}])", r",\1", json.dumps(payload, indent=2)
+        )
+        return f"```json\n{text}\n```"
+
+    @staticmethod
+    def _output_model(prompt, call_kwargs):
+        """Find the pydantic model the caller expects."""
+        task = call_kwargs.get("from_task")
+        model = call_kwargs.get("response_model") or getattr(task, "output_json", None)
+        if model is not None:
+            return model
+        if "Question_Explanation" in prompt:
+            return QuizAnalysisOutput
+        if "True/False" in prompt:
+            return TrueFalseQuiz
+        return MCQQuiz
+
+    @staticmethod
+    def _statements(prompt, rng, count):
+        """Pick `count` sentences of the prompt to build questions from."""
+        sentences = [
+            sentence.strip()
+            for sentence in re.split(r"(?<=[.!?])\s+|\\n", prompt)
+            if 30 <= len(sentence.strip()) <= 200
+        ]
+        if len(sentences) < count:
+            sentences += [f"Statement {i} of the document" for i in range(count)]
+        return rng.sample(sentences, count)
+
+    def _mcq_quiz(self, prompt, rng):
+        statements = self._statements(prompt, rng, 5)
+        return {
+            "topic": " ".join(statements[0].split()[:4]),
+            "quiz": [
+                {
+                    "question": f"Which statement matches the text: {statement[:80]}?",
+                    "options": [f"{statement[:40]} ({i})" for i in range(4)],
+                    "correct_index": rng.randrange(4),
+                }
+                for statement in statements
+            ],
+        }
+
+    def _tf_quiz(self, prompt, rng):
+        return {
+            "quiz": [
+                {
+                    "question": f"True or False: {statement[:120]}",
+                    "options": ["True", "False"],
+                    "correct_index": rng.randrange(2),
+                }
+                for statement in self._statements(prompt, rng, 5)
+            ]
+        }
+
+    @staticmethod
+    def _analysis(prompt, rng):
+        # One entry per question passed in the prompt
+        count = len(re.findall(r"correct_index", prompt)) or 10
+        # Cite the pages of the source passages given, if any
+        pages = re.findall(r"\(Page (\d+)\)", prompt)
+        return {
+            "quiz": [
+                {
+                    "Question_Explanation": f"Question {i + 1} checks a key idea of the text.",
+                    "Answer_Feedback": "The correct option restates the source; the others do not.",
+                    "Correct_Answer": f"Option {rng.randrange(4) + 1}, as stated in the source"
+                    + (f" (Page {pages[i % len(pages)]})." if pages else "."),
+                    "Related_Topics": "Review the section the question is drawn from.",
+                }
+                for i in range(count)
+            ]
+        }
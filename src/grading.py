@@ -0,0 +1,303 @@
+"""
+Vectorised Grading and Item Analysis
+
+Answer sheets are a 2-D integer array with one row per submission and one
+column per question, MCQ questions first and then T/F questions, in quiz
+order. Each cell holds the zero-based index of the chosen option, or -1 if
+the question was left unanswered. Batches can be NumPy arrays or
+memory-mapped files; they are processed in chunks of GRADING_CHUNK_ROWS rows
+with no Python loop over submissions, so a million sheets grade in seconds
+without loading the whole file into memory.
+
+Item statistics:
+- difficulty: share of submissions answering the item correctly
+- discrimination: corrected point-biserial correlation between answering
+  the item correctly and the score on the other items
+- discrimination_index: difficulty among the top GRADING_GROUP_FRACTION of
+  scorers minus difficulty among the bottom fraction
+- option_rates: share of submissions choosing each option; the rates of the
+  options other than the key are the distractor selection rates
+- omit_rate: share of submissions leaving the item unanswered (answers
+  outside the item's options count as unanswered)
+
+Usage:
+    python -m src.grading output/<run_id> answers.npy --output item_analysis.json
+"""
+
+import argparse
+import json
+import os
+import numpy as np
+from config.config import GRADING_CHUNK_ROWS, GRADING_GROUP_FRACTION
+
+UNANSWERED = -1
+
+
+def answer_key(mcq_quiz: dict, tf_quiz=None) -> tuple:
+    """Build the answer key of a quiz.
+
+    Args:
+        mcq_quiz (dict): MCQ quiz with "quiz" items holding "options" and
+            "correct_index"
+        tf_quiz (dict | None): True/False quiz, appended after the MCQ items
+
+    Returns:
+        tuple: (key, option_counts) int8 arrays with the correct option index
+            and the number of options of each question
+    """
+    items = list(mcq_quiz.get("quiz", []))
+    if tf_quiz is not None:
+        items += tf_quiz.get("quiz", [])
+    key = np.array([item["correct_index"] for item in items], dtype=np.int8)
+    option_counts = np.array([len(item["options"]) for item in items], dtype=np.int8)
+    return key, option_counts
+
+
+def load_answer_sheets(path: str, num_questions: int) -> np.ndarray:
+    """Open a file of answer sheets without reading it into memory.
+
+    Args:
+        path (str): A .npy file of a 2-D integer array, or a raw file of
+            int8 answers written row by row
+        num_questions (int): Questions per sheet
+
+    Returns:
+        np.ndarray: Read-only, memory-mapped (submissions, num_questions) array
+
+    Raises:
+        ValueError: If the file does not hold sheets of `num_questions` answers
+    """
+    if path.endswith(".npy"):
+        answers = np.load(path, mmap_mode="r")
+    else:
+        answers = np.memmap(path, dtype=np.int8, mode="r")
+        if answers.size % num_questions:
+            raise ValueError(
+                f"{path} holds {answers.size} answers, not a multiple of "
+                f"{num_questions} questions"
+            )
+        answers = answers.reshape(-1, num_questions)
+    if answers.ndim != 2 or answers.shape[1] != num_questions:
+        raise ValueError(
+            f"Expected answer sheets of {num_questions} questions, "
+            f"got an array of shape {answers.shape}"
+        )
+    return answers
+
+
+def _chunks(answers: np.ndarray, option_counts: np.ndarray, chunk_rows: int):
+    """Yield (start, answers) chunks with invalid answers set to UNANSWERED."""
+    for start in range(0, len(answers), chunk_rows):
+        chunk = np.asarray(answers[start : start + chunk_rows])
+        valid = (chunk >= 0) & (chunk < option_counts)
+        yield start, np.where(valid, chunk, UNANSWERED).astype(np.int8)
+
+
+def grade(answers: np.ndarray, key: np.ndarray, chunk_rows=GRADING_CHUNK_ROWS):
+    """Score answer sheets as the number of correctly answered questions.
+
+    Args:
+        answers (np.ndarray): (submissions, questions) chosen option indices
+        key (np.ndarray): Correct option index of each question
+        chunk_rows (int): Sheets scored per vectorised step
+
+    Returns:
+        np.ndarray: int16 score of each submission
+    """
+    scores = np.empty(len(answers), dtype=np.int16)
+    for start in range(0, len(answers), chunk_rows):
+        chunk = np.asarray(answers[start : start + chunk_rows])
+        scores[start : start + len(chunk)] = (chunk == key).sum(axis=1)
+    return scores
+
+
+def item_analysis(
+    answers: np.ndarray,
+    key: np.ndarray,
+    option_counts: np.ndarray,
+    chunk_rows=GRADING_CHUNK_ROWS,
+    group_fraction=GRADING_GROUP_FRACTION,
+) -> dict:
+    """Grade answer sheets and compute the statistics of every question.
+
+    Makes two passes over the sheets: one to score them and accumulate the
+    per-item sums, one to compare the top and bottom scoring groups.
+
+    Args:
+        answers (np.ndarray): (submissions, questions) chosen option indices,
+            UNANSWERED (-1) for a skipped question
+        key (np.ndarray): Correct option index of each question
+        option_counts (np.ndarray): Number of options of each question
+        chunk_rows (int): Sheets processed per vectorised step
+        group_fraction (float): Share of submissions in each of the top and
+            bottom groups of the discrimination index
+
+    Returns:
+        dict: "scores" (int16 per submission); per question "difficulty",
+            "discrimination", "discrimination_index" and "omit_rate" arrays
+            and an "option_rates" (questions, max options) array; and the
+            summary "mean_score", "std_score" and "reliability" (KR-20)
+
+    Raises:
+        ValueError: If there are no submissions or the answer sheets do not
+            match the key
+    """
+    num_sheets, num_items = answers.shape
+    if num_sheets == 0:
+        raise ValueError("No answer sheets to grade")
+    if num_items != len(key):
+        raise ValueError(
+            f"Answer sheets have {num_items} questions, the key has {len(key)}"
+        )
+    max_options = int(option_counts.max())
+    # Option counts are offset by one so UNANSWERED lands in column 0
+    bins = np.arange(num_items, dtype=np.int64) * (max_options + 1) + 1
+
+    scores = np.empty(num_sheets, dtype=np.int16)
+    correct_sums = np.zeros(num_items)
+    correct_score_sums = np.zeros(num_items)
+    option_totals = np.zeros(num_items * (max_options + 1), dtype=np.int64)
+    for start, chunk in _chunks(answers, option_counts, chunk_rows):
+        # Float matrices so the products below run through BLAS
+        correct = (chunk == key).astype(np.float64)
+        chunk_scores = correct.sum(axis=1)
+        scores[start : start + len(chunk)] = chunk_scores
+        correct_sums += correct.sum(axis=0)
+        correct_score_sums += chunk_scores @ correct
+        option_totals += np.bincount(
+            (chunk + bins).ravel(), minlength=len(option_totals)
+        )
+
+    total = scores.sum(dtype=np.float64)
+    total_squares = np.dot(scores.astype(np.float64), scores)
+    difficulty = correct_sums / num_sheets
+    mean_score = total / num_sheets
+    score_variance = total_squares / num_sheets - mean_score**2
+
+    # Correlate each item with the score on the other items, rest = score - x.
+    # Since x * x = x, every moment follows from the sums accumulated above.
+    rest_mean = mean_score - difficulty
+    rest_variance = (
+        total_squares - 2 * correct_score_sums + correct_sums
+    ) / num_sheets - rest_mean**2
+    covariance = (correct_score_sums - correct_sums) / num_sheets - (
+        difficulty * rest_mean
+    )
+    with np.errstate(divide="ignore", invalid="ignore"):
+        discrimination = covariance / np.sqrt(
+            difficulty * (1 - difficulty) * rest_variance
+        )
+        reliability = (
+            num_items
+            / (num_items - 1)
+            * (1 - np.sum(difficulty * (1 - difficulty)) / score_variance)
+            if num_items > 1
+            else np.nan
+        )
+
+    group_size = max(1, int(round(num_sheets * group_fraction)))
+    ranked = np.argsort(scores, kind="stable")
+    lower = np.zeros(num_sheets, dtype=bool)
+    upper = np.zeros(num_sheets, dtype=bool)
+    lower[ranked[:group_size]] = True
+    upper[ranked[-group_size:]] = True
+    upper_correct = np.zeros(num_items)
+    lower_correct = np.zeros(num_items)
+    for start, chunk in _chunks(answers, option_counts, chunk_rows):
+        correct = (chunk == key).astype(np.float64)
+        rows = slice(start, start + len(chunk))
+        upper_correct += upper[rows] @ correct
+        lower_correct += lower[rows] @ correct
+
+    option_rates = option_totals.reshape(num_items, max_options + 1) / num_sheets
+    return {
+        "scores": scores,
+        "difficulty": difficulty,
+        "discrimination": discrimination,
+        "discrimination_index": (upper_correct - lower_correct) / group_size,
+        "option_rates": option_rates[:, 1:],
+        "omit_rate": option_rates[:, 0],
+        "mean_score": float(mean_score),
+        "std_score": float(np.sqrt(max(score_variance, 0.0))),
+        "reliability": float(reliability),
+    }
+
+
+def item_report(statistics: dict, key: np.ndarray, option_counts: np.ndarray):
+    """Summarise item statistics as JSON-serialisable rows, one per question.
+
+    Args:
+        statistics (dict): Output of `item_analysis`
+        key (np.ndarray): Correct option index of each question
+        option_counts (np.ndarray): Number of options of each question
+
+    Returns:
+        dict: "items" with the statistics of each question, including the
+            selection rate of each distractor, and the summary statistics
+    """
+
+    def rounded(value):
+        return None if np.isnan(value) else round(float(value), 4)
+
+    items = []
+    for index, (correct_index, count) in enumerate(zip(key, option_counts)):
+        rates = statistics["option_rates"][index, :count]
+        items.append(
+            {
+                "question": index + 1,
+                "correct_index": int(correct_index),
+                "difficulty": rounded(statistics["difficulty"][index]),
+                "discrimination": rounded(statistics["discrimination"][index]),
+                "discrimination_index": rounded(
+                    statistics["discrimination_index"][index]
+                ),
+                "omit_rate": rounded(statistics["omit_rate"][index]),
+                "distractor_rates": {
+                    str(option): rounded(rate)
+                    for option, rate in enumerate(rates)
+                    if option != correct_index
+                },
+            }
+        )
+    return {
+        "submissions": len(statistics["scores"]),
+        "mean_score": rounded(statistics["mean_score"]),
+        "std_score": rounded(statistics["std_score"]),
+        "reliability": rounded(statistics["reliability"]),
+        "items": items,
+    }
+
+
+def main():
+    """Command-line entry point of the grader."""
+    parser = argparse.ArgumentParser(
+        description="Grade answer sheets and analyze the items of a quiz"
+    )
+    parser.add_argument(
+        "quiz_dir", help="Run directory holding mcq_quiz.json and tf_quiz.json"
+    )
+    parser.add_argument("answers", help=".npy or raw int8 file of answer sheets")
+    parser.add_argument("--output", help="JSON file for the item analysis")
+    args = parser.parse_args()
+
+    quizzes = []
+    for file_name in ("mcq_quiz.json", "tf_quiz.json"):
+        with open(
+            file=os.path.join(args.quiz_dir, file_name), mode="r", encoding="utf-8"
+        ) as file:
+            quizzes.append(json.load(file))
+    key, option_counts = answer_key(*quizzes)
+    answers = load_answer_sheets(args.answers, len(key))
+    report = item_report(item_analysis(answers, key, option_counts), key, option_counts)
+
+    if args.output:
+        with open(file=args.output, mode="w", encoding="utf-8") as file:
+            json.dump(report, file, indent=2)
+    print(
+        f"Graded {report['submissions']} submissions: mean score "
+        f"{report['mean_score']}/{len(key)}, reliability {report['reliability']}"
+    )
+
+
+if __name__ == "__main__":
+    main()
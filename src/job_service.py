@@ -0,0 +1,527 @@
+"""
+Persistent Quiz Job Service
+
+Clients submit a PDF and get a job id back at once; a pool of worker
+threads runs the pipeline for queued jobs, and clients poll `status` or
+block in `wait` / `watch` for progress and results. The queue is a SQLite
+database and uploaded PDFs are stored next to it, so queued jobs survive a
+restart, and several worker processes can share one queue to scale the
+LLM stages apart from the UI.
+
+A submission identical to a queued, running or finished job (same PDF
+bytes and question count) returns that job instead of queuing another.
+Running jobs are kept alive by a heartbeat; a job whose worker stopped
+without finishing it, e.g. because the process crashed, is requeued after
+JOB_SERVICE_STALE_SECONDS, up to JOB_SERVICE_MAX_ATTEMPTS runs.
+
+Usage:
+    python -m src.job_service worker --workers 4
+    python -m src.job_service submit path/to/file.pdf --num-questions 10 --wait
+    python -m src.job_service status <job_id>
+"""
+
+import argparse
+import json
+import os
+import sqlite3
+import threading
+import time
+import uuid
+from config.config import (
+    JOB_SERVICE_HEARTBEAT_SECONDS,
+    JOB_SERVICE_MAX_ATTEMPTS,
+    JOB_SERVICE_PATH,
+    JOB_SERVICE_PDF_DIR,
+    JOB_SERVICE_POLL_SECONDS,
+    JOB_SERVICE_STALE_SECONDS,
+    JOB_SERVICE_WORKERS,
+    NUM_QUESTIONS,
+)
+from src.pipeline_jobs import PipelineJobs
+from src.tracing import span
+
+ACTIVE_STATUSES = ("queued", "running")
+FINISHED_STATUSES = ("done", "failed")
+
+_COLUMNS = (
+    "id, key, status, num_questions, pdf_path, result, partial, error, "
+    "attempts, created_at, started_at, finished_at"
+)
+
+
+class JobService:
+    """
+    SQLite-backed queue of pipeline runs with a pool of worker threads
+
+    Job `status` moves from "queued" to "running" and then to "done", with
+    the parsed (mcq, tf, analysis) dictionaries in `result`, or "failed",
+    with the error message in `error`. While running, `partial` maps the
+    index of each output already produced (0 = MCQ, 1 = T/F, 2 = analysis)
+    to its dictionary, as in `PipelineJob`.
+    """
+
+    def __init__(
+        self,
+        path=JOB_SERVICE_PATH,
+        pdf_dir=JOB_SERVICE_PDF_DIR,
+        workers=JOB_SERVICE_WORKERS,
+    ):
+        """Open (or create) the job queue.
+
+        Workers are not started until `start` is called, so a client that
+        only submits and polls jobs runs no pipeline itself.
+
+        Args:
+            path (str): Path to the SQLite database file
+            pdf_dir (str): Directory of the PDFs of queued and running jobs,
+                each deleted once its job finishes
+            workers (int): Worker threads started by `start`
+        """
+        self.pdf_dir = pdf_dir
+        self.workers = workers
+        self.worker_id = f"{os.getpid()}-{uuid.uuid4().hex[:8]}"
+        self._lock = threading.Lock()
+        self._changed = threading.Condition()
+        self._wakeup = threading.Event()
+        self._stopping = threading.Event()
+        self._threads = []
+        self._running_ids = set()
+
+        os.makedirs(pdf_dir, exist_ok=True)
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._conn = sqlite3.connect(path, check_same_thread=False, timeout=30)
+        with self._conn:
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute("""
+                CREATE TABLE IF NOT EXISTS jobs (
+                    id TEXT PRIMARY KEY,
+                    key TEXT NOT NULL,
+                    status TEXT NOT NULL,
+                    num_questions INTEGER NOT NULL,
+                    pdf_path TEXT NOT NULL,
+                    result TEXT,
+                    partial TEXT,
+                    error TEXT,
+                    attempts INTEGER NOT NULL DEFAULT 0,
+                    worker TEXT,
+                    heartbeat_at REAL,
+                    created_at REAL NOT NULL,
+                    started_at REAL,
+                    finished_at REAL
+                )
+                """)
+            # At most one queued or running job per PDF and question count
+            self._conn.execute(
+                "CREATE UNIQUE INDEX IF NOT EXISTS jobs_active_key ON jobs (key) "
+                "WHERE status IN ('queued', 'running')"
+            )
+            self._conn.execute(
+                "CREATE INDEX IF NOT EXISTS jobs_status ON jobs (status, created_at)"
+            )
+
+    # Client API
+
+    def submit(self, pdf_bytes: bytes, num_questions=NUM_QUESTIONS) -> str:
+        """Queue a pipeline run for a PDF unless an identical job exists.
+
+        Args:
+            pdf_bytes (bytes): Raw content of the PDF
+            num_questions (int): Questions in each of the MCQ and T/F quizzes
+
+        Returns:
+            str: Id of the new job, or of the queued, running or finished
+                job for the same PDF and question count; failed jobs are
+                queued again
+        """
+        key = PipelineJobs.make_key(pdf_bytes, num_questions)
+        job_id = self._find(key)
+        if job_id is not None:
+            return job_id
+
+        # Written before the job is queued, so a worker never misses it
+        job_id = uuid.uuid4().hex
+        pdf_path = os.path.join(self.pdf_dir, f"{job_id}.pdf")
+        with open(file=pdf_path, mode="wb") as file:
+            file.write(pdf_bytes)
+        try:
+            with self._lock, self._conn:
+                self._conn.execute(
+                    """
+                    INSERT INTO jobs (
+                        id, key, status, num_questions, pdf_path, created_at
+                    ) VALUES (?, ?, 'queued', ?, ?, ?)
+                    """,
+                    (job_id, key, num_questions, pdf_path, time.time()),
+                )
+        except sqlite3.IntegrityError:
+            # Another client queued the same job in the meantime
+            os.remove(pdf_path)
+            return self._find(key)
+        self._wakeup.set()
+        return job_id
+
+    def status(self, job_id: str):
+        """Return the state of a job.
+
+        Args:
+            job_id (str): Id returned by `submit`
+
+        Returns:
+            dict | None: "id", "status", "num_questions", "result" (tuple of
+                dictionaries when done), "partial", "error", "attempts" and
+                the "created_at", "started_at" and "finished_at" timestamps,
+                or None if there is no such job
+        """
+        with self._lock:
+            row = self._conn.execute(
+                f"SELECT {_COLUMNS} FROM jobs WHERE id = ?", (job_id,)
+            ).fetchone()
+        if row is None:
+            return None
+        return {
+            "id": row[0],
+            "status": row[2],
+            "num_questions": row[3],
+            "result": tuple(json.loads(row[5])) if row[5] else None,
+            "partial": {
+                int(index): part for index, part in json.loads(row[6] or "{}").items()
+            },
+            "error": row[7],
+            "attempts": row[8],
+            "created_at": row[9],
+            "started_at": row[10],
+            "finished_at": row[11],
+        }
+
+    def watch(self, job_id: str, poll_interval=JOB_SERVICE_POLL_SECONDS, timeout=None):
+        """Yield the state of a job every time it changes, until it finishes.
+
+        Changes made in this process are seen at once; changes made by
+        worker processes are seen within `poll_interval` seconds.
+
+        Args:
+            job_id (str): Id returned by `submit`
+            poll_interval (float): Seconds between checks of the database
+            timeout (float | None): Maximum seconds to watch, None for no limit
+
+        Yields:
+            dict: The job state, see `status`; the last one is finished
+
+        Raises:
+            KeyError: If there is no such job
+            TimeoutError: If the job does not finish within `timeout`
+        """
+        deadline = None if timeout is None else time.monotonic() + timeout
+        last = None
+        while True:
+            job = self.status(job_id)
+            if job is None:
+                raise KeyError(f"Unknown job {job_id}")
+            state = (job["status"], len(job["partial"]), job["attempts"])
+            if state != last:
+                last = state
+                yield job
+            if job["status"] in FINISHED_STATUSES:
+                return
+            delay = poll_interval
+            if deadline is not None:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    raise TimeoutError(
+                        f"Job {job_id} did not finish within {timeout} seconds"
+                    )
+                delay = min(delay, remaining)
+            with self._changed:
+                self._changed.wait(delay)
+
+    def wait(self, job_id: str, timeout=None, poll_interval=JOB_SERVICE_POLL_SECONDS):
+        """Block until a job finishes.
+
+        Args:
+            job_id (str): Id returned by `submit`
+            timeout (float | None): Maximum seconds to wait, None for no limit
+            poll_interval (float): Seconds between checks of the database
+
+        Returns:
+            dict: The finished job, see `status`
+
+        Raises:
+            KeyError: If there is no such job
+            TimeoutError: If the job does not finish within `timeout`
+        """
+        for job in self.watch(job_id, poll_interval, timeout):
+            if job["status"] in FINISHED_STATUSES:
+                return job
+
+    def counts(self) -> dict:
+        """Return the number of jobs in each status."""
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT status, COUNT(*) FROM jobs GROUP BY status"
+            ).fetchall()
+        counts = {status: 0 for status in ACTIVE_STATUSES + FINISHED_STATUSES}
+        counts.update(rows)
+        return counts
+
+    # Workers
+
+    def start(self) -> None:
+        """Start the worker threads and their heartbeat, once."""
+        if self._threads:
+            return
+        self._stopping.clear()
+        for number in range(self.workers):
+            thread = threading.Thread(
+                target=self._work, name=f"quiz-job-worker-{number}", daemon=True
+            )
+            thread.start()
+            self._threads.append(thread)
+        thread = threading.Thread(
+            target=self._heartbeat, name="quiz-job-heartbeat", daemon=True
+        )
+        thread.start()
+        self._threads.append(thread)
+
+    def stop(self, timeout=None) -> None:
+        """Stop the workers after their current jobs finish.
+
+        Args:
+            timeout (float | None): Maximum seconds to wait for each thread
+        """
+        self._stopping.set()
+        self._wakeup.set()
+        for thread in self._threads:
+            thread.join(timeout)
+        self._threads = []
+
+    def _find(self, key: str):
+        """Return the id of the latest job for a key that has not failed."""
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT id FROM jobs WHERE key = ? AND status != 'failed' "
+                "ORDER BY created_at DESC LIMIT 1",
+                (key,),
+            ).fetchone()
+        return row[0] if row else None
+
+    def _requeue_stale(self) -> None:
+        """Requeue running jobs whose worker stopped sending heartbeats.
+
+        Jobs that already ran JOB_SERVICE_MAX_ATTEMPTS times are failed
+        instead, and their PDFs deleted.
+        """
+        stale_before = time.time() - JOB_SERVICE_STALE_SECONDS
+        failed_paths = []
+        with self._lock, self._conn:
+            exhausted = self._conn.execute(
+                "SELECT id, pdf_path FROM jobs "
+                "WHERE status = 'running' AND heartbeat_at < ? AND attempts >= ?",
+                (stale_before, JOB_SERVICE_MAX_ATTEMPTS),
+            ).fetchall()
+            for job_id, pdf_path in exhausted:
+                # Checked again, another process may have handled it since
+                failed = self._conn.execute(
+                    """
+                    UPDATE jobs SET status = 'failed', finished_at = ?,
+                        error = 'Error: Failed to generate quiz: the worker stopped '
+                            || 'while running the job'
+                    WHERE id = ? AND status = 'running' AND heartbeat_at < ?
+                    """,
+                    (time.time(), job_id, stale_before),
+                ).rowcount
+                if failed:
+                    failed_paths.append(pdf_path)
+            self._conn.execute(
+                """
+                UPDATE jobs SET status = 'queued', worker = NULL, partial = NULL
+                WHERE status = 'running' AND heartbeat_at < ?
+                """,
+                (stale_before,),
+            )
+        for pdf_path in failed_paths:
+            self._remove_pdf(pdf_path)
+
+    @staticmethod
+    def _remove_pdf(pdf_path: str) -> None:
+        try:
+            os.remove(pdf_path)
+        except FileNotFoundError:
+            pass
+
+    def _claim(self):
+        """Mark the oldest queued job as running by this worker.
+
+        Returns:
+            tuple | None: (job id, PDF path, question count), or None if the
+                queue is empty
+        """
+        self._requeue_stale()
+        while True:
+            with self._lock, self._conn:
+                row = self._conn.execute(
+                    "SELECT id, pdf_path, num_questions FROM jobs "
+                    "WHERE status = 'queued' ORDER BY created_at LIMIT 1"
+                ).fetchone()
+                if row is None:
+                    return None
+                now = time.time()
+                # Another worker process may have claimed it since the SELECT
+                claimed = self._conn.execute(
+                    """
+                    UPDATE jobs SET status = 'running', worker = ?,
+                        attempts = attempts + 1, started_at = ?, heartbeat_at = ?
+                    WHERE id = ? AND status = 'queued'
+                    """,
+                    (self.worker_id, now, now, row[0]),
+                ).rowcount
+            if claimed:
+                self._running_ids.add(row[0])
+                return row
+
+    def _update(self, job_id: str, sql: str, params=()) -> bool:
+        """Update a job claimed by this worker and wake up waiting clients.
+
+        Returns:
+            bool: Whether the job is still claimed by this worker; False if
+                it was requeued as stale, and possibly claimed by another
+        """
+        with self._lock, self._conn:
+            updated = self._conn.execute(
+                f"UPDATE jobs SET {sql} WHERE id = ? AND worker = ?",
+                (*params, job_id, self.worker_id),
+            ).rowcount
+        with self._changed:
+            self._changed.notify_all()
+        return updated > 0
+
+    def _work(self) -> None:
+        """Worker loop: run queued jobs until the service is stopped."""
+        while not self._stopping.is_set():
+            job = self._claim()
+            if job is None:
+                self._wakeup.wait(JOB_SERVICE_POLL_SECONDS)
+                self._wakeup.clear()
+                continue
+            with self._changed:
+                self._changed.notify_all()
+            try:
+                self._run(*job)
+            finally:
+                self._running_ids.discard(job[0])
+
+    def _run(self, job_id: str, pdf_path: str, num_questions: int) -> None:
+        """Run the pipeline for a job and store its parsed outputs."""
+        # Imported by workers only, clients that submit and poll never load it
+        from src.quiz_pipeline import run_pipeline
+
+        partial = {}
+
+        def on_result(index, json_dict):
+            partial[index] = json_dict
+            self._update(job_id, "partial = ?", (json.dumps(partial),))
+
+        try:
+            with span("job", job_id=job_id):
+                outputs = run_pipeline(pdf_path, num_questions, on_result=on_result)
+                result = [json.loads(output) for output in outputs]
+            finished = self._update(
+                job_id,
+                "status = 'done', result = ?, finished_at = ?",
+                (json.dumps(result), time.time()),
+            )
+        except json.JSONDecodeError:
+            finished = self._fail(
+                job_id,
+                "Error: Unable to parse quiz data. "
+                "The extracted content is not valid JSON.",
+            )
+        except Exception as e:
+            finished = self._fail(job_id, f"Error: Failed to generate quiz: {e}")
+        # A job requeued as stale keeps its PDF for the worker that reclaims it
+        if finished:
+            self._remove_pdf(pdf_path)
+
+    def _fail(self, job_id: str, error: str) -> bool:
+        return self._update(
+            job_id,
+            "status = 'failed', error = ?, finished_at = ?",
+            (error, time.time()),
+        )
+
+    def _heartbeat(self) -> None:
+        """Mark the jobs running in this process as alive until stopped."""
+        while not self._stopping.wait(JOB_SERVICE_HEARTBEAT_SECONDS):
+            job_ids = list(self._running_ids)
+            if not job_ids:
+                continue
+            with self._lock, self._conn:
+                self._conn.executemany(
+                    "UPDATE jobs SET heartbeat_at = ? WHERE id = ? AND worker = ?",
+                    [(time.time(), job_id, self.worker_id) for job_id in job_ids],
+                )
+
+
+_service = None
+_service_lock = threading.Lock()
+
+
+def get_job_service() -> JobService:
+    """Return the process-wide job service with its workers started."""
+    global _service
+    with _service_lock:
+        if _service is None:
+            _service = JobService()
+            _service.start()
+        return _service
+
+
+def main():
+    """Command-line entry point of the job service."""
+    parser = argparse.ArgumentParser(description="Queue and run quiz generation jobs")
+    parser.add_argument("--db", default=JOB_SERVICE_PATH, help="Job queue database")
+    commands = parser.add_subparsers(dest="command", required=True)
+    worker = commands.add_parser("worker", help="Run queued jobs until interrupted")
+    worker.add_argument("--workers", type=int, default=JOB_SERVICE_WORKERS)
+    submit = commands.add_parser("submit", help="Queue a PDF and print the job id")
+    submit.add_argument("pdf")
+    submit.add_argument("--num-questions", type=int, default=NUM_QUESTIONS)
+    submit.add_argument(
+        "--wait", action="store_true", help="Print progress until the job finishes"
+    )
+    status = commands.add_parser("status", help="Print the state of a job")
+    status.add_argument("job_id")
+    args = parser.parse_args()
+
+    service = JobService(args.db, workers=getattr(args, "workers", 0))
+    if args.command == "worker":
+        service.start()
+        print(f"Worker {service.worker_id} running {service.workers} jobs at once")
+        try:
+            while True:
+                time.sleep(3600)
+        except KeyboardInterrupt:
+            print("Stopping after the running jobs finish")
+            service.stop()
+        return
+
+    if args.command == "submit":
+        with open(file=args.pdf, mode="rb") as file:
+            job_id = service.submit(file.read(), args.num_questions)
+        print(job_id)
+        if not args.wait:
+            return
+        for job in service.watch(job_id):
+            print(f"{job['status']}: {len(job['partial'])}/3 outputs ready")
+    else:
+        job_id = args.job_id
+
+    job = service.status(job_id)
+    if job is None:
+        raise SystemExit(f"Unknown job {job_id}")
+    print(json.dumps(job, indent=2))
+
+
+if __name__ == "__main__":
+    main()
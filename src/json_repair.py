@@ -0,0 +1,336 @@
+"""
+Local JSON Repair for Structured Task Outputs
+
+Models often return almost-valid JSON: wrapped in code fences, with trailing
+commas, unescaped quotes inside strings, or an options list of the wrong
+length. `RepairingConverter` fixes these locally and validates the result
+against the task's pydantic model before any LLM round-trip. Only when
+individual quiz items still fail is the model asked again, for those items
+alone; a full re-conversion is the last resort.
+"""
+
+import json
+import re
+import typing
+from functools import lru_cache
+from crewai.utilities.converter import Converter, ConverterError
+from pydantic import BaseModel, TypeAdapter, ValidationError
+from config.config import JSON_REPAIR_ITEM_REPROMPTS
+from src.tracing import get_metrics
+
+_FENCE_PATTERN = re.compile(r"```(?:json)?\s*(.*?)```", re.DOTALL | re.IGNORECASE)
+
+
+def _strip_to_json(text: str) -> str:
+    """Return the JSON object or array in a response, without fences or prose."""
+    fenced = _FENCE_PATTERN.search(text)
+    if fenced:
+        text = fenced.group(1)
+    starts = [i for i in (text.find("{"), text.find("[")) if i != -1]
+    if not starts:
+        return text.strip()
+    start = min(starts)
+    end = text.rfind("}" if text[start] == "{" else "]")
+    return text[start : end + 1] if end > start else text[start:]
+
+
+def _next_significant(text: str, index: int):
+    """Return the first non-whitespace character at or after `index`, or None."""
+    for char in text[index:]:
+        if not char.isspace():
+            return char
+    return None
+
+
+def repair_json_text(text: str) -> str:
+    """Fix common syntax errors in model-generated JSON.
+
+    Strips code fences and surrounding prose, removes trailing commas,
+    escapes quotes and raw newlines inside strings, and closes brackets left
+    open at the end of a truncated response. A quote inside a string counts
+    as unescaped when the next significant character could not follow the
+    end of a JSON string.
+
+    Args:
+        text (str): Raw model output
+
+    Returns:
+        str: The repaired JSON text, which may still be invalid
+    """
+    text = _strip_to_json(text)
+    out = []
+    stack = []
+    in_string = False
+    escaped = False
+    for index, char in enumerate(text):
+        if in_string:
+            if escaped:
+                escaped = False
+            elif char == "\\":
+                escaped = True
+            elif char == '"':
+                if _next_significant(text, index + 1) not in (",", ":", "}", "]", None):
+                    out.append('\\"')
+                    continue
+                in_string = False
+            elif char == "\n":
+                out.append("\\n")
+                continue
+        elif char == '"':
+            in_string = True
+        elif char in "{[":
+            stack.append("}" if char == "{" else "]")
+        elif char in "}]":
+            # Drop a trailing comma before the closing bracket
+            while out and out[-1].isspace():
+                out.pop()
+            if out and out[-1] == ",":
+                out.pop()
+            if stack:
+                stack.pop()
+        out.append(char)
+
+    if in_string:
+        out.append('"')
+    while stack:
+        out.append(stack.pop())
+    return "".join(out)
+
+
+def _quiz_item_model(model):
+    """Return the item model of a quiz model's `quiz` list, or None."""
+    field = model.model_fields.get("quiz")
+    if field is None:
+        return None
+    args = typing.get_args(field.annotation)
+    return args[0] if args else None
+
+
+@lru_cache(maxsize=None)
+def _item_adapter(item_model) -> TypeAdapter:
+    """Return a validator of lists of `item_model`, built once per model."""
+    return TypeAdapter(typing.List[item_model])
+
+
+def _list_bounds(model, name):
+    """Return the (min, max) length constraints of a list field of a model."""
+    min_length = max_length = None
+    for constraint in model.model_fields[name].metadata:
+        min_length = getattr(constraint, "min_length", min_length)
+        max_length = getattr(constraint, "max_length", max_length)
+    return min_length, max_length
+
+
+def _fix_options(item: dict, item_model) -> dict:
+    """Bring an options list to the length the item model requires, if possible.
+
+    True/False options are rebuilt as ["True", "False"]. Surplus options are
+    dropped when the correct answer survives; missing options cannot be
+    invented locally.
+    """
+    if "options" not in item_model.model_fields or not isinstance(
+        item.get("options"), list
+    ):
+        return item
+    min_length, max_length = _list_bounds(item_model, "options")
+    options = item["options"]
+    if (
+        max_length is None
+        or min_length is None
+        or min_length <= len(options) <= max_length
+    ):
+        return item
+
+    if max_length == 2:
+        return {**item, "options": ["True", "False"]}
+    correct_index = item.get("correct_index")
+    if (
+        len(options) > max_length
+        and isinstance(correct_index, int)
+        and correct_index < max_length
+    ):
+        return {**item, "options": options[:max_length]}
+    return item
+
+
+def normalize_quiz(data, model):
+    """Apply structural fixes to parsed quiz data before validation.
+
+    Options lists are fixed per item, and a quiz list longer than the model
+    allows is truncated.
+
+    Args:
+        data (dict): Parsed model output
+        model (type[BaseModel]): Expected pydantic model
+
+    Returns:
+        dict: The normalized data
+    """
+    item_model = _quiz_item_model(model)
+    if item_model is None or not isinstance(data, dict):
+        return data
+    items = data.get("quiz")
+    if not isinstance(items, list):
+        return data
+
+    items = [
+        _fix_options(item, item_model) if isinstance(item, dict) else item
+        for item in items
+    ]
+    _, max_items = _list_bounds(model, "quiz")
+    if max_items is not None and len(items) > max_items:
+        items = items[:max_items]
+    return {**data, "quiz": items}
+
+
+def failing_items(error: ValidationError) -> list:
+    """Return the indices of quiz items named in a validation error.
+
+    Returns:
+        list[int] | None: Sorted item indices, or None if any error is not
+            confined to a single item (e.g. a missing field or too few items)
+    """
+    indices = set()
+    for detail in error.errors():
+        location = detail["loc"]
+        if (
+            len(location) < 2
+            or location[0] != "quiz"
+            or not isinstance(location[1], int)
+        ):
+            return None
+        indices.add(location[1])
+    return sorted(indices)
+
+
+class RepairingConverter(Converter):
+    """
+    Task output converter that repairs JSON locally before asking the model
+
+    Set as `converter_cls` on a task with `output_json`. The raw output is
+    repaired and validated locally first. Quiz items that still fail are
+    sent back to the model on their own, up to JSON_REPAIR_ITEM_REPROMPTS
+    times, and only if that fails is the whole output re-converted by the
+    model, up to `max_attempts` times in total. Outcomes are counted in the
+    metrics registry under "json_repair.*".
+    """
+
+    def to_json(self, current_attempt: int = 1):
+        """Convert the text to a JSON string matching the model.
+
+        Returns:
+            str | ConverterError: The validated JSON, or the error if every
+                attempt failed
+        """
+        metrics = get_metrics()
+        text = self.text
+        error = None
+        for attempt in range(current_attempt, self.max_attempts + 1):
+            if attempt > current_attempt:
+                metrics.incr("json_repair.full_retries")
+                text = self._reconvert(attempt, error)
+            try:
+                return json.dumps(self._validate(text).model_dump())
+            except (ValueError, ValidationError) as e:
+                error = e
+        metrics.incr("json_repair.failures")
+        return ConverterError(f"Failed to convert text into JSON, error: {error}.")
+
+    def to_pydantic(self, current_attempt: int = 1) -> BaseModel:
+        """Convert the text to an instance of the model."""
+        result = self.to_json(current_attempt)
+        if isinstance(result, ConverterError):
+            raise result
+        return self.model.model_validate_json(result)
+
+    def _validate(self, text: str) -> BaseModel:
+        """Parse, repair and validate a model response.
+
+        Raises:
+            ValueError: If the text cannot be parsed as JSON even after repair
+            ValidationError: If the data does not match the model
+        """
+        metrics = get_metrics()
+        try:
+            data = json.loads(text, strict=False)
+        except json.JSONDecodeError:
+            try:
+                data = json.loads(repair_json_text(text), strict=False)
+            except json.JSONDecodeError as e:
+                raise ValueError(f"Unrepairable JSON: {e}") from e
+            metrics.incr("json_repair.syntax_fixes")
+
+        normalized = normalize_quiz(data, self.model)
+        if normalized != data:
+            metrics.incr("json_repair.structure_fixes")
+
+        for reprompt in range(JSON_REPAIR_ITEM_REPROMPTS + 1):
+            try:
+                return self.model.model_validate(normalized)
+            except ValidationError as e:
+                indices = failing_items(e)
+                item_model = _quiz_item_model(self.model)
+                if (
+                    not indices
+                    or item_model is None
+                    or reprompt == JSON_REPAIR_ITEM_REPROMPTS
+                ):
+                    raise
+                metrics.incr("json_repair.item_reprompts")
+                normalized = self._repair_items(normalized, indices, item_model, e)
+        raise RuntimeError("unreachable")
+
+    def _repair_items(self, data: dict, indices, item_model, error) -> dict:
+        """Ask the model to fix only the given quiz items.
+
+        Items the model does not return valid replacements for are left as
+        they were, so the next validation fails again.
+        """
+        items = data["quiz"]
+        prompt = (
+            "The following quiz items do not match the required JSON schema.\n"
+            f"SCHEMA OF ONE ITEM:\n{json.dumps(item_model.model_json_schema())}\n"
+            f"VALIDATION ERRORS:\n{error}\n"
+            f"ITEMS:\n{json.dumps([items[i] for i in indices])}\n"
+            "Return only a JSON array with the corrected items, in the same "
+            "order, keeping their content."
+        )
+        response = self.llm.call(
+            [
+                {"role": "system", "content": "You fix JSON data to match a schema."},
+                {"role": "user", "content": prompt},
+            ]
+        )
+        try:
+            fixed = json.loads(repair_json_text(str(response)), strict=False)
+            fixed = _item_adapter(item_model).validate_python(
+                [
+                    normalize_quiz({"quiz": [item]}, self.model)["quiz"][0]
+                    for item in fixed
+                ]
+            )
+        except (json.JSONDecodeError, TypeError, ValidationError, IndexError):
+            return data
+        if len(fixed) != len(indices):
+            return data
+
+        items = list(items)
+        for index, item in zip(indices, fixed):
+            items[index] = item.model_dump()
+        return {**data, "quiz": items}
+
+    def _reconvert(self, attempt: int, error) -> str:
+        """Ask the model to convert the original text into the schema again.
+
+        The previous error and the attempt number are part of the prompt, so
+        a retry is never answered from the completion cache.
+        """
+        messages = self._build_messages()
+        messages.append(
+            {
+                "role": "user",
+                "content": f"Attempt {attempt}. The previous conversion failed "
+                f"with: {error}\nReturn only valid JSON matching the schema.",
+            }
+        )
+        return str(self.llm.call(messages))
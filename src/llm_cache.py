@@ -0,0 +1,221 @@
+"""Persistent SQLite cache of LLM completions"""
+
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+from typing import Any
+from pydantic import Field
+from config.config import (
+    LLM_CACHE_MAX_ENTRIES,
+    LLM_CACHE_PATH,
+    LLM_CACHE_SAMPLED,
+    LLM_CACHE_TTL_SECONDS,
+)
+from src.llm_wrappers import DelegatingLLM
+from src.tracing import current_span, get_metrics
+
+
+class LLMCache:
+    """
+    Disk-backed cache of LLM completions with TTL and LRU eviction
+
+    Entries older than `ttl_seconds` are treated as misses and removed.
+    Once the cache holds more than `max_entries` entries, the least recently
+    used ones are evicted. Hit and miss counters are kept per process.
+    """
+
+    def __init__(
+        self,
+        path=LLM_CACHE_PATH,
+        ttl_seconds=LLM_CACHE_TTL_SECONDS,
+        max_entries=LLM_CACHE_MAX_ENTRIES,
+    ):
+        """Open (or create) the cache database.
+
+        Args:
+            path (str): Path to the SQLite database file
+            ttl_seconds (float | None): Entry lifetime in seconds, or None to never expire
+            max_entries (int): Maximum number of cached completions
+        """
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        with self._conn:
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute("""
+                CREATE TABLE IF NOT EXISTS completions (
+                    key TEXT PRIMARY KEY,
+                    response TEXT NOT NULL,
+                    created_at REAL NOT NULL,
+                    accessed_at REAL NOT NULL
+                )
+                """)
+            self._conn.execute(
+                "CREATE INDEX IF NOT EXISTS completions_accessed_at "
+                "ON completions (accessed_at)"
+            )
+
+    @staticmethod
+    def make_key(model, temperature, messages, schema=None) -> str:
+        """Build the cache key for an LLM call.
+
+        Args:
+            model (str): Model name
+            temperature (float | None): Sampling temperature
+            messages (str | list[dict]): Prompt messages
+            schema (dict | str | None): Requested output schema
+
+        Returns:
+            str: SHA-256 hex digest identifying the call
+        """
+        payload = json.dumps(
+            {
+                "model": model,
+                "temperature": temperature,
+                "messages": messages,
+                "schema": schema,
+            },
+            sort_keys=True,
+            default=str,
+        )
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+    def get(self, key: str):
+        """Return the cached completion for a key, or None on a miss."""
+        now = time.time()
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT response, created_at FROM completions WHERE key = ?", (key,)
+            ).fetchone()
+            if row is not None and (
+                self.ttl_seconds is None or now - row[1] <= self.ttl_seconds
+            ):
+                with self._conn:
+                    self._conn.execute(
+                        "UPDATE completions SET accessed_at = ? WHERE key = ?",
+                        (now, key),
+                    )
+                self.hits += 1
+                return row[0]
+
+            if row is not None:
+                with self._conn:
+                    self._conn.execute("DELETE FROM completions WHERE key = ?", (key,))
+            self.misses += 1
+            return None
+
+    def put(self, key: str, response: str) -> None:
+        """Store a completion and evict the least recently used entries."""
+        now = time.time()
+        with self._lock, self._conn:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO completions "
+                "(key, response, created_at, accessed_at) VALUES (?, ?, ?, ?)",
+                (key, response, now, now),
+            )
+            self._conn.execute(
+                """
+                DELETE FROM completions WHERE key IN (
+                    SELECT key FROM completions
+                    ORDER BY accessed_at DESC
+                    LIMIT -1 OFFSET ?
+                )
+                """,
+                (self.max_entries,),
+            )
+
+    def stats(self) -> dict:
+        """Return hit/miss counters and the number of stored entries."""
+        with self._lock:
+            (entries,) = self._conn.execute(
+                "SELECT COUNT(*) FROM completions"
+            ).fetchone()
+            return {"hits": self.hits, "misses": self.misses, "entries": entries}
+
+    def clear(self) -> None:
+        """Remove every cached completion."""
+        with self._lock, self._conn:
+            self._conn.execute("DELETE FROM completions")
+
+
+class CachedLLM(DelegatingLLM):
+    """
+    LLM wrapper that serves repeated calls from an `LLMCache`
+
+    Calls are keyed on the model, temperature, messages and the output
+    schema requested by the task. Calls that pass tools are never cached,
+    since their result depends on tool execution, and neither are calls at
+    a nonzero (or unset) temperature unless `cache_sampled` is set, since
+    replaying one sampled answer would turn sampling off. Hits are flagged
+    on the current tracing span and counted in the metrics registry.
+    """
+
+    cache: Any = Field(exclude=True, description="The LLMCache to use")
+    cache_sampled: bool = Field(
+        default=LLM_CACHE_SAMPLED,
+        description="Whether to cache calls at a nonzero temperature",
+    )
+
+    def call(
+        self, messages, tools=None, callbacks=None, available_functions=None, **kwargs
+    ):
+        """Return a cached completion if present, otherwise call the inner LLM."""
+        if tools or (self.temperature != 0 and not self.cache_sampled):
+            return super().call(
+                messages, tools, callbacks, available_functions, **kwargs
+            )
+
+        key = self.cache.make_key(
+            self.model, self.temperature, messages, self._output_schema(kwargs)
+        )
+        cached = self.cache.get(key)
+        if cached is not None:
+            get_metrics().incr("llm.cache_hits")
+            call_span = current_span()
+            if call_span is not None:
+                call_span.set_attribute("cache_hit", True)
+            return cached
+        get_metrics().incr("llm.cache_misses")
+
+        response = super().call(
+            messages, tools, callbacks, available_functions, **kwargs
+        )
+        if isinstance(response, str):
+            self.cache.put(key, response)
+        return response
+
+    @staticmethod
+    def _output_schema(call_kwargs):
+        """Find the output schema requested for a call, if any."""
+        model = call_kwargs.get("response_model")
+        task = call_kwargs.get("from_task")
+        if model is None and task is not None:
+            model = getattr(task, "output_json", None) or getattr(
+                task, "output_pydantic", None
+            )
+        if model is None:
+            return None
+        return model.model_json_schema()
+
+
+_cache = None
+_cache_lock = threading.Lock()
+
+
+def get_llm_cache() -> LLMCache:
+    """Return the process-wide LLM cache, creating it on first use."""
+    global _cache
+    with _cache_lock:
+        if _cache is None:
+            _cache = LLMCache()
+        return _cache
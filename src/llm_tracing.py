@@ -0,0 +1,89 @@
+"""LLM wrapper that records every call as a tracing span"""
+
+import json
+import threading
+from pydantic import PrivateAttr
+from src.chunking import estimate_tokens
+from src.llm_wrappers import DelegatingLLM
+from src.tracing import current_span, get_metrics, span
+
+
+class TracedLLM(DelegatingLLM):
+    """
+    LLM wrapper that times each call in an "llm_call" span
+
+    Token counts come from the inner LLM's usage counters. Those counters are
+    shared by every call through the LLM, so when calls overlap the counts
+    are estimated from the text length instead, and the span is marked with
+    `tokens_estimated`. Token counts are also added to the enclosing "task"
+    and "pipeline" spans, and each call counts towards the `llm_calls`
+    attribute of the "task" span. Calls beyond the first in a task are
+    counted as `llm.extra_calls`: agent reasoning steps, output conversion
+    and retries alike.
+    """
+
+    _lock: threading.Lock = PrivateAttr(default_factory=threading.Lock)
+    _in_flight: int = PrivateAttr(default=0)
+    _started: int = PrivateAttr(default=0)
+
+    def call(
+        self, messages, tools=None, callbacks=None, available_functions=None, **kwargs
+    ):
+        """Call the inner LLM inside a span and record its token usage."""
+        metrics = get_metrics()
+        task = kwargs.get("from_task")
+        with span(
+            "llm_call", model=self.model, task=getattr(task, "name", None)
+        ) as call_span:
+            task_span = current_span("task")
+            if task_span is not None:
+                task_span.add("llm_calls")
+                if task_span.attributes["llm_calls"] > 1:
+                    metrics.incr("llm.extra_calls")
+            metrics.incr("llm.calls")
+
+            with self._lock:
+                self._in_flight += 1
+                self._started += 1
+                started = self._started
+                exclusive_start = self._in_flight == 1
+                before = self.inner.get_token_usage_summary()
+            try:
+                response = super().call(
+                    messages, tools, callbacks, available_functions, **kwargs
+                )
+            except Exception:
+                metrics.incr("llm.errors")
+                raise
+            finally:
+                with self._lock:
+                    self._in_flight -= 1
+                    exclusive = exclusive_start and self._started == started
+                    after = self.inner.get_token_usage_summary()
+
+            if call_span.attributes.get("cache_hit"):
+                prompt_tokens = completion_tokens = 0
+            elif exclusive:
+                prompt_tokens = after.prompt_tokens - before.prompt_tokens
+                completion_tokens = after.completion_tokens - before.completion_tokens
+            else:
+                call_span.set_attribute("tokens_estimated", True)
+                prompt_tokens = self._estimate_tokens(messages)
+                completion_tokens = self._estimate_tokens(response)
+
+            call_span.set_attribute("prompt_tokens", prompt_tokens)
+            call_span.set_attribute("completion_tokens", completion_tokens)
+            metrics.incr("llm.prompt_tokens", prompt_tokens)
+            metrics.incr("llm.completion_tokens", completion_tokens)
+            for parent in (task_span, current_span("pipeline")):
+                if parent is not None:
+                    parent.add("prompt_tokens", prompt_tokens)
+                    parent.add("completion_tokens", completion_tokens)
+            return response
+
+    @staticmethod
+    def _estimate_tokens(content) -> int:
+        """Estimate the tokens of a prompt or response from its length."""
+        if not isinstance(content, str):
+            content = json.dumps(content, default=str)
+        return estimate_tokens(content)
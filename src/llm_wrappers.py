@@ -0,0 +1,57 @@
+"""Base class for LLMs that wrap another LLM used by the crew"""
+
+from typing import Any
+from crewai.llms.base_llm import BaseLLM
+from pydantic import Field
+
+
+class DelegatingLLM(BaseLLM):
+    """
+    LLM that forwards every call to an inner LLM
+
+    Subclasses override `call` to add behaviour around the inner call, such
+    as caching or rate limiting. Capabilities and token usage are reported
+    by the inner LLM, so the crew sees the same model it would without the
+    wrapper. Wrappers can be stacked.
+    """
+
+    inner: Any = Field(exclude=True, description="The wrapped LLM")
+
+    def __init__(self, inner, **kwargs):
+        """Initialize the wrapper around an inner LLM.
+
+        Args:
+            inner (BaseLLM): LLM that performs the actual calls
+            **kwargs: Additional fields of the wrapper
+        """
+        super().__init__(
+            inner=inner,
+            model=inner.model,
+            temperature=inner.temperature,
+            **kwargs,
+        )
+
+    def call(
+        self, messages, tools=None, callbacks=None, available_functions=None, **kwargs
+    ):
+        """Forward the call to the inner LLM unchanged."""
+        return self.inner.call(
+            messages,
+            tools=tools,
+            callbacks=callbacks,
+            available_functions=available_functions,
+            **kwargs,
+        )
+
+    def supports_stop_words(self) -> bool:
+        return self.inner.supports_stop_words()
+
+    def supports_function_calling(self) -> bool:
+        supports = getattr(self.inner, "supports_function_calling", None)
+        return bool(supports and supports())
+
+    def get_context_window_size(self) -> int:
+        return self.inner.get_context_window_size()
+
+    def get_token_usage_summary(self):
+        return self.inner.get_token_usage_summary()
@@ -0,0 +1,462 @@
+"""
+Map-Reduce Quiz Generation
+
+Generates quizzes for documents larger than the model context window, and
+quizzes of more questions than one generation call produces. The text is
+split into token-budgeted, overlapping chunks or slices (map), candidate
+questions are generated for each of them in parallel, and the candidates
+are reduced to a single MCQ and True/False quiz that covers the whole
+document.
+"""
+
+import json
+import math
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from config.config import (
+    CHUNK_OVERLAP_TOKENS,
+    CHUNK_TOKENS,
+    MAP_MAX_CHUNKS,
+    MAP_MAX_WORKERS,
+    SHARD_ANALYSIS_MAX_ATTEMPTS,
+    SHARD_MAX_WORKERS,
+    SHARD_MIN_TOKENS,
+    SHARD_SPARE,
+)
+from src.chunking import chunk_text, estimate_tokens, spread_indices
+from src.dedup import DedupIndex, deduplicate
+from src.pydantic_models import (
+    CombinedQuiz,
+    MCQQuiz,
+    QuizAnalysisOutput,
+    TrueFalseQuiz,
+    sized_quiz_model,
+)
+from src.tracing import submit_in_context
+
+# Questions of each type produced by one generation call
+QUESTIONS_PER_QUIZ = 5
+
+
+def shard_count(num_questions: int) -> int:
+    """Return the generation calls needed for a quiz of `num_questions` questions.
+
+    Quizzes of more than QUESTIONS_PER_QUIZ questions get SHARD_SPARE extra
+    calls, so duplicates dropped on merging still leave enough questions.
+    """
+    shards = math.ceil(num_questions / QUESTIONS_PER_QUIZ)
+    return shards + SHARD_SPARE if shards > 1 else shards
+
+
+def document_slices(text: str, count: int) -> list:
+    """Split a text into `count` overlapping slices evenly spaced across it.
+
+    Slices are at least SHARD_MIN_TOKENS long so each holds enough material
+    for a full quiz; on short documents they overlap more, and a document
+    shorter than that is returned whole.
+
+    Args:
+        text (str): Document text
+        count (int): Number of slices
+
+    Returns:
+        list[str]: At most `count` distinct slices in document order
+    """
+    total = estimate_tokens(text)
+    window = min(CHUNK_TOKENS, max(SHARD_MIN_TOKENS, math.ceil(total / count)))
+    if count == 1 or total <= window:
+        return [text]
+    stride = max(1, (total - window) // (count - 1))
+    slices = chunk_text(text, window, max(0, window - stride))
+    return [slices[i] for i in spread_indices(len(slices), count)]
+
+
+def shard_texts(chunks, count: int, first_set: int = 1) -> list:
+    """Assign `count` generation shards to document chunks.
+
+    Shards are spread evenly over the chunks. When there are fewer chunks
+    than shards, the repeated shards of a chunk are asked for a different
+    question set, so their prompts, and answers, differ.
+
+    Args:
+        chunks (list[str]): Document chunks or slices in document order
+        count (int): Number of shards
+        first_set (int): Question set number of the first shard of each
+            chunk; later rounds of shards over the same chunks start after
+            the sets already generated
+
+    Returns:
+        list[str]: The text of each shard
+    """
+    texts = []
+    repeats = Counter()
+    for shard in range(count):
+        chunk_index = shard * len(chunks) // count
+        question_set = first_set + repeats[chunk_index]
+        repeats[chunk_index] += 1
+        text = chunks[chunk_index]
+        if question_set > 1:
+            text += (
+                f"\nFOCUS: This is question set {question_set} for this "
+                "content. Ask about different concepts and details than the "
+                "most obvious first set of questions would."
+            )
+        texts.append(text)
+    return texts
+
+
+def map_chunks(generator, chunks, max_workers=MAP_MAX_WORKERS):
+    """Generate candidate MCQ and T/F questions for every chunk in parallel.
+
+    A chunk whose generation fails is skipped, so one bad chunk does not
+    fail the whole document.
+
+    Args:
+        generator (QuizGeneratorCrew): Crew providing agents and task templates
+        chunks (list[str]): Document chunks
+        max_workers (int): Maximum number of generation calls at once
+
+    Returns:
+        tuple: (mcq_candidates, tf_candidates, topics) where the candidate lists
+            hold (chunk_index, question_dict) pairs and topics holds the topic
+            reported for each chunk's MCQ quiz
+
+    Raises:
+        RuntimeError: If no chunk produced any questions
+    """
+    jobs = [
+        (chunk_index, chunk, agent, task)
+        for chunk_index, chunk in enumerate(chunks)
+        for agent, task in generator.new_generation_tasks()
+    ]
+
+    mcq_candidates, tf_candidates, topics = [], [], []
+    with ThreadPoolExecutor(
+        max_workers=max(1, max_workers), thread_name_prefix="quiz-map"
+    ) as executor:
+        futures = {
+            submit_in_context(
+                executor, generator.run_task, agent, task, {"text": chunk}
+            ): (
+                chunk_index,
+                task.output_json,
+            )
+            for chunk_index, chunk, agent, task in jobs
+        }
+        for future in as_completed(futures):
+            chunk_index, output_model = futures[future]
+            try:
+                quiz = future.result().json_dict
+            except Exception as e:
+                print(f"Chunk {chunk_index} generation failed: {e}")
+                continue
+            if output_model is CombinedQuiz and quiz:
+                parts = [
+                    (MCQQuiz, quiz.get("mcq_quiz")),
+                    (TrueFalseQuiz, quiz.get("tf_quiz")),
+                ]
+            else:
+                parts = [(output_model, quiz)]
+
+            for part_model, part in parts:
+                if not part or "quiz" not in part:
+                    print(f"Chunk {chunk_index} returned no quiz")
+                    continue
+
+                questions = [(chunk_index, item) for item in part["quiz"]]
+                if part_model is MCQQuiz:
+                    mcq_candidates.extend(questions)
+                    if part.get("topic"):
+                        topics.append(part["topic"])
+                else:
+                    tf_candidates.extend(questions)
+
+    if not mcq_candidates and not tf_candidates:
+        raise RuntimeError("No chunk produced any candidate questions")
+
+    # Keep candidates in document order regardless of completion order
+    mcq_candidates.sort(key=lambda candidate: candidate[0])
+    tf_candidates.sort(key=lambda candidate: candidate[0])
+    return mcq_candidates, tf_candidates, topics
+
+
+def select_questions(candidates, count: int) -> list:
+    """Reduce candidate questions to `count` questions spread over the document.
+
+    Near-duplicates (paraphrases of an earlier candidate, see
+    `src.dedup`) are dropped first. Questions are then taken in rounds,
+    each round picking one question from chunks evenly spaced across the
+    chunks that still have candidates, so the selection covers the start,
+    middle and end of the document before taking a second question from any
+    chunk.
+
+    Args:
+        candidates (list[tuple[int, dict]]): (chunk_index, question) pairs
+        count (int): Number of questions to select
+
+    Returns:
+        list[dict]: Selected questions in document order
+
+    Raises:
+        RuntimeError: If there are fewer than `count` distinct candidates
+    """
+    by_chunk = {}
+    dedup_index = DedupIndex()
+    for chunk_index, question in candidates:
+        if dedup_index.add(question) is None:
+            continue
+        by_chunk.setdefault(chunk_index, []).append(question)
+
+    if len(dedup_index) < count:
+        raise RuntimeError(
+            f"Only {len(dedup_index)} distinct candidate questions, {count} required"
+        )
+
+    selected = []
+    while len(selected) < count:
+        remaining = [chunk for chunk in sorted(by_chunk) if by_chunk[chunk]]
+        for index in spread_indices(len(remaining), count - len(selected)):
+            chunk = remaining[index]
+            selected.append((chunk, by_chunk[chunk].pop(0)))
+
+    selected.sort(key=lambda item: item[0])
+    return [question for _, question in selected]
+
+
+def _distinct_questions(candidates) -> int:
+    """Return the number of distinct questions among candidates."""
+    return len(deduplicate([question for _, question in candidates]))
+
+
+def reduce_quizzes(generator, chunks, shards: int, num_questions: int, max_workers):
+    """Generate candidates from every shard and reduce them to one quiz of each type.
+
+    If duplicates leave fewer distinct candidates than `num_questions`,
+    one more round of shards, sized to the shortfall plus SHARD_SPARE, is
+    generated before giving up.
+
+    Args:
+        generator (QuizGeneratorCrew): Initialized quiz generator crew
+        chunks (list[str]): Document chunks or slices the shards are spread over
+        shards (int): Number of generation shards
+        num_questions (int): Questions in each of the MCQ and T/F quizzes
+        max_workers (int): Maximum number of generation calls at once
+
+    Returns:
+        tuple: (mcq_output, tf_output) CrewOutputs of the reduced quizzes
+    """
+    mcq_candidates, tf_candidates, topics = map_chunks(
+        generator, shard_texts(chunks, shards), max_workers
+    )
+    shortfall = num_questions - min(
+        _distinct_questions(mcq_candidates), _distinct_questions(tf_candidates)
+    )
+    if shortfall > 0:
+        extra = math.ceil(shortfall / QUESTIONS_PER_QUIZ) + SHARD_SPARE
+        print(f"{shortfall} questions short after de-duplication, {extra} more shards")
+        first_set = math.ceil(shards / len(chunks)) + 1
+        more = map_chunks(generator, shard_texts(chunks, extra, first_set), max_workers)
+        # Offset shard indices so the extra questions follow the first round
+        mcq_candidates += [(shards + i, question) for i, question in more[0]]
+        tf_candidates += [(shards + i, question) for i, question in more[1]]
+        topics += more[2]
+
+    if not topics:
+        raise RuntimeError("No chunk produced an MCQ topic")
+    mcq_quiz = sized_quiz_model(MCQQuiz, num_questions)(
+        quiz=select_questions(mcq_candidates, num_questions),
+        topic=Counter(topics).most_common(1)[0][0],
+    )
+    tf_quiz = sized_quiz_model(TrueFalseQuiz, num_questions)(
+        quiz=select_questions(tf_candidates, num_questions)
+    )
+
+    mcq_task, tf_task, _ = generator.tasks
+    mcq_output = generator.quiz_output(mcq_task, mcq_quiz)
+    tf_output = generator.quiz_output(tf_task, tf_quiz)
+    return mcq_output, tf_output
+
+
+def map_reduce_quizzes(generator, text: str, num_questions=QUESTIONS_PER_QUIZ):
+    """Generate the MCQ and T/F quizzes for a document too large for one prompt.
+
+    At most MAP_MAX_CHUNKS chunks, evenly spaced across the document, are
+    sent to the model, so per-request token cost is bounded regardless of
+    document size. Larger quizzes raise that to one chunk per shard.
+
+    Args:
+        generator (QuizGeneratorCrew): Initialized quiz generator crew
+        text (str): Full document text
+        num_questions (int): Questions in each of the MCQ and T/F quizzes
+
+    Returns:
+        tuple: (mcq_output, tf_output) CrewOutputs of the reduced quizzes
+    """
+    shards = max(MAP_MAX_CHUNKS, shard_count(num_questions))
+    chunks = chunk_text(text, CHUNK_TOKENS, CHUNK_OVERLAP_TOKENS)
+    chunks = [chunks[i] for i in spread_indices(len(chunks), shards)]
+    print(f"Generating candidate questions from {len(chunks)} chunks")
+
+    max_workers = MAP_MAX_WORKERS
+    if num_questions > QUESTIONS_PER_QUIZ:
+        max_workers = max(MAP_MAX_WORKERS, SHARD_MAX_WORKERS)
+    return reduce_quizzes(generator, chunks, shards, num_questions, max_workers)
+
+
+def sharded_quizzes(generator, text: str, num_questions: int):
+    """Generate MCQ and T/F quizzes of any size for a document that fits one prompt.
+
+    The quiz is split into shards of QUESTIONS_PER_QUIZ questions, each
+    generated from its own slice of the document at the same time, so a
+    large quiz takes about as long as a small one.
+
+    Args:
+        generator (QuizGeneratorCrew): Initialized quiz generator crew
+        text (str): Full document text
+        num_questions (int): Questions in each of the MCQ and T/F quizzes
+
+    Returns:
+        tuple: (mcq_output, tf_output) CrewOutputs of the merged quizzes
+    """
+    shards = shard_count(num_questions)
+    slices = document_slices(text, shards)
+    print(f"Generating {num_questions} questions per quiz in {shards} shards")
+    return reduce_quizzes(generator, slices, shards, num_questions, SHARD_MAX_WORKERS)
+
+
+def analyze_quizzes(generator, mcq_output, tf_output, sources=None):
+    """Analyze generated quizzes, in shards of QUESTIONS_PER_QUIZ questions if larger.
+
+    Each shard pairs a slice of the MCQ questions with the same slice of
+    the T/F questions and runs in parallel. The analyses are merged with
+    every MCQ question first, then every T/F question, as a single analysis
+    task returns them. A shard whose analysis has the wrong number of items
+    is analyzed again, up to SHARD_ANALYSIS_MAX_ATTEMPTS calls.
+
+    Args:
+        generator (QuizGeneratorCrew): Initialized quiz generator crew
+        mcq_output (CrewOutput): Output of the MCQ generation
+        tf_output (CrewOutput): Output of the T/F generation
+        sources (SourceIndex | None): Index of the source document to
+            ground the analysis in
+
+    Returns:
+        CrewOutput: Output of the (merged) analysis task
+
+    Raises:
+        RuntimeError: If a shard's analysis never matches its questions
+    """
+    mcq_items = mcq_output.json_dict["quiz"]
+    tf_items = tf_output.json_dict["quiz"]
+    if max(len(mcq_items), len(tf_items)) <= QUESTIONS_PER_QUIZ:
+        return generator.analyze(mcq_output.raw, tf_output.raw, sources=sources)
+
+    shards = [
+        (
+            mcq_items[start : start + QUESTIONS_PER_QUIZ],
+            tf_items[start : start + QUESTIONS_PER_QUIZ],
+        )
+        for start in range(0, max(len(mcq_items), len(tf_items)), QUESTIONS_PER_QUIZ)
+    ]
+    with ThreadPoolExecutor(
+        max_workers=max(1, SHARD_MAX_WORKERS), thread_name_prefix="quiz-analysis"
+    ) as executor:
+        futures = [
+            submit_in_context(
+                executor, _analyze_shard, generator, mcq_shard, tf_shard, sources
+            )
+            for mcq_shard, tf_shard in shards
+        ]
+        outputs = [future.result() for future in futures]
+
+    mcq_analyses, tf_analyses = [], []
+    for (mcq_shard, _), analyses in zip(shards, outputs):
+        mcq_analyses.extend(analyses[: len(mcq_shard)])
+        tf_analyses.extend(analyses[len(mcq_shard) :])
+
+    _, _, analysis_task = generator.tasks
+    return generator.quiz_output(
+        analysis_task, QuizAnalysisOutput(quiz=mcq_analyses + tf_analyses)
+    )
+
+
+def _analyze_shard(generator, mcq_shard, tf_shard, sources=None) -> list:
+    """Analyze one shard, again if the analysis does not match its questions.
+
+    Analyses are paired with questions by position, so a shard analysis
+    with too many or too few items would shift every later one onto the
+    wrong question.
+
+    Returns:
+        list[dict]: One analysis per question, MCQ questions first
+
+    Raises:
+        RuntimeError: If no attempt returns one analysis per question
+    """
+    expected = len(mcq_shard) + len(tf_shard)
+    for attempt in range(1, SHARD_ANALYSIS_MAX_ATTEMPTS + 1):
+        output = generator.analyze(
+            json.dumps({"quiz": mcq_shard}),
+            json.dumps({"quiz": tf_shard}),
+            isolated=True,
+            sources=sources,
+        )
+        analyses = (output.json_dict or {}).get("quiz", [])
+        if len(analyses) == expected:
+            return analyses
+        print(
+            f"Analysis shard returned {len(analyses)} items for {expected} "
+            f"questions (attempt {attempt})"
+        )
+    raise RuntimeError(
+        f"Failed to analyze quiz: no analysis of {expected} items in "
+        f"{SHARD_ANALYSIS_MAX_ATTEMPTS} attempts"
+    )
+
+
+def run_map_reduce(
+    generator, text: str, num_questions=QUESTIONS_PER_QUIZ, sources=None, on_result=None
+):
+    """Generate and analyze a quiz for a document too large for one prompt.
+
+    Args:
+        generator (QuizGeneratorCrew): Initialized quiz generator crew
+        text (str): Full document text
+        num_questions (int): Questions in each of the MCQ and T/F quizzes
+        sources (SourceIndex | None): Index of the source document to
+            ground the analysis in
+        on_result (callable | None): Called as on_result(task_name,
+            json_dict) with the merged quizzes, then with the analysis
+
+    Returns:
+        CrewOutput: Output with MCQ, T/F and analysis entries in `tasks_output`,
+            in the same shape as `QuizGeneratorCrew.kickoff`
+    """
+    mcq_output, tf_output = map_reduce_quizzes(generator, text, num_questions)
+    generator.report(on_result, mcq_output.tasks_output + tf_output.tasks_output)
+    analysis_output = analyze_quizzes(generator, mcq_output, tf_output, sources)
+    generator.report(on_result, analysis_output.tasks_output)
+    return generator.merge_outputs([mcq_output, tf_output, analysis_output])
+
+
+def run_sharded(generator, text: str, num_questions: int, sources=None, on_result=None):
+    """Generate and analyze a quiz of `num_questions` questions per type in shards.
+
+    Args:
+        generator (QuizGeneratorCrew): Initialized quiz generator crew
+        text (str): Document text that fits one prompt
+        num_questions (int): Questions in each of the MCQ and T/F quizzes
+        sources (SourceIndex | None): Index of the source document to
+            ground the analysis in
+        on_result (callable | None): Called as on_result(task_name,
+            json_dict) with the merged quizzes, then with the analysis
+
+    Returns:
+        CrewOutput: Output with MCQ, T/F and analysis entries in `tasks_output`,
+            in the same shape as `QuizGeneratorCrew.kickoff`
+    """
+    mcq_output, tf_output = sharded_quizzes(generator, text, num_questions)
+    generator.report(on_result, mcq_output.tasks_output + tf_output.tasks_output)
+    analysis_output = analyze_quizzes(generator, mcq_output, tf_output, sources)
+    generator.report(on_result, analysis_output.tasks_output)
+    return generator.merge_outputs([mcq_output, tf_output, analysis_output])
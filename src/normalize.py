@@ -0,0 +1,125 @@
+"""
+Layout Noise Removal for Extracted PDF Text
+
+Slide decks and lecture notes repeat running headers, footers, page
+numbers, logos and the labels of recurring figures on every page, and
+`pypdf` extracts all of them as text. This pass removes them before the
+text reaches any prompt:
+
+- A line is repeated if it appears among the first or last
+  NORMALIZE_EDGE_LINES lines of at least NORMALIZE_EDGE_PAGE_FRACTION of
+  the pages (headers and footers), or anywhere on at least
+  NORMALIZE_BODY_PAGE_FRACTION of the pages (logos, recurring figures).
+  Only lines with letters count as repeated anywhere: a line of numbers
+  or symbols, e.g. a table cell or a list marker, is content unless it
+  sits at the top or bottom of the page, like a page number.
+  Lines are compared case-insensitively with every number replaced by "#",
+  so "Page 3 of 40" and "Page 4 of 40" are the same line. Repeated lines
+  are kept on the first page they appear on and removed from the others.
+- Words hyphenated across a line break are rejoined.
+- Runs of whitespace are collapsed and empty lines dropped.
+
+Pages stay separate, so page-tagged retrieval still sees the page each
+passage comes from. The pass is linear in the size of the text.
+"""
+
+import re
+from collections import Counter
+from config.config import (
+    NORMALIZE_BODY_PAGE_FRACTION,
+    NORMALIZE_EDGE_LINES,
+    NORMALIZE_EDGE_PAGE_FRACTION,
+    NORMALIZE_MIN_PAGES,
+)
+from src.chunking import estimate_tokens
+
+_NUMBERS = re.compile(r"\d+")
+_LETTER = re.compile(r"[^\W\d_]")
+# A lowercase word continued on the next line, e.g. "recur-\nrent"
+_HYPHEN_BREAK = re.compile(r"([A-Za-z])-\n([a-z])")
+
+
+def _line_key(line: str) -> str:
+    return _NUMBERS.sub("#", line.lower())
+
+
+def find_repeated_lines(
+    page_keys,
+    edge_lines=NORMALIZE_EDGE_LINES,
+    edge_fraction=NORMALIZE_EDGE_PAGE_FRACTION,
+    body_fraction=NORMALIZE_BODY_PAGE_FRACTION,
+) -> set:
+    """Find the keys of the lines repeated across pages.
+
+    Args:
+        page_keys (list[list[str]]): Keys of the non-empty lines of each page
+        edge_lines (int): Lines at the top and at the bottom of a page
+            checked for headers and footers
+        edge_fraction (float): Share of pages a line must appear on within
+            the edge lines to be repeated
+        body_fraction (float): Share of pages a line with letters must
+            appear on, anywhere, to be repeated
+
+    Returns:
+        set[str]: Keys of the repeated lines
+    """
+    edge_counts = Counter()
+    body_counts = Counter()
+    for keys in page_keys:
+        bottom = max(edge_lines, len(keys) - edge_lines)
+        edge_counts.update(set(keys[:edge_lines]) | set(keys[bottom:]))
+        body_counts.update(set(keys))
+    # A line must repeat at least once to be noise, however few the pages
+    edge_minimum = max(2, edge_fraction * len(page_keys))
+    body_minimum = max(2, body_fraction * len(page_keys))
+    repeated = {key for key, count in edge_counts.items() if count >= edge_minimum}
+    repeated.update(
+        key
+        for key, count in body_counts.items()
+        if count >= body_minimum and _LETTER.search(key)
+    )
+    return repeated
+
+
+def normalize_pages(pages, min_pages=NORMALIZE_MIN_PAGES) -> tuple:
+    """Remove repeated headers, footers and layout noise from a document.
+
+    Args:
+        pages (list[str]): Extracted text of each page, in page order
+        min_pages (int): Documents with fewer pages are not checked for
+            repeated lines, only rejoined and collapsed
+
+    Returns:
+        tuple: (pages, stats) where `pages` is the cleaned text of each page
+            and `stats` holds "original_tokens", "normalized_tokens",
+            "tokens_saved" and "lines_removed"
+    """
+    page_lines = [
+        [" ".join(line.split()) for line in (page or "").splitlines()] for page in pages
+    ]
+    page_lines = [[line for line in lines if line] for lines in page_lines]
+    page_keys = [[_line_key(line) for line in lines] for lines in page_lines]
+    repeated = find_repeated_lines(page_keys) if len(pages) >= min_pages else set()
+
+    seen = set()
+    lines_removed = 0
+    normalized = []
+    for lines, keys in zip(page_lines, page_keys):
+        kept = []
+        for line, key in zip(lines, keys):
+            if key in repeated:
+                if key in seen:
+                    lines_removed += 1
+                    continue
+                seen.add(key)
+            kept.append(line)
+        normalized.append(_HYPHEN_BREAK.sub(r"\1\2", "\n".join(kept)))
+
+    original_tokens = sum(estimate_tokens(page or "") for page in pages)
+    normalized_tokens = sum(estimate_tokens(page) for page in normalized)
+    return normalized, {
+        "original_tokens": original_tokens,
+        "normalized_tokens": normalized_tokens,
+        "tokens_saved": original_tokens - normalized_tokens,
+        "lines_removed": lines_removed,
+    }
@@ -0,0 +1,132 @@
+"""Content-addressed, size-bounded disk cache for extracted PDF text"""
+
+import hashlib
+import json
+import os
+import threading
+from config.config import PDF_CACHE_DIR, PDF_CACHE_MAX_BYTES
+
+
+class PdfTextCache:
+    """
+    Disk cache of extracted PDF pages keyed by file content
+
+    Each entry is a JSON file holding the list of page texts for one PDF,
+    named after the SHA-256 of the file bytes and the extractor version.
+    Entry modification times track recency: hits touch the entry, and the
+    least recently used entries are evicted once the cache grows beyond
+    `max_bytes`.
+    """
+
+    def __init__(self, cache_dir=PDF_CACHE_DIR, max_bytes=PDF_CACHE_MAX_BYTES):
+        """Initialize the cache and create its directory if needed.
+
+        Args:
+            cache_dir (str): Directory where cache entries are stored
+            max_bytes (int): Maximum total size of all entries in bytes
+        """
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        os.makedirs(self.cache_dir, exist_ok=True)
+
+    @staticmethod
+    def make_key(pdf_bytes: bytes, extractor_version: str) -> str:
+        """Build the cache key for a PDF.
+
+        Args:
+            pdf_bytes (bytes): Raw content of the PDF file
+            extractor_version (str): Version of the text extractor
+
+        Returns:
+            str: Key combining the content hash and extractor version
+        """
+        digest = hashlib.sha256(pdf_bytes).hexdigest()
+        return f"{digest}-v{extractor_version}"
+
+    def _entry_path(self, key: str) -> str:
+        return os.path.join(self.cache_dir, f"{key}.json")
+
+    def get(self, key: str):
+        """Look up the cached pages for a key.
+
+        Args:
+            key (str): Cache key from `make_key`
+
+        Returns:
+            list[str] | None: Cached page texts, or None on a miss
+        """
+        path = self._entry_path(key)
+        try:
+            with open(file=path, mode="r", encoding="utf-8") as file:
+                pages = json.load(file)
+            # Touch the entry so it counts as recently used
+            os.utime(path)
+            return pages
+        except FileNotFoundError:
+            return None
+        except (OSError, ValueError):
+            # Drop unreadable or corrupt entries and treat them as misses
+            self._remove(path)
+            return None
+
+    def put(self, key: str, pages) -> None:
+        """Store the pages for a key and evict old entries if over budget.
+
+        Args:
+            key (str): Cache key from `make_key`
+            pages (list[str]): Extracted page texts
+        """
+        path = self._entry_path(key)
+        tmp_path = f"{path}.{threading.get_ident()}.tmp"
+        try:
+            with open(file=tmp_path, mode="w", encoding="utf-8") as file:
+                json.dump(pages, file)
+            os.replace(tmp_path, path)
+        except OSError as e:
+            self._remove(tmp_path)
+            print(f"Failed to write PDF cache entry: {e}")
+            return
+        self._evict()
+
+    def _evict(self) -> None:
+        """Remove least recently used entries until the cache fits `max_bytes`."""
+        with self._lock:
+            entries = []
+            total = 0
+            for entry in os.scandir(self.cache_dir):
+                if not entry.name.endswith(".json"):
+                    continue
+                try:
+                    stat = entry.stat()
+                except FileNotFoundError:
+                    continue
+                entries.append((stat.st_mtime, stat.st_size, entry.path))
+                total += stat.st_size
+
+            entries.sort()
+            for _, size, path in entries:
+                if total <= self.max_bytes:
+                    break
+                self._remove(path)
+                total -= size
+
+    @staticmethod
+    def _remove(path: str) -> None:
+        try:
+            os.remove(path)
+        except OSError:
+            pass
+
+
+_cache = None
+_cache_lock = threading.Lock()
+
+
+def get_pdf_cache() -> PdfTextCache:
+    """Return the process-wide PDF text cache, creating it on first use."""
+    global _cache
+    with _cache_lock:
+        if _cache is None:
+            _cache = PdfTextCache()
+        return _cache
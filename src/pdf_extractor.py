@@ -0,0 +1,152 @@
+"""Streaming and page-parallel PDF text extraction"""
+
+import io
+import os
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+
+# PDF source shared by every task of a worker process, set by `_init_worker`
+_worker_source = None
+
+
+def _open_reader(source):
+    """Open a PdfReader from a path or raw PDF bytes."""
+    # Imported on first use, so importing this module stays cheap
+    from pypdf import PdfReader
+
+    if isinstance(source, (bytes, bytearray)):
+        return PdfReader(io.BytesIO(source))
+    return PdfReader(source)
+
+
+def _resolve_range(num_pages: int, page_range=None):
+    """Clamp an optional (start, stop) page range to the document.
+
+    Args:
+        num_pages (int): Number of pages in the document
+        page_range (tuple[int, int] | None): Zero-based, stop-exclusive range
+
+    Returns:
+        tuple[int, int]: The effective (start, stop) range
+    """
+    if page_range is None:
+        return 0, num_pages
+    start, stop = page_range
+    start = max(0, start)
+    stop = num_pages if stop is None else min(num_pages, stop)
+    return start, max(start, stop)
+
+
+def count_pages(source) -> int:
+    """Return the number of pages in a PDF given a path or raw bytes."""
+    return len(_open_reader(source).pages)
+
+
+def iter_pages(source, page_range=None):
+    """Yield the text of each page one at a time.
+
+    Args:
+        source (str | bytes): Path to the PDF file or its raw bytes
+        page_range (tuple[int, int] | None): Zero-based, stop-exclusive range
+            of pages to extract. Defaults to the whole document.
+
+    Yields:
+        tuple[int, str]: Zero-based page number and the page's extracted text
+    """
+    reader = _open_reader(source)
+    start, stop = _resolve_range(len(reader.pages), page_range)
+    for page_number in range(start, stop):
+        yield page_number, reader.pages[page_number].extract_text()
+
+
+def _init_worker(source) -> None:
+    global _worker_source
+    _worker_source = source
+
+
+def _extract_range(start: int, stop: int) -> list:
+    """Extract a contiguous page range inside a worker process."""
+    return [text for _, text in iter_pages(_worker_source, (start, stop))]
+
+
+def iter_pages_parallel(source, page_range=None, workers=None, pages_per_task=16):
+    """Yield page texts in order while extracting page ranges across processes.
+
+    The selected pages are split into contiguous ranges of `pages_per_task`
+    pages. Each worker process opens the PDF once and extracts the ranges it
+    is given. At most two ranges per worker are submitted ahead of the
+    range being yielded, and another is submitted as each one is consumed,
+    so a slow consumer holds at most 2 * `workers` ranges of text in memory.
+
+    Args:
+        source (str | bytes): Path to the PDF file or its raw bytes
+        page_range (tuple[int, int] | None): Zero-based, stop-exclusive range
+            of pages to extract. Defaults to the whole document.
+        workers (int | None): Number of worker processes. Defaults to the CPU count.
+        pages_per_task (int): Number of pages extracted per worker task
+
+    Yields:
+        tuple[int, str]: Zero-based page number and the page's extracted text
+    """
+    start, stop = _resolve_range(count_pages(source), page_range)
+    ranges = [
+        (range_start, min(range_start + pages_per_task, stop))
+        for range_start in range(start, stop, pages_per_task)
+    ]
+    if not ranges:
+        return
+
+    workers = min(workers or os.cpu_count() or 1, len(ranges))
+    with ProcessPoolExecutor(
+        max_workers=workers, initializer=_init_worker, initargs=(source,)
+    ) as executor:
+        pending = iter(ranges)
+        in_flight = deque()
+        for range_start, range_stop in pending:
+            in_flight.append(
+                (range_start, executor.submit(_extract_range, range_start, range_stop))
+            )
+            if len(in_flight) == 2 * workers:
+                break
+        while in_flight:
+            range_start, future = in_flight.popleft()
+            texts = future.result()
+            next_range = next(pending, None)
+            if next_range is not None:
+                in_flight.append(
+                    (next_range[0], executor.submit(_extract_range, *next_range))
+                )
+            for offset, text in enumerate(texts):
+                yield range_start + offset, text
+
+
+def extract_pages(source, page_range=None, workers=1, parallel_min_pages=64) -> list:
+    """Extract the text of every selected page.
+
+    Documents with fewer than `parallel_min_pages` selected pages, or when
+    `workers` resolves to 1 (e.g. None on a single-CPU machine), are
+    extracted in-process, since starting worker processes costs more than it
+    saves on small files.
+
+    Args:
+        source (str | bytes): Path to the PDF file or its raw bytes
+        page_range (tuple[int, int] | None): Zero-based, stop-exclusive range
+            of pages to extract. Defaults to the whole document.
+        workers (int | None): Number of worker processes, or None for the CPU count
+        parallel_min_pages (int): Minimum page count before using processes
+
+    Returns:
+        list[str]: Extracted text of each selected page, in page order
+    """
+    start, stop = _resolve_range(count_pages(source), page_range)
+    workers = workers or os.cpu_count() or 1
+    if workers <= 1 or stop - start < parallel_min_pages:
+        pages = iter_pages(source, (start, stop))
+    else:
+        pages = iter_pages_parallel(source, (start, stop), workers=workers)
+    return [text for _, text in pages]
+
+
+def join_pages(pages) -> str:
+    """Concatenate page texts into the document text, one newline per page."""
+    return "".join(f"{text}\n" for text in pages)
@@ -0,0 +1,208 @@
+"""
+Background pipeline runs memoised by uploaded file content
+
+The pipeline, and with it crewai and the other heavy dependencies, is only
+imported when a job first runs or `PipelineJobs.warm_up` is called, so the
+app can serve its first page without waiting for those imports.
+"""
+
+import hashlib
+import importlib
+import io
+import json
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from config.config import CREW_POOL_SIZE, NUM_QUESTIONS, RESULT_CACHE_MAX_ENTRIES
+from src.tracing import span
+
+
+class PipelineJob:
+    """
+    State of one pipeline run for one PDF
+
+    `status` moves from "running" to either "done", with the parsed
+    (mcq, tf, analysis) dictionaries in `result`, or "failed", with the
+    error message in `error`. While running, `partial` maps the index of
+    each output already produced (0 = MCQ, 1 = T/F, 2 = analysis) to its
+    dictionary, so it can be shown before the whole run finishes.
+    `version` counts the edits of the finished result, so sessions that
+    cache a rendering of it can tell when it is stale.
+    """
+
+    def __init__(self, key: str):
+        self.key = key
+        self.status = "running"
+        self.result = None
+        self.error = None
+        self.partial = {}
+        self.version = 0
+        # Serializes edits of the finished result
+        self.lock = threading.Lock()
+
+    @property
+    def finished(self) -> bool:
+        return self.status != "running"
+
+
+class PipelineJobs:
+    """
+    Runs the quiz pipeline in background threads, one job per distinct PDF
+    and question count
+
+    Jobs are keyed by the SHA-256 of the PDF bytes and the question count,
+    so requesting the same quiz again, from any session, returns the
+    existing job instead of running the pipeline again. Finished jobs are
+    kept in an LRU cache of `max_entries`; failed jobs are retried on the
+    next submission.
+    """
+
+    def __init__(
+        self, max_workers=CREW_POOL_SIZE, max_entries=RESULT_CACHE_MAX_ENTRIES
+    ):
+        """Initialize the job registry.
+
+        Args:
+            max_workers (int): Maximum number of pipeline runs at once
+            max_entries (int): Maximum number of jobs kept in memory
+        """
+        self.max_entries = max_entries
+        self._jobs = OrderedDict()
+        self._lock = threading.Lock()
+        self._warm_up_started = False
+        self._executor = ThreadPoolExecutor(
+            max_workers=max_workers, thread_name_prefix="quiz-pipeline"
+        )
+
+    @staticmethod
+    def make_key(pdf_bytes: bytes, num_questions=NUM_QUESTIONS) -> str:
+        """Return the job key of a quiz of `num_questions` questions for a PDF."""
+        return f"{hashlib.sha256(pdf_bytes).hexdigest()}-{num_questions}"
+
+    def get(self, key: str):
+        """Return the job for a key, or None if there is none."""
+        with self._lock:
+            job = self._jobs.get(key)
+            if job is not None:
+                self._jobs.move_to_end(key)
+            return job
+
+    def submit(self, pdf_bytes: bytes, num_questions=NUM_QUESTIONS) -> PipelineJob:
+        """Start a pipeline run for a PDF unless one already exists.
+
+        Args:
+            pdf_bytes (bytes): Raw content of the uploaded PDF
+            num_questions (int): Questions in each of the MCQ and T/F quizzes
+
+        Returns:
+            PipelineJob: The new or existing job for this PDF and question count
+        """
+        key = self.make_key(pdf_bytes, num_questions)
+        with self._lock:
+            job = self._jobs.get(key)
+            if job is not None and job.status != "failed":
+                self._jobs.move_to_end(key)
+                return job
+
+            job = PipelineJob(key)
+            self._jobs[key] = job
+            self._jobs.move_to_end(key)
+            self._evict()
+
+        self._executor.submit(self._run, job, pdf_bytes, num_questions)
+        return job
+
+    def regenerate(
+        self, key: str, pdf_bytes: bytes, kind: str, index: int
+    ) -> PipelineJob:
+        """Replace one question of a finished job's quiz, and its analysis.
+
+        Runs in the calling thread; it makes a single small LLM call. The
+        job's result is updated in place and its `version` incremented, so
+        sessions that cached a rendering of the old result can refresh it.
+
+        Args:
+            key (str): Job key from `make_key`
+            pdf_bytes (bytes): Raw content of the PDF the quiz was generated from
+            kind (str): "mcq" or "tf"
+            index (int): Zero-based position of the question in its quiz
+
+        Returns:
+            PipelineJob: The updated job
+
+        Raises:
+            ValueError: If there is no finished job for the key, or kind and
+                index do not name a question of its quiz
+        """
+        from src.quiz_pipeline import regenerate_question
+
+        job = self.get(key)
+        if job is None or job.status != "done":
+            raise ValueError("There is no generated quiz to edit")
+        with job.lock:
+            outputs = regenerate_question(
+                io.BytesIO(pdf_bytes),
+                [json.dumps(part) for part in job.result],
+                kind,
+                index,
+            )
+            job.result = tuple(json.loads(output) for output in outputs)
+            job.version += 1
+        return job
+
+    def warm_up(self, crews=1) -> None:
+        """Import the pipeline and build crews in the background, once.
+
+        Call after the page has been served, so the first run finds crewai
+        imported and a crew ready instead of paying for both.
+
+        Args:
+            crews (int): Crews to build ahead of the first run
+        """
+        with self._lock:
+            if self._warm_up_started:
+                return
+            self._warm_up_started = True
+        self._executor.submit(self._warm_up, crews)
+
+    @staticmethod
+    def _warm_up(crews: int) -> None:
+        try:
+            with span("warm_up", crews=crews):
+                importlib.import_module("src.quiz_pipeline")
+                from src.crew_pool import get_crew_pool
+
+                get_crew_pool().warm_up(crews)
+        except Exception as e:
+            # The first run builds its own crew, and reports the error if any
+            print(f"Warm-up failed: {e}")
+
+    def _evict(self) -> None:
+        """Drop the least recently used finished jobs beyond `max_entries`."""
+        for key in list(self._jobs):
+            if len(self._jobs) <= self.max_entries:
+                break
+            if self._jobs[key].finished:
+                del self._jobs[key]
+
+    @staticmethod
+    def _run(job: PipelineJob, pdf_bytes: bytes, num_questions: int) -> None:
+        """Run the pipeline for a job and parse its JSON outputs once."""
+        try:
+            from src.quiz_pipeline import run_pipeline
+
+            outputs = run_pipeline(
+                io.BytesIO(pdf_bytes), num_questions, on_result=job.partial.__setitem__
+            )
+            with span("json_parse"):
+                job.result = tuple(json.loads(output) for output in outputs)
+            job.status = "done"
+        except json.JSONDecodeError:
+            job.error = (
+                "Error: Unable to parse quiz data. "
+                "The extracted content is not valid JSON."
+            )
+            job.status = "failed"
+        except Exception as e:
+            job.error = f"Error: Failed to generate quiz: {e}"
+            job.status = "failed"
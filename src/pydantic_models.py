@@ -1,7 +1,8 @@
 """pydantic Models for Quiz Generation and Analysis"""
 
+from functools import lru_cache
 from typing import List
-from pydantic import BaseModel, Field
+from pydantic import BaseModel, Field, create_model
 
 
 # ==============================
@@ -91,3 +92,65 @@ class TrueFalseQuiz(BaseModel):
         max_items=5,
         description="Exactly 5 high-quality true/false questions",
     )
+
+
+# ==========================================
+# Combined MCQ + T/F Generator Pydantic Model
+# ==========================================
+class CombinedQuiz(BaseModel):
+    """Model for the MCQ and True/False quizzes generated in a single call."""
+
+    mcq_quiz: MCQQuiz = Field(..., description="The multiple-choice quiz")
+    tf_quiz: TrueFalseQuiz = Field(..., description="The true/false quiz")
+
+
+# ==========================================
+# Single Question Regeneration Pydantic Models
+# ==========================================
+class RegeneratedMCQ(BaseModel):
+    """Model for a replacement MCQ generated together with its analysis."""
+
+    question: MCQQuestion = Field(..., description="The new multiple-choice question")
+    analysis: QuizQuestionAnalysis = Field(
+        ..., description="Analysis of the new question"
+    )
+
+
+class RegeneratedTrueFalse(BaseModel):
+    """Model for a replacement T/F question generated together with its analysis."""
+
+    question: TrueFalseQuestion = Field(..., description="The new true/false question")
+    analysis: QuizQuestionAnalysis = Field(
+        ..., description="Analysis of the new question"
+    )
+
+
+# ==============================
+# Quizzes of a Requested Size
+# ==============================
+@lru_cache(maxsize=None)
+def sized_quiz_model(quiz_model, count: int):
+    """Return a variant of a quiz model holding exactly `count` questions.
+
+    Args:
+        quiz_model (type[BaseModel]): `MCQQuiz` or `TrueFalseQuiz`
+        count (int): Number of questions
+
+    Returns:
+        type[BaseModel]: Subclass of `quiz_model` whose `quiz` list has
+            exactly `count` items, created once per size
+    """
+    item_model = quiz_model.model_fields["quiz"].annotation.__args__[0]
+    return create_model(
+        f"{quiz_model.__name__}{count}",
+        __base__=quiz_model,
+        quiz=(
+            List[item_model],
+            Field(
+                ...,
+                min_length=count,
+                max_length=count,
+                description=f"Exactly {count} high-quality questions",
+            ),
+        ),
+    )
@@ -0,0 +1,350 @@
+"""
+Persistent Question Bank
+
+Every generated question is stored in a local SQLite database, together
+with its analysis, the topic of its quiz and the hash of the document text
+it was generated from, so later requests for the same document can be
+served, or topped up, without calling the LLM. Questions are also indexed
+with FTS5 for full-text search across all documents.
+"""
+
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+from collections import Counter
+from config.config import QUESTION_BANK_PATH
+from src.dedup import DedupIndex
+
+QUESTION_KINDS = ("mcq", "tf")
+
+
+class QuestionBank:
+    """
+    SQLite store of generated questions keyed by source document
+
+    A question is stored with its kind ("mcq" or "tf"), topic, optional
+    page span and analysis. Near-duplicates of questions already stored for
+    the same document are not stored again. Only questions stored with an
+    analysis are served back as quizzes.
+    """
+
+    def __init__(self, path=QUESTION_BANK_PATH):
+        """Open (or create) the question bank database.
+
+        Args:
+            path (str): Path to the SQLite database file
+        """
+        self._lock = threading.Lock()
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        with self._conn:
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute("""
+                CREATE TABLE IF NOT EXISTS questions (
+                    id INTEGER PRIMARY KEY,
+                    document_hash TEXT NOT NULL,
+                    kind TEXT NOT NULL,
+                    topic TEXT,
+                    page_start INTEGER,
+                    page_end INTEGER,
+                    question TEXT NOT NULL,
+                    options TEXT NOT NULL,
+                    correct_index INTEGER NOT NULL,
+                    analysis TEXT,
+                    created_at REAL NOT NULL
+                )
+                """)
+            self._conn.execute(
+                "CREATE INDEX IF NOT EXISTS questions_document "
+                "ON questions (document_hash, kind, id)"
+            )
+            # External-content FTS index kept in sync by triggers
+            self._conn.execute("""
+                CREATE VIRTUAL TABLE IF NOT EXISTS questions_fts USING fts5(
+                    question, options, topic,
+                    content='questions', content_rowid='id'
+                )
+                """)
+            self._conn.execute("""
+                CREATE TRIGGER IF NOT EXISTS questions_fts_insert
+                AFTER INSERT ON questions BEGIN
+                    INSERT INTO questions_fts (rowid, question, options, topic)
+                    VALUES (new.id, new.question, new.options, new.topic);
+                END
+                """)
+            self._conn.execute("""
+                CREATE TRIGGER IF NOT EXISTS questions_fts_delete
+                AFTER DELETE ON questions BEGIN
+                    INSERT INTO questions_fts
+                        (questions_fts, rowid, question, options, topic)
+                    VALUES ('delete', old.id, old.question, old.options, old.topic);
+                END
+                """)
+
+    @staticmethod
+    def document_key(text: str) -> str:
+        """Return the hash identifying a document by its extracted text."""
+        return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+    def _rows(self, document_hash: str, kind: str, analyzed_only=False) -> list:
+        query = (
+            "SELECT question, options, correct_index, topic, analysis "
+            "FROM questions WHERE document_hash = ? AND kind = ?"
+        )
+        if analyzed_only:
+            query += " AND analysis IS NOT NULL"
+        return self._conn.execute(
+            query + " ORDER BY id", (document_hash, kind)
+        ).fetchall()
+
+    @staticmethod
+    def _question(row) -> dict:
+        question, options, correct_index = row[:3]
+        return {
+            "question": question,
+            "options": json.loads(options),
+            "correct_index": correct_index,
+        }
+
+    def add_quiz(
+        self, document_hash: str, mcq_quiz, tf_quiz, analysis=None, page_spans=None
+    ) -> int:
+        """Store the questions of a generated quiz.
+
+        Analyses and page spans are matched to questions by position, MCQ
+        questions first, as the analysis task returns them; if the counts
+        differ, the questions are stored without them.
+
+        Args:
+            document_hash (str): Key of the source document from `document_key`
+            mcq_quiz (dict): MCQ quiz with "quiz" and "topic"
+            tf_quiz (dict): True/False quiz with "quiz"
+            analysis (dict | None): Quiz analysis with "quiz"
+            page_spans (list[tuple[int, int] | None] | None): First and last
+                source page of each question, if known
+
+        Returns:
+            int: Number of questions stored, excluding near-duplicates
+        """
+        questions = [("mcq", item) for item in mcq_quiz.get("quiz", [])]
+        questions += [("tf", item) for item in tf_quiz.get("quiz", [])]
+        analyses = (analysis or {}).get("quiz", [])
+        if len(analyses) != len(questions):
+            analyses = [None] * len(questions)
+        if page_spans is None or len(page_spans) != len(questions):
+            page_spans = [None] * len(questions)
+        topic = mcq_quiz.get("topic")
+        now = time.time()
+
+        stored = 0
+        with self._lock, self._conn:
+            indexes = {}
+            for kind in QUESTION_KINDS:
+                indexes[kind] = DedupIndex()
+                for row in self._rows(document_hash, kind):
+                    indexes[kind].add(self._question(row))
+
+            for (kind, item), item_analysis, page_span in zip(
+                questions, analyses, page_spans
+            ):
+                if indexes[kind].add(item) is None:
+                    continue
+                page_start, page_end = page_span or (None, None)
+                self._conn.execute(
+                    """
+                    INSERT INTO questions (
+                        document_hash, kind, topic, page_start, page_end,
+                        question, options, correct_index, analysis, created_at
+                    ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+                    """,
+                    (
+                        document_hash,
+                        kind,
+                        topic,
+                        page_start,
+                        page_end,
+                        item["question"],
+                        json.dumps(item["options"]),
+                        item["correct_index"],
+                        json.dumps(item_analysis) if item_analysis else None,
+                        now,
+                    ),
+                )
+                stored += 1
+        return stored
+
+    def available(self, document_hash: str) -> int:
+        """Return the largest quiz size that can be served for a document."""
+        with self._lock:
+            return min(
+                len(self._rows(document_hash, kind, analyzed_only=True))
+                for kind in QUESTION_KINDS
+            )
+
+    def get_quiz(self, document_hash: str, num_questions: int):
+        """Build a quiz from stored questions, if enough are stored.
+
+        Args:
+            document_hash (str): Key of the source document from `document_key`
+            num_questions (int): Questions in each of the MCQ and T/F quizzes
+
+        Returns:
+            tuple | None: (mcq_quiz, tf_quiz, analysis) dictionaries shaped
+                like the pipeline outputs, or None if fewer than
+                `num_questions` analyzed questions of either kind are stored
+        """
+        with self._lock:
+            rows = {
+                kind: self._rows(document_hash, kind, analyzed_only=True)[
+                    :num_questions
+                ]
+                for kind in QUESTION_KINDS
+            }
+        if any(len(kind_rows) < num_questions for kind_rows in rows.values()):
+            return None
+        return self._quiz(rows)
+
+    @classmethod
+    def _quiz(cls, rows: dict) -> tuple:
+        """Build (mcq_quiz, tf_quiz, analysis) from the rows of each kind."""
+        topics = Counter(row[3] for row in rows["mcq"] if row[3])
+        mcq_quiz = {
+            "quiz": [cls._question(row) for row in rows["mcq"]],
+            "topic": topics.most_common(1)[0][0] if topics else "",
+        }
+        tf_quiz = {"quiz": [cls._question(row) for row in rows["tf"]]}
+        analysis = {
+            "quiz": [
+                json.loads(row[4]) if row[4] else None
+                for row in rows["mcq"] + rows["tf"]
+            ]
+        }
+        return mcq_quiz, tf_quiz, analysis
+
+    def iter_quizzes(self, batch_size: int = 100):
+        """Yield the stored questions of every document as one quiz each.
+
+        Document keys are read in batches of `batch_size` and the lock is
+        only held while reading, so exporting the whole bank keeps one
+        document's questions in memory and does not block other callers.
+
+        Args:
+            batch_size (int): Document keys read per query
+
+        Yields:
+            tuple: (mcq_quiz, tf_quiz, analysis) of one document, shaped like
+                `get_quiz`; the analysis of an unanalyzed question is None
+        """
+        last_key = ""
+        while True:
+            with self._lock:
+                keys = [
+                    row[0]
+                    for row in self._conn.execute(
+                        "SELECT DISTINCT document_hash FROM questions "
+                        "WHERE document_hash > ? ORDER BY document_hash LIMIT ?",
+                        (last_key, batch_size),
+                    ).fetchall()
+                ]
+            if not keys:
+                return
+            for document_hash in keys:
+                with self._lock:
+                    rows = {
+                        kind: self._rows(document_hash, kind) for kind in QUESTION_KINDS
+                    }
+                yield self._quiz(rows)
+            last_key = keys[-1]
+
+    def search(self, query: str, kind=None, document_hash=None, limit: int = 20):
+        """Full-text search of stored questions, best matches first.
+
+        Args:
+            query (str): FTS5 query, e.g. "forget gate" or "lstm OR gru"
+            kind (str | None): Only return "mcq" or "tf" questions
+            document_hash (str | None): Only return questions of one document
+            limit (int): Maximum number of results
+
+        Returns:
+            list[dict]: Matching questions with their "kind", "topic",
+                "document_hash", "analysis" (None if not analyzed) and
+                "pages" (first and last source page, None if unknown)
+        """
+        sql = (
+            "SELECT q.question, q.options, q.correct_index, q.topic, q.analysis, "
+            "q.kind, q.document_hash, q.page_start, q.page_end FROM questions_fts "
+            "JOIN questions q ON q.id = questions_fts.rowid "
+            "WHERE questions_fts MATCH ?"
+        )
+        params = [query]
+        if kind is not None:
+            sql += " AND q.kind = ?"
+            params.append(kind)
+        if document_hash is not None:
+            sql += " AND q.document_hash = ?"
+            params.append(document_hash)
+        sql += " ORDER BY bm25(questions_fts) LIMIT ?"
+        params.append(limit)
+
+        with self._lock:
+            rows = self._conn.execute(sql, params).fetchall()
+        return [
+            {
+                **self._question(row),
+                "kind": row[5],
+                "topic": row[3],
+                "document_hash": row[6],
+                "analysis": json.loads(row[4]) if row[4] else None,
+                "pages": (row[7], row[8]) if row[7] is not None else None,
+            }
+            for row in rows
+        ]
+
+    def remove_question(self, document_hash: str, kind: str, question: str) -> int:
+        """Remove a stored question, e.g. one that was rejected and replaced.
+
+        Args:
+            document_hash (str): Key of the source document from `document_key`
+            kind (str): "mcq" or "tf"
+            question (str): Exact text of the question
+
+        Returns:
+            int: Number of questions removed
+        """
+        with self._lock, self._conn:
+            return self._conn.execute(
+                "DELETE FROM questions "
+                "WHERE document_hash = ? AND kind = ? AND question = ?",
+                (document_hash, kind, question),
+            ).rowcount
+
+    def stats(self) -> dict:
+        """Return the number of stored questions and documents."""
+        with self._lock:
+            questions, documents = self._conn.execute(
+                "SELECT COUNT(*), COUNT(DISTINCT document_hash) FROM questions"
+            ).fetchone()
+        return {"questions": questions, "documents": documents}
+
+    def clear(self) -> None:
+        """Remove every stored question."""
+        with self._lock, self._conn:
+            self._conn.execute("DELETE FROM questions")
+
+
+_bank = None
+_bank_lock = threading.Lock()
+
+
+def get_question_bank() -> QuestionBank:
+    """Return the process-wide question bank, creating it on first use."""
+    global _bank
+    with _bank_lock:
+        if _bank is None:
+            _bank = QuestionBank()
+        return _bank
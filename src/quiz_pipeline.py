@@ -5,82 +5,101 @@ Orchestrates the process of extracting text from PDFs and generating quiz questi
 using CrewAI agents. Takes a PDF input and produces JSON quiz output.
 """
 
-import os
-from src.crew import QuizGeneratorCrew
-from src.utils import process_pdf
-from config.config import DATA_PATH, OUTPUT_PATH, RUNNING
+import json
+import uuid
+from src.chunking import estimate_tokens
+from src.compression import compress_text
+from src.crew_pool import get_crew_pool
+from src.dedup import DedupIndex
+from src.map_reduce import QUESTIONS_PER_QUIZ, run_map_reduce, run_sharded
+from src.normalize import normalize_pages
+from src.question_bank import get_question_bank
+from src.retrieval import get_source_index
+from src.tracing import get_metrics, span
+from src.pdf_extractor import join_pages
+from src.utils import (
+    pdf_error_message,
+    pdf_errors,
+    process_pdf_pages,
+    save_run_outputs,
+)
+from config.config import (
+    COMPRESSION_ENABLED,
+    COMPRESSION_TOKEN_BUDGET,
+    DATA_PATH,
+    MAP_REDUCE_THRESHOLD_TOKENS,
+    MAX_NUM_QUESTIONS,
+    NORMALIZE_ENABLED,
+    NUM_QUESTIONS,
+    PDF_EXTRACT_WORKERS,
+    QUESTION_BANK_ENABLED,
+    REGENERATE_CONTEXT_PASSAGES,
+    REGENERATE_MAX_ATTEMPTS,
+    RETRIEVAL_ENABLED,
+    RUNNING,
+)
 
+# Names of the tasks producing each entry of the [mcq, tf, analysis] results
+TASK_NAMES = (
+    "MCQ Quiz Generate",
+    "True False Quiz Generate",
+    "Quiz Questions Analysis",
+)
 
-def run_pipeline(data_path):
+
+def run_pipeline(data_path, num_questions=NUM_QUESTIONS, on_result=None):
     """Run the quiz generation pipeline.
 
     This function orchestrates the complete quiz generation process:
-    1. Extracts text content from the input PDF
-    2. Initializes the CrewAI agents and tasks
-    3. Generates MCQ and True/False questions
-    4. Produces detailed quiz analysis
+    1. Extracts text content from the input PDF and, if COMPRESSION_ENABLED,
+       compresses it to the most informative sentences within COMPRESSION_TOKEN_BUDGET
+    2. Borrows an initialized crew from the process-wide crew pool
+    3. Generates MCQ and True/False questions, chunking documents larger
+       than MAP_REDUCE_THRESHOLD_TOKENS and reducing per-chunk candidates,
+       and generating quizzes larger than five questions in parallel shards
+    4. Produces detailed quiz analysis, grounded in the page-tagged
+       passages of the PDF most relevant to each question if RETRIEVAL_ENABLED
 
     Args:
         data_path (str): Path to the input PDF file
+        num_questions (int): Questions in each of the MCQ and T/F quizzes
+        on_result (callable | None): Called as on_result(index, json_dict)
+            with each of the MCQ (0), T/F (1) and analysis (2) outputs as
+            soon as it is ready, before the pipeline returns
 
     Returns:
         If RUNNING == "LOCAL":
-            dict: Raw output from CrewAI agents containing generated quiz content
+            tuple: (mcq_json, tf_json, analysis_json) strings, also saved to a
+                per-run directory under OUTPUT_PATH
         If RUNNING == "SERVER":
-            tuple: (mcq_json, tf_json, analysis_json) strings containing the quiz data
+            list: [mcq_json, tf_json, analysis_json] strings containing the quiz data
 
     Raises:
         Exception: If PDF processing or quiz generation fails
         ValueError: If RUNNING environment is not 'SERVER' or 'LOCAL'
     """
+    run_id = uuid.uuid4().hex
     try:
-        # Process PDF
-        txt = process_pdf(data_path)
-        print("PDF content extracted successfully!")
-        # Initialize and run crew
-        inputs = {"text": txt}
-        generator = QuizGeneratorCrew()
-        result = generator.kickoff(inputs=inputs)
+        with span("pipeline", run_id=run_id):
+            txt, pages = prepare_document(data_path)
+            sources = get_source_index(pages) if RETRIEVAL_ENABLED and pages else None
+            task_results = generate_quiz(
+                txt, num_questions, sources=sources, on_result=on_result
+            )
     except Exception as e:
         print(f"Pipeline failed: {str(e)}")
         raise
 
     if RUNNING == "SERVER":
-        task_results = [None, None, None]
-
-        for result in result.tasks_output:
-            if result.name == "MCQ Quiz Generate":
-                task_results[0] = result.json
-            elif result.name == "True False Quiz Generate":
-                task_results[1] = result.json
-            elif result.name == "Quiz Questions Analysis":
-                task_results[2] = result.json
-            else:
-                raise NameError(f"Unknown task name {result.name}")
-
         return task_results
 
     if RUNNING == "LOCAL":
         try:
-            with open(
-                file=os.path.join(OUTPUT_PATH, "mcq_quiz.json"),
-                mode="r",
-                encoding="utf-8",
-            ) as f1, open(
-                file=os.path.join(OUTPUT_PATH, "tf_quiz.json"),
-                mode="r",
-                encoding="utf-8",
-            ) as f2, open(
-                file=os.path.join(OUTPUT_PATH, "quiz_analysis.json"),
-                mode="r",
-                encoding="utf-8",
-            ) as f3:
-                mcq_data = f1.read()
-                tf_data = f2.read()
-                quiz_analysis_data = f3.read()
-                return mcq_data, tf_data, quiz_analysis_data
+            output_dir = save_run_outputs(run_id, task_results)
+            print(f"Quiz outputs saved to {output_dir}")
+            return tuple(task_results)
         except Exception as e:
-            raise RuntimeError(f"Failed to read quiz output files: {e}") from e
+            raise RuntimeError(f"Failed to save quiz output files: {e}") from e
     else:
         raise ValueError(
             "Error: RUNNING Environment muse be ('SERVER' or 'LOCAL')"
@@ -88,6 +107,355 @@ def run_pipeline(data_path):
         )
 
 
+def prepare_text(data_path, extract_workers=PDF_EXTRACT_WORKERS) -> str:
+    """Extract the text of a PDF and compress it for the prompts.
+
+    Args:
+        data_path (str | file-like): Path to the input PDF file or an open binary file
+        extract_workers (int | None): Worker processes used to extract large PDFs
+
+    Returns:
+        str: Text to generate the quiz from
+    """
+    return prepare_document(data_path, extract_workers)[0]
+
+
+def prepare_document(data_path, extract_workers=PDF_EXTRACT_WORKERS) -> tuple:
+    """Extract the pages of a PDF and the compressed text for the prompts.
+
+    If NORMALIZE_ENABLED, headers, footers and other text repeated across
+    pages are removed from the pages first.
+
+    Args:
+        data_path (str | file-like): Path to the input PDF file or an open binary file
+        extract_workers (int | None): Worker processes used to extract large PDFs
+
+    Returns:
+        tuple: (txt, pages) with the text to generate the quiz from and the
+            uncompressed, normalized text of each page. If the PDF cannot be read, `txt`
+            is the error message of `process_pdf` and `pages` is empty.
+    """
+    # Process PDF
+    with span("extraction") as extraction_span:
+        try:
+            pages = process_pdf_pages(data_path, workers=extract_workers)
+            txt = join_pages(pages)
+        except pdf_errors() as e:
+            pages, txt = [], pdf_error_message(e)
+        extraction_span.set_attribute("text_tokens", estimate_tokens(txt))
+    print("PDF content extracted successfully!")
+    if NORMALIZE_ENABLED and pages:
+        with span("normalization") as normalization_span:
+            pages, stats = normalize_pages(pages)
+            txt = join_pages(pages)
+            normalization_span.set_attribute("tokens_saved", stats["tokens_saved"])
+        get_metrics().incr("normalization.tokens_saved", stats["tokens_saved"])
+        print(
+            f"Removed {stats['lines_removed']} repeated lines and layout noise, "
+            f"saving {stats['tokens_saved']} of {stats['original_tokens']} tokens"
+        )
+    if COMPRESSION_ENABLED:
+        with span("compression") as compression_span:
+            txt, stats = compress_text(txt, COMPRESSION_TOKEN_BUDGET)
+            compression_span.set_attribute(
+                "compressed_tokens", stats["compressed_tokens"]
+            )
+        print(
+            f"PDF content compressed from {stats['original_tokens']} to "
+            f"{stats['compressed_tokens']} tokens "
+            f"(ratio {stats['compression_ratio']:.2f})"
+        )
+    return txt, pages
+
+
+def generate_quiz(
+    txt: str,
+    num_questions=NUM_QUESTIONS,
+    use_bank=QUESTION_BANK_ENABLED,
+    sources=None,
+    on_result=None,
+) -> list:
+    """Generate and analyze the MCQ and True/False quizzes for a text.
+
+    With the question bank enabled, a quiz is served from the questions
+    stored for the same text when there are enough of them. If only some
+    are stored, just the missing questions, plus a spare set to make up for
+    duplicates, are generated to top the quiz up. Newly generated questions
+    are added to the bank.
+
+    Args:
+        txt (str): Text to generate the quiz from
+        num_questions (int): Questions in each of the MCQ and T/F quizzes
+        use_bank (bool): Whether to read from and write to the question bank
+        sources (SourceIndex | None): Index of the source document pages to
+            ground the analysis in; also gives stored questions their pages
+        on_result (callable | None): Called as on_result(index, json_dict)
+            with each entry of the results as soon as it is ready
+
+    Returns:
+        list: [mcq_json, tf_json, analysis_json] strings
+
+    Raises:
+        ValueError: If num_questions is not between 1 and MAX_NUM_QUESTIONS
+    """
+    if not 1 <= num_questions <= MAX_NUM_QUESTIONS:
+        raise ValueError(
+            f"num_questions must be between 1 and {MAX_NUM_QUESTIONS}, "
+            f"got {num_questions}"
+        )
+    if not use_bank:
+        return run_generation(txt, num_questions, sources, on_result)
+
+    bank = get_question_bank()
+    document_hash = bank.document_key(txt)
+    with span("question_bank", num_questions=num_questions) as bank_span:
+        stored = bank.get_quiz(document_hash, num_questions)
+        available = bank.available(document_hash) if stored is None else None
+        bank_span.set_attribute("hit", stored is not None)
+    if stored is not None:
+        get_metrics().incr("question_bank.hits")
+        print("Quiz served from the question bank!")
+        report_stored(on_result, stored)
+        return [json.dumps(part) for part in stored]
+    get_metrics().incr("question_bank.misses")
+
+    if available:
+        top_up = min(MAX_NUM_QUESTIONS, num_questions - available + QUESTIONS_PER_QUIZ)
+        print(f"Topping up {available} stored questions with {top_up} new ones")
+        store_task_results(
+            bank, document_hash, run_generation(txt, top_up, sources), sources
+        )
+        stored = bank.get_quiz(document_hash, num_questions)
+        if stored is not None:
+            report_stored(on_result, stored)
+            return [json.dumps(part) for part in stored]
+
+    task_results = run_generation(txt, num_questions, sources, on_result)
+    store_task_results(bank, document_hash, task_results, sources)
+    return task_results
+
+
+def report_stored(on_result, stored) -> None:
+    """Report a quiz served from the question bank, all outputs at once."""
+    if on_result is not None:
+        for index, part in enumerate(stored):
+            on_result(index, part)
+
+
+def store_task_results(bank, document_hash: str, task_results, sources=None) -> None:
+    """Add the questions of a generated quiz to the question bank.
+
+    Failures are reported and ignored, since the quiz itself is still valid.
+
+    Args:
+        bank (QuestionBank): Question bank to store into
+        document_hash (str): Key of the source document
+        task_results (list): [mcq_json, tf_json, analysis_json] strings
+        sources (SourceIndex | None): Index the pages of each question are
+            looked up in
+    """
+    try:
+        mcq_quiz, tf_quiz, analysis = (
+            json.loads(result) if result else {} for result in task_results
+        )
+        page_spans = None
+        if sources is not None:
+            page_spans = [
+                sources.page_span(question)
+                for quiz in (mcq_quiz, tf_quiz)
+                for question in quiz.get("quiz", [])
+            ]
+        stored = bank.add_quiz(
+            document_hash, mcq_quiz, tf_quiz, analysis, page_spans=page_spans
+        )
+        print(f"{stored} new questions added to the question bank")
+    except Exception as e:
+        print(f"Failed to store questions in the question bank: {e}")
+
+
+def task_reporter(on_result):
+    """Adapt an on_result(index, json_dict) callback to the crew's task names.
+
+    Returns:
+        callable | None: Callback taking (task_name, json_dict), or None
+            without `on_result`
+    """
+    if on_result is None:
+        return None
+
+    def report(task_name, json_dict):
+        if task_name in TASK_NAMES:
+            on_result(TASK_NAMES.index(task_name), json_dict)
+
+    return report
+
+
+def run_generation(txt: str, num_questions: int, sources=None, on_result=None) -> list:
+    """Generate and analyze quizzes with the LLM, without the question bank.
+
+    Args:
+        txt (str): Text to generate the quiz from
+        num_questions (int): Questions in each of the MCQ and T/F quizzes
+        sources (SourceIndex | None): Index of the source document pages to
+            ground the analysis in
+        on_result (callable | None): Called as on_result(index, json_dict)
+            with each entry of the results as soon as its task finishes
+
+    Returns:
+        list: [mcq_json, tf_json, analysis_json] strings
+    """
+    # Borrow a crew and run it
+    inputs = {"text": txt}
+    report = task_reporter(on_result)
+    with get_crew_pool().acquire() as generator, span(
+        "generation", num_questions=num_questions
+    ) as generation_span:
+        if estimate_tokens(txt) > MAP_REDUCE_THRESHOLD_TOKENS:
+            generation_span.set_attribute("strategy", "map_reduce")
+            result = run_map_reduce(generator, txt, num_questions, sources, report)
+        elif num_questions != QUESTIONS_PER_QUIZ:
+            generation_span.set_attribute("strategy", "sharded")
+            result = run_sharded(generator, txt, num_questions, sources, report)
+        else:
+            generation_span.set_attribute("strategy", "single_prompt")
+            result = generator.kickoff(inputs=inputs, sources=sources, on_result=report)
+    return collect_task_results(result)
+
+
+def regenerate_question(data_path, task_results, kind: str, index: int) -> list:
+    """Replace one question of a generated quiz, and its analysis.
+
+    Only the replacement and its analysis are generated, in a single call
+    whose prompt holds the REGENERATE_CONTEXT_PASSAGES source passages
+    nearest the rejected question instead of the whole document. Extraction
+    is served from the PDF text cache and the passage index from memory.
+    A replacement that duplicates another question of the quiz, or that is
+    not valid JSON, is generated again, up to REGENERATE_MAX_ATTEMPTS calls
+    in total. With the question
+    bank enabled, the rejected question is removed from it and the
+    replacement added.
+
+    Args:
+        data_path (str | file-like): The PDF the quiz was generated from
+        task_results (list): [mcq_json, tf_json, analysis_json] strings of the quiz
+        kind (str): "mcq" or "tf"
+        index (int): Zero-based position of the question in its quiz
+
+    Returns:
+        list: [mcq_json, tf_json, analysis_json] strings with the question
+            and its analysis replaced
+
+    Raises:
+        ValueError: If kind and index do not name a question of the quiz
+        RuntimeError: If the PDF cannot be read, or no attempt returned a
+            valid replacement that duplicates no other question
+    """
+    mcq_quiz, tf_quiz, analysis = (json.loads(result) for result in task_results)
+    quizzes = {"mcq": mcq_quiz, "tf": tf_quiz}
+    if kind not in quizzes:
+        raise ValueError(f"kind must be 'mcq' or 'tf', got {kind!r}")
+    questions = quizzes[kind]["quiz"]
+    if not 0 <= index < len(questions):
+        raise ValueError(
+            f"index must be between 0 and {len(questions) - 1}, got {index}"
+        )
+    rejected = questions[index]
+    others = questions[:index] + questions[index + 1 :]
+
+    txt, pages = prepare_document(data_path)
+    if not pages:
+        raise RuntimeError(txt)
+    sources = get_source_index(pages)
+    context = txt
+    if RETRIEVAL_ENABLED:
+        passage_ids = sources.question_passages(rejected, REGENERATE_CONTEXT_PASSAGES)
+        context = sources.format_passages(passage_ids) or txt
+
+    # The replacement must differ from the rejected question too
+    index_of_others = DedupIndex()
+    for question in others + [rejected]:
+        index_of_others.add(question)
+    avoided = list(others)
+    replacement = None
+    with get_crew_pool().acquire() as generator, span(
+        "regeneration", kind=kind, index=index
+    ) as regeneration_span:
+        for attempt in range(1, REGENERATE_MAX_ATTEMPTS + 1):
+            output = generator.regenerate_question(kind, rejected, avoided, context)
+            candidate = output.json_dict
+            if candidate is None:
+                # The output could not be converted to JSON; counts as an attempt
+                print("Regenerated question is not valid JSON")
+                continue
+            if not index_of_others.is_duplicate(candidate["question"]):
+                replacement = candidate
+                break
+            print("Regenerated question duplicates another question of the quiz")
+            avoided.append(candidate["question"])
+        regeneration_span.set_attribute("attempts", attempt)
+    if replacement is None:
+        raise RuntimeError(
+            "Failed to regenerate question: no valid, distinct replacement in "
+            f"{attempt} attempts"
+        )
+    get_metrics().incr("regenerations")
+
+    quizzes[kind] = {
+        **quizzes[kind],
+        "quiz": questions[:index] + [replacement["question"]] + others[index:],
+    }
+    analyses = list(analysis.get("quiz", []))
+    position = index if kind == "mcq" else len(mcq_quiz["quiz"]) + index
+    if len(analyses) == len(mcq_quiz["quiz"]) + len(tf_quiz["quiz"]):
+        analyses[position] = replacement["analysis"]
+    else:
+        print("Quiz analysis does not match the questions; left unchanged")
+
+    if QUESTION_BANK_ENABLED:
+        try:
+            bank = get_question_bank()
+            document_hash = bank.document_key(txt)
+            bank.remove_question(document_hash, kind, rejected["question"])
+            replaced = {"quiz": [replacement["question"]]}
+            bank.add_quiz(
+                document_hash,
+                {**replaced, "topic": mcq_quiz.get("topic")} if kind == "mcq" else {},
+                replaced if kind == "tf" else {},
+                {"quiz": [replacement["analysis"]]},
+                page_spans=[sources.page_span(replacement["question"])],
+            )
+        except Exception as e:
+            print(f"Failed to update the question bank: {e}")
+
+    return [
+        json.dumps(quizzes["mcq"]),
+        json.dumps(quizzes["tf"]),
+        json.dumps({**analysis, "quiz": analyses}),
+    ]
+
+
+def collect_task_results(result):
+    """Collect the JSON output of each task from a crew result.
+
+    Args:
+        result (CrewOutput): Output of the quiz generator crew
+
+    Returns:
+        list: [mcq_json, tf_json, analysis_json] strings
+
+    Raises:
+        NameError: If the result contains an unknown task
+    """
+    task_results = [None, None, None]
+
+    for task_output in result.tasks_output:
+        if task_output.name not in TASK_NAMES:
+            raise NameError(f"Unknown task name {task_output.name}")
+        task_results[TASK_NAMES.index(task_output.name)] = task_output.json
+
+    return task_results
+
+
 if __name__ == "__main__":
     result = run_pipeline(DATA_PATH)
     print(result)
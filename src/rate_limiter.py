@@ -0,0 +1,291 @@
+"""
+Client-side LLM Rate Limiting
+
+A process-wide scheduler that keeps LLM calls within the provider's
+requests-per-minute and tokens-per-minute limits. Callers wait in a priority
+queue, so interactive runs from the web app go ahead of batch jobs, and a
+rate-limit (HTTP 429) response pauses every caller for a jittered backoff
+instead of letting each one retry on its own.
+"""
+
+import contextvars
+import heapq
+import itertools
+import random
+import threading
+import time
+from contextlib import contextmanager
+from typing import Any
+from pydantic import Field
+from config.config import (
+    LLM_BACKOFF_BASE_SECONDS,
+    LLM_BACKOFF_MAX_SECONDS,
+    LLM_EXPECTED_COMPLETION_TOKENS,
+    LLM_MAX_RETRIES,
+    LLM_REQUESTS_PER_MINUTE,
+    LLM_TOKENS_PER_MINUTE,
+)
+from src.chunking import estimate_tokens
+from src.llm_wrappers import DelegatingLLM
+from src.tracing import get_metrics
+
+PRIORITY_INTERACTIVE = 0
+PRIORITY_BATCH = 10
+
+_priority = contextvars.ContextVar("llm_priority", default=PRIORITY_INTERACTIVE)
+
+
+@contextmanager
+def llm_priority(level: int):
+    """Run the body of a `with` block with the given LLM call priority.
+
+    Lower values are served first. The priority follows work into thread
+    pools submitted with `src.tracing.submit_in_context`.
+    """
+    token = _priority.set(level)
+    try:
+        yield
+    finally:
+        _priority.reset(token)
+
+
+class TokenBucket:
+    """Bucket of `capacity` units refilled continuously at `refill_per_second`"""
+
+    def __init__(self, capacity: float, refill_per_second: float):
+        self.capacity = capacity
+        self.refill_per_second = refill_per_second
+        self.tokens = capacity
+        self._updated = time.monotonic()
+
+    def _refill(self, now: float) -> None:
+        elapsed = now - self._updated
+        self.tokens = min(self.capacity, self.tokens + elapsed * self.refill_per_second)
+        self._updated = now
+
+    def wait_time(self, amount: float, now: float) -> float:
+        """Return the seconds until `amount` units are available.
+
+        Amounts above the capacity only wait for a full bucket, so oversized
+        requests still go through.
+        """
+        self._refill(now)
+        missing = min(amount, self.capacity) - self.tokens
+        return max(0.0, missing / self.refill_per_second)
+
+    def consume(self, amount: float, now: float) -> None:
+        """Take `amount` units; a negative amount gives units back."""
+        self._refill(now)
+        self.tokens = min(self.capacity, self.tokens - amount)
+
+
+class RateLimiter:
+    """
+    Shared request and token budget with a priority queue of callers
+
+    Only the caller at the head of the queue, ordered by priority and then
+    arrival, may take budget, so low-priority callers never starve
+    high-priority ones. Queue depth and wait times are reported to the
+    metrics registry as "rate_limiter.queue_depth" and
+    "rate_limiter.wait_seconds".
+    """
+
+    def __init__(
+        self,
+        requests_per_minute=LLM_REQUESTS_PER_MINUTE,
+        tokens_per_minute=LLM_TOKENS_PER_MINUTE,
+    ):
+        """Initialize the limiter with full buckets.
+
+        Args:
+            requests_per_minute (float): Maximum LLM requests per minute
+            tokens_per_minute (float): Maximum prompt plus completion tokens per minute
+        """
+        self._requests = TokenBucket(requests_per_minute, requests_per_minute / 60)
+        self._tokens = TokenBucket(tokens_per_minute, tokens_per_minute / 60)
+        self._waiters = []
+        self._sequence = itertools.count()
+        self._paused_until = 0.0
+        self._condition = threading.Condition()
+
+    def _update_depth(self) -> None:
+        get_metrics().set_gauge("rate_limiter.queue_depth", len(self._waiters))
+
+    def acquire(self, tokens: int, priority=None, timeout=None) -> float:
+        """Wait until one request of `tokens` tokens fits in the budget, and take it.
+
+        Args:
+            tokens (int): Estimated prompt plus completion tokens of the request
+            priority (int | None): Queue priority, lower first. Defaults to the
+                priority set with `llm_priority`.
+            timeout (float | None): Maximum seconds to wait, or None to wait forever
+
+        Returns:
+            float: Seconds spent waiting
+
+        Raises:
+            TimeoutError: If the budget was not available within `timeout`
+        """
+        if priority is None:
+            priority = _priority.get()
+        entry = (priority, next(self._sequence))
+        started = time.monotonic()
+
+        with self._condition:
+            heapq.heappush(self._waiters, entry)
+            self._update_depth()
+            try:
+                while True:
+                    now = time.monotonic()
+                    wait = None
+                    if self._waiters[0] == entry:
+                        wait = max(
+                            self._paused_until - now,
+                            self._requests.wait_time(1, now),
+                            self._tokens.wait_time(tokens, now),
+                        )
+                        if wait <= 0:
+                            self._requests.consume(1, now)
+                            self._tokens.consume(tokens, now)
+                            break
+                    if timeout is not None:
+                        remaining = started + timeout - now
+                        if remaining <= 0:
+                            raise TimeoutError(
+                                "Timed out waiting for the LLM rate limit"
+                            )
+                        wait = remaining if wait is None else min(wait, remaining)
+                    self._condition.wait(wait)
+            finally:
+                self._waiters.remove(entry)
+                heapq.heapify(self._waiters)
+                self._update_depth()
+                self._condition.notify_all()
+
+        waited = time.monotonic() - started
+        get_metrics().observe("rate_limiter.wait_seconds", waited)
+        return waited
+
+    def record_usage(self, estimated_tokens: int, actual_tokens: int) -> None:
+        """Correct the token budget once the real size of a request is known."""
+        with self._condition:
+            self._tokens.consume(actual_tokens - estimated_tokens, time.monotonic())
+            self._condition.notify_all()
+
+    def pause(self, seconds: float) -> None:
+        """Stop granting requests to every caller for `seconds`."""
+        with self._condition:
+            self._paused_until = max(self._paused_until, time.monotonic() + seconds)
+            self._condition.notify_all()
+
+
+class RateLimitRetriesExhausted(RuntimeError):
+    """Raised when an LLM call is still rejected after every retry"""
+
+
+def is_rate_limit_error(error: BaseException) -> bool:
+    """Check whether an LLM error is a provider rate-limit (HTTP 429) rejection."""
+    while error is not None:
+        status_code = getattr(error, "status_code", None)
+        if status_code is None:
+            status_code = getattr(getattr(error, "response", None), "status_code", None)
+        message = str(error).lower()
+        if (
+            status_code == 429
+            or "ratelimit" in type(error).__name__.lower()
+            or "rate limit" in message
+            or "too many requests" in message
+        ):
+            return True
+        error = error.__cause__
+    return False
+
+
+def retry_after_seconds(error: BaseException):
+    """Return the delay a rate-limit error asks for, or None if it gives none."""
+    retry_after = getattr(error, "retry_after", None)
+    if retry_after is None:
+        headers = getattr(getattr(error, "response", None), "headers", None) or {}
+        retry_after = headers.get("retry-after")
+    try:
+        return float(retry_after) if retry_after is not None else None
+    except (TypeError, ValueError):
+        return None
+
+
+class ScheduledLLM(DelegatingLLM):
+    """
+    LLM wrapper that schedules every call through a `RateLimiter`
+
+    Each call first waits for its estimated tokens (prompt plus
+    `expected_completion_tokens`) in the limiter's queue. On a rate-limit
+    error the whole limiter is paused for the server's Retry-After, or an
+    exponential backoff with full jitter, and the call is retried up to
+    `max_retries` times before `RateLimitRetriesExhausted` is raised.
+    """
+
+    limiter: Any = Field(exclude=True, description="The RateLimiter to use")
+    max_retries: int = LLM_MAX_RETRIES
+    backoff_base_seconds: float = LLM_BACKOFF_BASE_SECONDS
+    backoff_max_seconds: float = LLM_BACKOFF_MAX_SECONDS
+    expected_completion_tokens: int = LLM_EXPECTED_COMPLETION_TOKENS
+
+    def call(
+        self, messages, tools=None, callbacks=None, available_functions=None, **kwargs
+    ):
+        """Wait for rate-limit budget, call the inner LLM and retry on 429s."""
+        metrics = get_metrics()
+        prompt_tokens = estimate_tokens(
+            messages if isinstance(messages, str) else str(messages)
+        )
+        estimated_tokens = prompt_tokens + self.expected_completion_tokens
+
+        last_error = None
+        for attempt in range(self.max_retries + 1):
+            self.limiter.acquire(estimated_tokens)
+            try:
+                response = super().call(
+                    messages, tools, callbacks, available_functions, **kwargs
+                )
+            except Exception as e:
+                if not is_rate_limit_error(e):
+                    raise
+                last_error = e
+                metrics.incr("rate_limiter.throttled")
+                self.limiter.pause(self._backoff(attempt, retry_after_seconds(e)))
+                continue
+
+            completion_tokens = estimate_tokens(str(response))
+            self.limiter.record_usage(
+                estimated_tokens, prompt_tokens + completion_tokens
+            )
+            if attempt:
+                metrics.incr("rate_limiter.retried_calls")
+            return response
+
+        # Raised outside the except block so the 429 is not chained; otherwise
+        # crewai's own retry loop would see it and retry again
+        raise RateLimitRetriesExhausted(
+            f"LLM call rejected by the provider on all {self.max_retries + 1} "
+            f"attempts, last error: {type(last_error).__name__}"
+        )
+
+    def _backoff(self, attempt: int, retry_after=None) -> float:
+        """Return the pause after a rejected attempt, with full jitter."""
+        if retry_after is not None:
+            return retry_after + random.uniform(0, self.backoff_base_seconds)
+        ceiling = min(self.backoff_max_seconds, self.backoff_base_seconds * 2**attempt)
+        return random.uniform(0, ceiling)
+
+
+_limiter = None
+_limiter_lock = threading.Lock()
+
+
+def get_rate_limiter() -> RateLimiter:
+    """Return the process-wide rate limiter, creating it on first use."""
+    global _limiter
+    with _limiter_lock:
+        if _limiter is None:
+            _limiter = RateLimiter()
+        return _limiter
@@ -0,0 +1,261 @@
+"""
+Page-Tagged Retrieval over the Source Document
+
+The pages of a document are split into short passages that never span a
+page, so every passage carries the page it comes from. Passages are
+embedded as hashed bag-of-words vectors (see `src.dedup`) weighted by how
+rare each feature is within the document, and a question retrieves the
+passages most similar to its text and correct answer. The quiz analysis
+receives only these passages, with their page numbers, instead of the
+whole document.
+
+With `hnswlib` installed, lookups use an HNSW graph; otherwise an exact
+numpy scan is used, which is fast enough for documents of a few thousand
+passages.
+"""
+
+import hashlib
+import threading
+from collections import OrderedDict
+import numpy as np
+from config.config import (
+    RETRIEVAL_CHUNK_TOKENS,
+    RETRIEVAL_DIMENSIONS,
+    RETRIEVAL_MAX_DOCUMENTS,
+    RETRIEVAL_TOP_K,
+)
+from src.chunking import chunk_text
+from src.dedup import hash_features
+from src.tracing import span
+
+try:
+    import hnswlib
+except ImportError:
+    hnswlib = None
+
+# Passed to the analysis when no passages could be retrieved
+NO_SOURCES = (
+    "No source passages are available. Refer to the content of the questions "
+    "and do not cite page numbers."
+)
+
+
+class SourceIndex:
+    """
+    Vector index of the page-tagged passages of one document
+
+    Page numbers are one-based, as printed in the document.
+    """
+
+    def __init__(
+        self,
+        pages,
+        chunk_tokens=RETRIEVAL_CHUNK_TOKENS,
+        dimensions=RETRIEVAL_DIMENSIONS,
+        use_hnsw=None,
+    ):
+        """Split the pages into passages and index them.
+
+        Args:
+            pages (list[str]): Extracted text of each page, in page order
+            chunk_tokens (int): Estimated tokens per passage
+            dimensions (int): Length of the passage embeddings
+            use_hnsw (bool | None): Use hnswlib for lookups. Defaults to using
+                it when it is installed.
+        """
+        if use_hnsw and hnswlib is None:
+            raise RuntimeError("hnswlib is not installed")
+        self.dimensions = dimensions
+        self.passages = [
+            (page_number, passage)
+            for page_number, page in enumerate(pages, 1)
+            for passage in chunk_text(page or "", chunk_tokens)
+        ]
+        if use_hnsw is None:
+            use_hnsw = hnswlib is not None
+        # hnswlib cannot build an empty index
+        self.use_hnsw = use_hnsw and len(self.passages) > 0
+
+        counts = np.zeros((len(self.passages), dimensions), dtype=np.float32)
+        for row, (_, passage) in enumerate(self.passages):
+            counts[row] = hash_features([(passage, 1.0)], dimensions)
+        # Features found in many passages say little about which one matches
+        document_frequency = np.count_nonzero(counts, axis=0)
+        self._idf = (
+            np.log((1 + len(self.passages)) / (1 + document_frequency)) + 1
+        ).astype(np.float32)
+        vectors = self._normalize(counts * self._idf)
+
+        if self.use_hnsw:
+            self._hnsw = hnswlib.Index(space="ip", dim=dimensions)
+            self._hnsw.init_index(
+                max_elements=len(self.passages), ef_construction=100, M=16
+            )
+            self._hnsw.add_items(vectors, np.arange(len(self.passages)))
+        else:
+            self._vectors = vectors
+
+    def __len__(self) -> int:
+        return len(self.passages)
+
+    @staticmethod
+    def _normalize(vectors: np.ndarray) -> np.ndarray:
+        norms = np.linalg.norm(vectors, axis=-1, keepdims=True)
+        return vectors / np.where(norms > 0, norms, 1.0)
+
+    def search(self, query: str, top_k: int = RETRIEVAL_TOP_K) -> list:
+        """Find the passages most similar to a query.
+
+        Args:
+            query (str): Text to search for
+            top_k (int): Maximum number of passages
+
+        Returns:
+            list[tuple[int, float]]: (passage id, cosine similarity) pairs,
+                best first, excluding passages sharing no feature with the query
+        """
+        top_k = min(top_k, len(self.passages))
+        if top_k == 0:
+            return []
+        vector = self._normalize(
+            hash_features([(query, 1.0)], self.dimensions) * self._idf
+        )
+        if not vector.any():
+            return []
+        if self.use_hnsw:
+            self._hnsw.set_ef(max(32, top_k))
+            ids, distances = self._hnsw.knn_query(vector, k=top_k)
+            # hnswlib's inner-product distance is 1 - dot product
+            results = zip(ids[0].tolist(), (1.0 - distances[0]).tolist())
+        else:
+            scores = self._vectors @ vector
+            ids = np.argsort(-scores)[:top_k]
+            results = zip(ids.tolist(), scores[ids].tolist())
+        return [(passage_id, score) for passage_id, score in results if score > 0]
+
+    def question_passages(self, question: dict, top_k: int = RETRIEVAL_TOP_K):
+        """Return the ids of the passages most relevant to a quiz question.
+
+        The question is searched together with its correct option, which
+        names what the source has to support.
+        """
+        query = question.get("question", "")
+        options = question.get("options") or []
+        correct_index = question.get("correct_index")
+        if isinstance(correct_index, int) and 0 <= correct_index < len(options):
+            query += f" {options[correct_index]}"
+        return [passage_id for passage_id, _ in self.search(query, top_k)]
+
+    def page_span(self, question: dict, top_k: int = RETRIEVAL_TOP_K):
+        """Return the (first, last) page of a question's passages, or None."""
+        pages = [self.passages[i][0] for i in self.question_passages(question, top_k)]
+        return (min(pages), max(pages)) if pages else None
+
+    def format_sources(self, questions, top_k: int = RETRIEVAL_TOP_K) -> str:
+        """Build the source section of an analysis prompt.
+
+        Every retrieved passage is listed once with its page number,
+        followed by the passages relevant to each question.
+
+        Args:
+            questions (list[tuple[str, dict]]): (label, question) pairs,
+                e.g. ("MCQ 1", {...})
+            top_k (int): Passages retrieved per question
+
+        Returns:
+            str: The formatted passages, or NO_SOURCES if none were found
+        """
+        passage_labels = {}
+        question_lines = []
+        for label, question in questions:
+            ids = self.question_passages(question, top_k)
+            for passage_id in ids:
+                passage_labels.setdefault(passage_id, f"P{len(passage_labels) + 1}")
+            refs = ", ".join(passage_labels[i] for i in ids) or "none"
+            question_lines.append(f"{label}: {refs}")
+        if not passage_labels:
+            return NO_SOURCES
+
+        return (
+            self.format_passages(list(passage_labels), passage_labels)
+            + "\nPASSAGES RELEVANT TO EACH QUESTION:\n"
+            + "\n".join(question_lines)
+        )
+
+    def format_passages(self, passage_ids, labels=None) -> str:
+        """Format passages one per line, each with its page number.
+
+        Args:
+            passage_ids (list[int]): Ids of the passages, in output order
+            labels (dict[int, str] | None): Label of each passage id, e.g.
+                "P1"; unlabelled passages are listed with their page only
+
+        Returns:
+            str: The formatted passages
+        """
+        lines = []
+        for passage_id in passage_ids:
+            page_number, passage = self.passages[passage_id]
+            label = f"[{labels[passage_id]}] " if labels else ""
+            lines.append(f"{label}(Page {page_number}) {' '.join(passage.split())}")
+        return "\n".join(lines)
+
+
+def quiz_sources(index, mcq_quiz: dict, tf_quiz: dict, top_k=RETRIEVAL_TOP_K) -> str:
+    """Retrieve the source passages for analyzing a pair of quizzes.
+
+    Args:
+        index (SourceIndex | None): Index of the source document
+        mcq_quiz (dict): MCQ quiz with "quiz"
+        tf_quiz (dict): True/False quiz with "quiz"
+        top_k (int): Passages retrieved per question
+
+    Returns:
+        str: Source section of the analysis prompt, NO_SOURCES without an index
+    """
+    if index is None:
+        return NO_SOURCES
+    questions = [
+        (f"MCQ {i}", question) for i, question in enumerate(mcq_quiz.get("quiz", []), 1)
+    ]
+    questions += [
+        (f"T/F {i}", question) for i, question in enumerate(tf_quiz.get("quiz", []), 1)
+    ]
+    with span("retrieval", questions=len(questions)):
+        return index.format_sources(questions, top_k)
+
+
+_indexes = OrderedDict()
+_indexes_lock = threading.Lock()
+
+
+def get_source_index(pages, max_documents=RETRIEVAL_MAX_DOCUMENTS) -> SourceIndex:
+    """Return the index of a document, building it once per distinct text.
+
+    The most recently used `max_documents` indexes are kept in memory.
+
+    Args:
+        pages (list[str]): Extracted text of each page, in page order
+        max_documents (int): Number of indexes to keep
+
+    Returns:
+        SourceIndex: Index of the document's passages
+    """
+    digest = hashlib.sha256()
+    for page in pages:
+        digest.update((page or "").encode("utf-8") + b"\x0c")
+    key = digest.hexdigest()
+    with _indexes_lock:
+        index = _indexes.get(key)
+        if index is not None:
+            _indexes.move_to_end(key)
+            return index
+
+    with span("source_index", pages=len(pages)) as index_span:
+        index = SourceIndex(pages)
+        index_span.set_attribute("passages", len(index))
+    with _indexes_lock:
+        _indexes[key] = index
+        while len(_indexes) > max_documents:
+            _indexes.popitem(last=False)
+    return index
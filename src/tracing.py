@@ -0,0 +1,346 @@
+"""
+Pipeline Tracing and Metrics
+
+Timed spans for the pipeline stages and an in-process metrics registry.
+A span records its duration, status and attributes (token counts, cache
+hits, ...) and is linked to the span that was current when it started, so a
+pipeline run forms a tree. Finished spans are appended to TRACE_PATH as JSON
+lines, rotated once the file reaches TRACE_MAX_BYTES, and their durations
+feed the registry, which can be read as a dictionary or scraped in
+Prometheus text format.
+
+Spans are tracked in a context variable. Work submitted to a thread pool
+only stays in its parent's trace when it runs in a copy of the submitting
+context, see `submit_in_context`.
+"""
+
+import contextvars
+import functools
+import json
+import os
+import threading
+import time
+import uuid
+from collections import deque
+from contextlib import contextmanager
+from config.config import (
+    METRICS_SAMPLE_SIZE,
+    TRACE_BACKUP_COUNT,
+    TRACE_MAX_BYTES,
+    TRACE_PATH,
+    TRACING_ENABLED,
+)
+
+_current_span = contextvars.ContextVar("current_span", default=None)
+
+
+class Span:
+    """A timed unit of work within a trace"""
+
+    def __init__(self, name: str, parent=None, **attributes):
+        self.name = name
+        self.parent = parent
+        self.trace_id = parent.trace_id if parent is not None else uuid.uuid4().hex
+        self.span_id = uuid.uuid4().hex[:16]
+        self.attributes = attributes
+        self.status = "ok"
+        self.error = None
+        self.start_time = time.time()
+        self.duration = None
+        self._lock = threading.Lock()
+
+    def set_attribute(self, key: str, value) -> None:
+        """Set an attribute of the span."""
+        with self._lock:
+            self.attributes[key] = value
+
+    def add(self, key: str, value=1) -> None:
+        """Add to a numeric attribute of the span, starting from zero."""
+        with self._lock:
+            self.attributes[key] = self.attributes.get(key, 0) + value
+
+    def find(self, name: str):
+        """Return this span or its nearest ancestor called `name`, or None."""
+        span = self
+        while span is not None and span.name != name:
+            span = span.parent
+        return span
+
+    def to_dict(self) -> dict:
+        """Return the span as a JSON-serializable record."""
+        with self._lock:
+            attributes = dict(self.attributes)
+        return {
+            "trace_id": self.trace_id,
+            "span_id": self.span_id,
+            "parent_id": self.parent.span_id if self.parent is not None else None,
+            "name": self.name,
+            "start_time": self.start_time,
+            "duration_seconds": self.duration,
+            "status": self.status,
+            "error": self.error,
+            "attributes": attributes,
+        }
+
+
+class MetricsRegistry:
+    """
+    Thread-safe counters, gauges and timing summaries
+
+    Summaries keep the count, sum and maximum of every observation plus the
+    last `sample_size` values, from which percentiles are computed.
+    """
+
+    def __init__(self, sample_size=METRICS_SAMPLE_SIZE):
+        """Initialize an empty registry.
+
+        Args:
+            sample_size (int): Observations kept per summary for percentiles
+        """
+        self.sample_size = sample_size
+        self._counters = {}
+        self._gauges = {}
+        self._summaries = {}
+        self._lock = threading.Lock()
+
+    def incr(self, name: str, value=1) -> None:
+        """Add `value` to a counter."""
+        with self._lock:
+            self._counters[name] = self._counters.get(name, 0) + value
+
+    def set_gauge(self, name: str, value: float) -> None:
+        """Set a gauge to its current value, e.g. a queue depth."""
+        with self._lock:
+            self._gauges[name] = value
+
+    def observe(self, name: str, value: float) -> None:
+        """Record one observation of a summary, e.g. a duration in seconds."""
+        with self._lock:
+            summary = self._summaries.get(name)
+            if summary is None:
+                summary = self._summaries[name] = {
+                    "count": 0,
+                    "sum": 0.0,
+                    "max": value,
+                    "samples": deque(maxlen=self.sample_size),
+                }
+            summary["count"] += 1
+            summary["sum"] += value
+            summary["max"] = max(summary["max"], value)
+            summary["samples"].append(value)
+
+    @staticmethod
+    def _percentile(ordered, fraction):
+        """Return the nearest-rank percentile of sorted values."""
+        index = min(len(ordered) - 1, max(0, round(fraction * len(ordered)) - 1))
+        return ordered[index]
+
+    def snapshot(self) -> dict:
+        """Return the current counters and summaries.
+
+        Returns:
+            dict: {"counters": {name: value}, "gauges": {name: value},
+                "summaries": {name: {count, sum, mean, max, p50, p95, p99}}}
+        """
+        with self._lock:
+            counters = dict(self._counters)
+            gauges = dict(self._gauges)
+            summaries = {
+                name: (summary, sorted(summary["samples"]))
+                for name, summary in self._summaries.items()
+            }
+        return {
+            "counters": counters,
+            "gauges": gauges,
+            "summaries": {
+                name: {
+                    "count": summary["count"],
+                    "sum": summary["sum"],
+                    "mean": summary["sum"] / summary["count"],
+                    "max": summary["max"],
+                    "p50": self._percentile(ordered, 0.50),
+                    "p95": self._percentile(ordered, 0.95),
+                    "p99": self._percentile(ordered, 0.99),
+                }
+                for name, (summary, ordered) in summaries.items()
+            },
+        }
+
+    def render_prometheus(self) -> str:
+        """Return the metrics in the Prometheus text exposition format."""
+
+        def metric_name(name):
+            return "quiz_" + "".join(c if c.isalnum() else "_" for c in name)
+
+        lines = []
+        snapshot = self.snapshot()
+        for name, value in sorted(snapshot["counters"].items()):
+            lines.append(f"# TYPE {metric_name(name)} counter")
+            lines.append(f"{metric_name(name)} {value}")
+        for name, value in sorted(snapshot["gauges"].items()):
+            lines.append(f"# TYPE {metric_name(name)} gauge")
+            lines.append(f"{metric_name(name)} {value}")
+        for name, summary in sorted(snapshot["summaries"].items()):
+            metric = metric_name(name)
+            lines.append(f"# TYPE {metric} summary")
+            for quantile, key in (("0.5", "p50"), ("0.95", "p95"), ("0.99", "p99")):
+                lines.append(f'{metric}{{quantile="{quantile}"}} {summary[key]}')
+            lines.append(f"{metric}_sum {summary['sum']}")
+            lines.append(f"{metric}_count {summary['count']}")
+        return "\n".join(lines) + "\n"
+
+    def reset(self) -> None:
+        """Drop every counter, gauge and summary."""
+        with self._lock:
+            self._counters.clear()
+            self._gauges.clear()
+            self._summaries.clear()
+
+
+class Tracer:
+    """
+    Creates spans and exports them when they finish
+
+    Each finished span adds its duration to the "span.<name>.seconds" summary
+    of the registry, failed spans also count in "span.<name>.errors", and the
+    span is appended to the JSON-lines file at `path` when one is set.
+    """
+
+    def __init__(
+        self,
+        path=TRACE_PATH,
+        registry=None,
+        enabled=TRACING_ENABLED,
+        max_bytes=TRACE_MAX_BYTES,
+        backup_count=TRACE_BACKUP_COUNT,
+    ):
+        """Initialize the tracer.
+
+        Args:
+            path (str | None): JSON-lines file finished spans are appended to
+            registry (MetricsRegistry | None): Registry fed by finished spans
+            enabled (bool): Whether spans are recorded at all
+            max_bytes (int | None): Size at which the trace file is rotated,
+                or None to let it grow without limit
+            backup_count (int): Rotated files kept as `path.1` (newest) to
+                `path.<backup_count>`; 0 truncates the file instead
+        """
+        self.path = path
+        self.max_bytes = max_bytes
+        self.backup_count = backup_count
+        self.registry = registry if registry is not None else MetricsRegistry()
+        self.enabled = enabled
+        self._file = None
+        self._lock = threading.Lock()
+
+    @contextmanager
+    def span(self, name: str, **attributes):
+        """Time the body of a `with` block as a span.
+
+        Args:
+            name (str): Stage name, e.g. "extraction"
+            **attributes: Initial attributes of the span
+
+        Yields:
+            Span: The running span, a child of the current span if any
+        """
+        span = Span(name, _current_span.get(), **attributes)
+        token = _current_span.set(span)
+        started = time.perf_counter()
+        try:
+            yield span
+        except BaseException as e:
+            span.status = "error"
+            span.error = f"{type(e).__name__}: {e}"
+            raise
+        finally:
+            span.duration = time.perf_counter() - started
+            _current_span.reset(token)
+            self._export(span)
+
+    def _export(self, span: Span) -> None:
+        """Record a finished span in the registry and the trace file."""
+        if not self.enabled:
+            return
+        self.registry.observe(f"span.{span.name}.seconds", span.duration)
+        if span.status == "error":
+            self.registry.incr(f"span.{span.name}.errors")
+        if not self.path:
+            return
+
+        line = json.dumps(span.to_dict(), default=str) + "\n"
+        with self._lock:
+            if self._file is None:
+                directory = os.path.dirname(self.path)
+                if directory:
+                    os.makedirs(directory, exist_ok=True)
+                self._file = open(file=self.path, mode="a", encoding="utf-8")
+            elif self.max_bytes and self._file.tell() + len(line) > self.max_bytes:
+                self._rotate()
+            self._file.write(line)
+            self._file.flush()
+
+    def _rotate(self) -> None:
+        """Shift the trace file to `path.1` and start a new one."""
+        self._file.close()
+        if self.backup_count > 0:
+            for index in range(self.backup_count - 1, 0, -1):
+                source = f"{self.path}.{index}"
+                if os.path.exists(source):
+                    os.replace(source, f"{self.path}.{index + 1}")
+            os.replace(self.path, f"{self.path}.1")
+        self._file = open(file=self.path, mode="w", encoding="utf-8")
+
+
+_tracer = None
+_tracer_lock = threading.Lock()
+
+
+def get_tracer() -> Tracer:
+    """Return the process-wide tracer, creating it on first use."""
+    global _tracer
+    with _tracer_lock:
+        if _tracer is None:
+            _tracer = Tracer()
+        return _tracer
+
+
+def get_metrics() -> MetricsRegistry:
+    """Return the process-wide metrics registry."""
+    return get_tracer().registry
+
+
+def span(name: str, **attributes):
+    """Start a span on the process-wide tracer, see `Tracer.span`."""
+    return get_tracer().span(name, **attributes)
+
+
+def current_span(name=None):
+    """Return the current span, or its nearest ancestor called `name`.
+
+    Returns:
+        Span | None: The span, or None outside of any (matching) span
+    """
+    span_ = _current_span.get()
+    if span_ is None or name is None:
+        return span_
+    return span_.find(name)
+
+
+def traced(name: str):
+    """Decorator that runs every call of a function in a span called `name`."""
+
+    def decorator(func):
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            with span(name):
+                return func(*args, **kwargs)
+
+        return wrapper
+
+    return decorator
+
+
+def submit_in_context(executor, func, *args, **kwargs):
+    """Submit work to an executor so it runs within the caller's current span."""
+    return executor.submit(contextvars.copy_context().run, func, *args, **kwargs)
@@ -1,20 +1,77 @@
 """Utility functions for PDF processing, JSON handling, and file operations"""
 
+import io
 import os
 import shutil
-from pypdf import PdfReader
-from pypdf.errors import PdfReadError, PdfStreamError
-from config.config import OUTPUT_PATH
+from config.config import OUTPUT_PATH, PDF_CACHE_ENABLED, PDF_EXTRACT_WORKERS
+from src.export import export_quiz, render_analysis_html, render_questions_html
+from src.pdf_cache import PdfTextCache, get_pdf_cache
+from src.pdf_extractor import extract_pages, join_pages
+from src.tracing import get_metrics, traced
 
+# Bump whenever a change to extraction would alter the extracted text,
+# so stale entries in the PDF text cache are no longer hit.
+EXTRACTOR_VERSION = "1"
+
+# Prefixes of the error messages returned by `process_pdf`
+PDF_ERROR_PREFIXES = (
+    "Error reading PDF:",
+    "Error: PDF file not found",
+    "Error: Permission denied",
+)
 
-def process_pdf(file_path: str) -> str:
-    """Process a PDF file and extract its text content.
+
+def read_pdf_bytes(file_path) -> bytes:
+    """Read the raw bytes of a PDF given a path or a file-like object.
 
     Args:
-        file_path (str): Path to the PDF file to process
+        file_path (str | file-like): Path to the PDF file, or an open binary
+            file such as a Streamlit `UploadedFile`
 
     Returns:
-        str: Extracted text content from the PDF, or error message if processing fails
+        bytes: Raw content of the PDF file
+    """
+    if hasattr(file_path, "read"):
+        if hasattr(file_path, "seek"):
+            file_path.seek(0)
+        return file_path.read()
+    with open(file=file_path, mode="rb") as file:
+        return file.read()
+
+
+def pdf_errors() -> tuple:
+    """Return the errors of `process_pdf_pages` reported by `process_pdf`.
+
+    pypdf is only imported here, when an error is being handled, so that
+    importing this module does not load it.
+    """
+    from pypdf.errors import PdfReadError, PdfStreamError
+
+    return (PdfReadError, PdfStreamError, FileNotFoundError, PermissionError)
+
+
+def process_pdf_pages(
+    file_path,
+    use_cache: bool = PDF_CACHE_ENABLED,
+    page_range=None,
+    workers=PDF_EXTRACT_WORKERS,
+) -> list:
+    """Extract the text of each page of a PDF file.
+
+    Extracted pages are cached on disk keyed by the SHA-256 of the file
+    content, so processing the same PDF again skips parsing entirely.
+    Large documents are extracted across `workers` processes.
+
+    Args:
+        file_path (str | file-like): Path to the PDF file to process, or an
+            open binary file such as a Streamlit `UploadedFile`
+        use_cache (bool): Whether to read from and write to the PDF text cache
+        page_range (tuple[int, int] | None): Zero-based, stop-exclusive range
+            of pages to extract. Defaults to the whole document.
+        workers (int | None): Worker processes for large PDFs (None = CPU count)
+
+    Returns:
+        list[str]: Extracted text of each selected page, in page order
 
     Raises:
         PdfReadError: If there is an error reading the PDF file
@@ -22,40 +79,93 @@ def process_pdf(file_path: str) -> str:
         FileNotFoundError: If the PDF file is not found
         PermissionError: If there are insufficient permissions to read the file
     """
-    try:
-        reader = PdfReader(file_path)
-        text = ""
-        for page in reader.pages:
-            text += page.extract_text() + "\n"
-        return text
-    except (PdfReadError, PdfStreamError) as e:
-        return f"Error reading PDF: {str(e)}"
-    except FileNotFoundError:
+    pdf_bytes = read_pdf_bytes(file_path)
+    cache = get_pdf_cache() if use_cache else None
+    key = PdfTextCache.make_key(pdf_bytes, EXTRACTOR_VERSION)
+
+    pages = cache.get(key) if cache is not None else None
+    if cache is not None:
+        get_metrics().incr("pdf_cache.misses" if pages is None else "pdf_cache.hits")
+    if pages is not None:
+        print("PDF text loaded from cache!")
+        if page_range is not None:
+            pages = pages[slice(*page_range)]
+    elif page_range is not None:
+        # Partial extractions are not cached, only whole documents are
+        pages = extract_pages(pdf_bytes, page_range, workers=workers)
+    else:
+        pages = extract_pages(pdf_bytes, workers=workers)
+        if cache is not None:
+            cache.put(key, pages)
+    return pages
+
+
+def pdf_error_message(error: Exception) -> str:
+    """Return the message `process_pdf` reports for one of `pdf_errors()`."""
+    if isinstance(error, FileNotFoundError):
         return "Error: PDF file not found"
-    except PermissionError:
+    if isinstance(error, PermissionError):
         return "Error: Permission denied to access PDF file"
+    return f"Error reading PDF: {str(error)}"
+
+
+def process_pdf(
+    file_path,
+    use_cache: bool = PDF_CACHE_ENABLED,
+    page_range=None,
+    workers=PDF_EXTRACT_WORKERS,
+) -> str:
+    """Process a PDF file and extract its text content.
+
+    Pages are extracted, and cached, by `process_pdf_pages` and joined with
+    one newline per page.
+
+    Args:
+        file_path (str | file-like): Path to the PDF file to process, or an
+            open binary file such as a Streamlit `UploadedFile`
+        use_cache (bool): Whether to read from and write to the PDF text cache
+        page_range (tuple[int, int] | None): Zero-based, stop-exclusive range
+            of pages to extract. Defaults to the whole document.
+        workers (int | None): Worker processes for large PDFs (None = CPU count)
+
+    Returns:
+        str: Extracted text content from the PDF, or error message if processing fails
+    """
+    try:
+        return join_pages(process_pdf_pages(file_path, use_cache, page_range, workers))
+    except pdf_errors() as e:
+        return pdf_error_message(e)
+
+
+def is_pdf_error(text: str) -> bool:
+    """Check whether `process_pdf` returned an error message instead of text."""
+    return text.startswith(PDF_ERROR_PREFIXES)
 
 
-def create_output_dir():
-    """Create or recreate the output directory.
+def create_output_dir(run_id: str) -> str:
+    """Create or recreate the output directory of a single run.
 
-    This function manages the output directory by:
-    1. Removing the existing directory if it exists
-    2. Creating a fresh empty directory
+    Each run writes to its own subdirectory of OUTPUT_PATH, so concurrent
+    runs never remove or overwrite each other's results.
+
+    Args:
+        run_id (str): Unique identifier of the run
 
     Returns:
-        None
+        str: Path to the run's output directory
 
     Raises:
         OSError: If directory creation/deletion fails
         PermissionError: If there are insufficient permissions
     """
+    run_dir = os.path.join(OUTPUT_PATH, run_id)
     try:
-        if os.path.exists(OUTPUT_PATH):
-            shutil.rmtree(OUTPUT_PATH)
+        if os.path.exists(run_dir):
+            shutil.rmtree(run_dir)
 
-        os.mkdir(OUTPUT_PATH)
+        os.makedirs(run_dir)
         print("Output Path Created Successfully!")
+        return run_dir
     except PermissionError as e:
         raise PermissionError(
             f"Permission denied when creating output directory: {e}"
@@ -64,6 +174,40 @@ def create_output_dir():
         raise OSError(f"Failed to create output directory: {e}") from e
 
 
+def save_run_outputs(run_id: str, task_results) -> str:
+    """Save the MCQ, T/F and analysis JSON of a run to its output directory.
+
+    Args:
+        run_id (str): Unique identifier of the run
+        task_results (list): [mcq_json, tf_json, analysis_json] strings
+
+    Returns:
+        str: Path to the run's output directory
+    """
+    run_dir = create_output_dir(run_id)
+    file_names = ["mcq_quiz.json", "tf_quiz.json", "quiz_analysis.json"]
+    for file_name, data in zip(file_names, task_results):
+        with open(
+            file=os.path.join(run_dir, file_name), mode="w", encoding="utf-8"
+        ) as file:
+            file.write(data or "")
+    return run_dir
+
+
+def format_questions_html(quiz_items, topic: str) -> str:
+    """Format the questions of one MCQ or True/False quiz as HTML.
+
+    Args:
+        quiz_items (list[dict]): Questions with "question" and "options"
+        topic (str): Topic shown in the quiz title
+
+    Returns:
+        str: HTML of the quiz title and its questions
+    """
+    return render_questions_html(quiz_items, topic)
+
+
+@traced("format")
 def format_quiz_output(json_data_mcq, json_data_tf, json_data_analysis):
     """Format quiz JSON data into HTML output for MCQ and True/False questions.
 
@@ -89,67 +233,24 @@ def format_quiz_output(json_data_mcq, json_data_tf, json_data_analysis):
         ]
     }
     """
-    print(f"\n------ISIDE FORMAT (0):----------\n")
     # MCQ Quiz
     if "quiz" not in json_data_mcq or "topic" not in json_data_mcq:
         return None
-    print(f"\n------ISIDE FORMAT (1):----------\n")
 
     topic = json_data_mcq["topic"]
-    quiz_items = json_data_mcq["quiz"]
-
-    mcq_output = f'<div class="quiz-title">Quiz on {topic}</div>'
-
-    for idx, item in enumerate(quiz_items, 1):
-        question_html = f'<div class="quiz-container">'
-        question_html += f'<div class="quiz-question">Q{idx}: {item["question"]}</div>'
-        for opt_idx, option in enumerate(item["options"], 0):
-            question_html += (
-                f'<div class="quiz-option">{"abcd"[opt_idx]}. {option}</div>'
-            )
-        question_html += "</div>"
-        mcq_output += question_html
+    mcq_output = format_questions_html(json_data_mcq["quiz"], topic)
 
     # TF Quiz
     if "quiz" not in json_data_tf:
         return None
-    print(f"\n------ISIDE FORMAT (2):----------\n")
-
-    quiz_items = json_data_tf["quiz"]
-
-    tf_output = f'<div class="quiz-title">Quiz on {topic}</div>'
 
-    for idx, item in enumerate(quiz_items, 1):
-        question_html = f'<div class="quiz-container">'
-        question_html += f'<div class="quiz-question">Q{idx}: {item["question"]}</div>'
-        for opt_idx, option in enumerate(item["options"], 0):
-            question_html += (
-                f'<div class="quiz-option">{"abcd"[opt_idx]}. {option}</div>'
-            )
-        question_html += "</div>"
-        tf_output += question_html
+    tf_output = format_questions_html(json_data_tf["quiz"], topic)
 
     # Quiz Analysis
     if "quiz" not in json_data_analysis:
         return None
-    print(f"\n------ISIDE FORMAT (3):----------\n")
 
-    quiz_items = json_data_analysis["quiz"]
-
-    analysis_output = f'<div class="quiz-title">Quiz on {topic}</div>'
-
-    for idx, item in enumerate(quiz_items, 1):
-        question_html = f'<div class="quiz-container">'
-        question_html += f'<div class="quiz-question">Question Explanation: {item["Question_Explanation"]}</div>'
-        question_html += f'<div class="quiz-question">Answer Feedback: {item["Answer_Feedback"]}</div>'
-        question_html += (
-            f'<div class="quiz-question">Correct Answer: {item["Correct_Answer"]}</div>'
-        )
-        question_html += (
-            f'<div class="quiz-question">Related Topics: {item["Related_Topics"]}</div>'
-        )
-        question_html += "</div>"
-        analysis_output += question_html
+    analysis_output = render_analysis_html(json_data_analysis["quiz"], topic)
 
     return mcq_output, tf_output, analysis_output
 
@@ -169,30 +270,9 @@ def format_quiz_text(json_data_mcq, json_data_tf):
     """
     if "quiz" not in json_data_mcq or "topic" not in json_data_mcq:
         return None
-
-    topic = json_data_mcq["topic"]
-    quiz_items = json_data_mcq["quiz"]
-
-    output = f"Quiz on {topic}\n\n"
-    output = f"MCQ Questions\n\n"
-
-    for _, item in enumerate(quiz_items, 1):
-        output += f"Question: {item['question']}\n"
-        for _, option in enumerate(item["options"], 0):
-            output += f"{option}\n"
-        output += "\n"
-
-    if "quiz" not in json_data_tf or "topic" not in json_data_tf:
+    if "quiz" not in json_data_tf:
         return None
 
-    quiz_items = json_data_tf["quiz"]
-
-    output = f"T/F Questions\n\n"
-
-    for _, item in enumerate(quiz_items, 1):
-        output += f"Question: {item['question']}\n"
-        for _, option in enumerate(item["options"], 0):
-            output += f"{option}\n"
-        output += "\n"
-
-    return output
+    stream = io.StringIO()
+    export_quiz(stream, json_data_mcq, json_data_tf, export_format="text")
+    return stream.getvalue()